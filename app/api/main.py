@@ -1,14 +1,34 @@
 # File: app/api/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.api.v1 import users, movies, subscriptions, payments, reviews
+from app.api.v1 import users, movies, subscriptions, payments, reviews, internal
 from app.routes import html_routes
+from app.middlewares.read_your_writes import ReadYourWritesMiddleware
+from app.tasks.charts import start_chart_refresher
+from app.tasks.subscription_expiry import start_subscription_expirer
+from app.services.payment_gateway import stripe_gateway
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Периодическая пересборка подборок фильмов и обработка истёкших подписок в фоне
+    background = [task for task in (start_chart_refresher(), start_subscription_expirer()) if task is not None]
+    yield
+    for task in background:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await stripe_gateway.aclose()
 
 app = FastAPI(
     title="Онлайн кинотеатр",
     description="API для онлайн кинотеатра на FastAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Подключение CORS, чтобы запросы к API могли приходить из браузера
@@ -28,8 +48,12 @@ app.add_middleware(
         "Access-Control-Allow-Origin",
         "Authorization",
     ],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Чтение своих записей при работе с репликами
+app.add_middleware(ReadYourWritesMiddleware)
+
 # Монтирование статики: файлы из папки "static" будут доступны по /static
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -39,6 +63,7 @@ app.include_router(movies.router)
 app.include_router(subscriptions.router)
 app.include_router(payments.router)
 app.include_router(reviews.router)
+app.include_router(internal.router)
 
 # Подключение маршрутов фронтенда (HTML страницы)
 app.include_router(html_routes.router)
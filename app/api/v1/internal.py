@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends
+from app.core.security import get_current_user, password_hash_metrics
+from app.models.users import User
+from app.utils.cache import cache_stats
+from app.database.routing import replica_router
+from app.database.pool_metrics import pool_stats
+from app.tasks.charts import chart_refresh_stats
+from app.tasks.subscription_expiry import subscription_expiry_stats
+from app.services.payment_gateway import stripe_gateway
+from app.exceptions.custom_exceptions import AccessDeniedException
+
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False)
+
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role.value != "ADMIN":
+        raise AccessDeniedException()
+    return current_user
+
+@router.get("/cache")
+async def get_cache_stats(current_user: User = Depends(require_admin)):
+    """
+    Возвращает счётчики попаданий и промахов для кэшей приложения.
+    """
+    return cache_stats()
+
+@router.get("/password-hashing")
+async def get_password_hashing_stats(current_user: User = Depends(require_admin)):
+    """
+    Возвращает метрики пула хэширования паролей: время ожидания в очереди и выполнения.
+    """
+    return password_hash_metrics()
+
+@router.get("/replicas")
+async def get_replica_stats(current_user: User = Depends(require_admin)):
+    """
+    Возвращает распределение чтений между репликами и основной базой и последнее измеренное отставание.
+    """
+    return replica_router.snapshot()
+
+@router.get("/pool")
+async def get_pool_stats(current_user: User = Depends(require_admin)):
+    """
+    Возвращает состояние пулов соединений: занятые соединения, overflow,
+    гистограмму ожидания соединения и возраст соединений.
+    """
+    return pool_stats()
+
+@router.get("/charts")
+async def get_chart_refresh_stats(current_user: User = Depends(require_admin)):
+    """
+    Возвращает метрики пересборки подборок: число запусков, пропусков и ошибок, длительность.
+    """
+    return chart_refresh_stats()
+
+@router.get("/subscription-expiry")
+async def get_subscription_expiry_stats(current_user: User = Depends(require_admin)):
+    """
+    Возвращает метрики обработки истёкших подписок: число запусков и истёкших подписок, длительность.
+    """
+    return subscription_expiry_stats()
+
+@router.get("/payment-gateway")
+async def get_payment_gateway_stats(current_user: User = Depends(require_admin)):
+    """
+    Возвращает метрики клиента Stripe: запросы, повторы, ошибки, одновременные запросы и задержки.
+    """
+    return stripe_gateway.snapshot()
@@ -1,21 +1,32 @@
+import json
 from typing import List, Optional
-from fastapi import APIRouter, Depends, status, Form, Query, Cookie
+from fastapi import APIRouter, Depends, status, Form, Query, Cookie, Response, Request
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
-from app.schemas.movies import MovieCreate, MovieRead, MovieUpdate
+from app.schemas.movies import (
+    MovieCreate, MovieFacets, MovieRead, MovieSuggestion, MovieUpdate, movie_read_json, parse_movie_fields
+)
 from app.services.movies_service import MovieService
-from app.database.dependencies import get_db_session
+from app.services.catalog_cache import catalog_cache
+from app.utils.dimensions import dimension_filter
+from app.database.dependencies import get_db_session, get_read_session
 from app.exceptions.custom_exceptions import (
     MovieNotFoundException,
     AccessDeniedException,
     InvalidDateFormatException,
     NoUpdateDataException,
+    MovieValidationException,
+    ParsingException,
     AgeNotConfirmedException,
-    SubscriptionRequiredException
+    SubscriptionRequiredException,
+    InvalidInputException
 )
+from app.models.countries import COUNTRY_MAX_LENGTH
+from app.models.genres import GENRE_MAX_LENGTH
 from app.models.users import User
 from app.core.security import get_current_user
-from app.services.subscriptions_service import SubscriptionService
+from app.services.entitlements_service import EntitlementService
 
 router = APIRouter(prefix="/movies", tags=["movies"])
 movie_service = MovieService()
@@ -28,8 +39,8 @@ async def create_movie(
                              example="2020-01-01T00:00:00Z"),
     duration: int = Form(..., example=148),
     rating: float = Form(..., example=8.8),
-    genre: Optional[str] = Form(None, example="Comedy"),
-    country: Optional[str] = Form(None, example="USA"),
+    genre: Optional[str] = Form(None, max_length=GENRE_MAX_LENGTH, example="Comedy"),
+    country: Optional[str] = Form(None, max_length=COUNTRY_MAX_LENGTH, example="USA"),
     type_: Optional[str] = Form(None, example="movie"),
     age_rating: Optional[int] = Form(0, example=18),
     required_subscription: Optional[str] = Form(None, example="Premium"),
@@ -59,56 +70,231 @@ async def create_movie(
     )
     return await movie_service.create_movie(db, movie_in)
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def bulk_import_movies(
+    request: Request,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Массовый импорт фильмов. Тело запроса — JSON-массив объектов MovieCreate
+    или NDJSON (application/x-ndjson, один объект на строку).
+    Только администратор имеет доступ к импорту.
+    """
+    if current_user.role.value != "ADMIN":
+        raise AccessDeniedException()
+    raw = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            items = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        else:
+            items = json.loads(raw)
+    except ValueError:
+        raise ParsingException("Тело запроса должно быть JSON-массивом или NDJSON")
+    if not isinstance(items, list):
+        raise ParsingException("Ожидается массив фильмов")
+    movies_in = []
+    for index, item in enumerate(items):
+        try:
+            movies_in.append(MovieCreate.model_validate(item))
+        except ValidationError as e:
+            raise MovieValidationException(f"Ошибка в записи {index}: {e.errors()[0]['msg']}")
+    if not movies_in:
+        raise NoUpdateDataException("Нет фильмов для импорта")
+    movies = await movie_service.bulk_create_movies(db, movies_in)
+    return {"created": len(movies), "ids": [movie.id for movie in movies]}
+
+def _selected_fields(fields: Optional[str]) -> Optional[List[str]]:
+    try:
+        return parse_movie_fields(fields)
+    except ValueError as e:
+        raise InvalidInputException(str(e))
+
 @router.get("/", response_model=List[MovieRead])
 async def list_movies(
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_read_session),
     title: Optional[str] = Query(None, description="Название фильма для поиска"),
-    genre: Optional[str] = Query(None, description="Жанр фильма"),
-    country: Optional[str] = Query(None, description="Страна производства"),
+    genre: Optional[List[str]] = Query(None, description="Жанры фильма: точное совпадение, можно передать несколько (genre=a&genre=b или через запятую)"),
+    country: Optional[List[str]] = Query(None, description="Страны производства: точное совпадение, можно передать несколько"),
     type_: Optional[str] = Query(None, description="Тип фильма (movie или series)"),
     release_year_from: Optional[int] = Query(None, description="Год выпуска от"),
     release_year_to: Optional[int] = Query(None, description="Год выпуска до"),
     rating_min: Optional[float] = Query(None, description="Минимальный рейтинг"),
     rating_max: Optional[float] = Query(None, description="Максимальный рейтинг"),
-    sort_by: Optional[str] = Query("release_date", description="Поле для сортировки"),
+    sort_by: Optional[str] = Query(None, description="Поле для сортировки: rating, release_date, title, audience_score или relevance (по умолчанию relevance при поиске, иначе release_date)"),
     order: Optional[str] = Query("desc", description="Порядок сортировки"),
     skip: int = Query(0, description="Количество записей для пропуска"),
-    limit: int = Query(100, description="Максимальное количество записей")
+    limit: int = Query(100, description="Максимальное количество записей"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Поля ответа через запятую, например id,title,rating,release_date")
 ):
     """
     Возвращает список фильмов по заданным фильтрам.
     Все параметры являются необязательными – если их не передать, то в запросе просто не будет данных.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor; с курсором skip не учитывается.
+    С fields из базы читаются и в ответ попадают только перечисленные поля.
     """
-    return await movie_service.list_movies(
-        db,
-        genre,
-        country,
-        type_,
-        release_year_from,
-        release_year_to,
-        rating_min,
-        rating_max,
-        title,
-        sort_by,
-        order,
-        skip,
-        limit
-    )
+    selected_fields = _selected_fields(fields)
+    params = {
+        "title": title, "genre": dimension_filter(genre), "country": dimension_filter(country), "type": type_,
+        "release_year_from": release_year_from, "release_year_to": release_year_to,
+        "rating_min": rating_min, "rating_max": rating_max, "sort_by": sort_by,
+        "order": order, "skip": skip, "limit": limit, "cursor": cursor,
+        "fields": ",".join(selected_fields) if selected_fields else None,
+    }
 
+    async def compute() -> dict:
+        movies, next_cursor = await movie_service.list_movies_page(
+            db,
+            genre,
+            country,
+            type_,
+            release_year_from,
+            release_year_to,
+            rating_min,
+            rating_max,
+            title,
+            sort_by,
+            order,
+            skip,
+            limit,
+            cursor,
+            selected_fields
+        )
+        body = "[" + ",".join(movie_read_json(movie, selected_fields) for movie in movies) + "]"
+        return {"body": body, "next_cursor": next_cursor or ""}
 
-@router.get("/{movie_id}", response_model=MovieRead)
-async def get_movie(movie_id: int, db: AsyncSession = Depends(get_db_session)):
+    # Ответ отдаётся готовым JSON из кэша, без повторной валидации MovieRead
+    cached = await catalog_cache.get_or_compute("list", params, compute)
+    headers = {"X-Next-Cursor": cached["next_cursor"]} if cached.get("next_cursor") else None
+    return Response(content=cached["body"], media_type="application/json", headers=headers)
+
+
+
+@router.get("/facets", response_model=MovieFacets)
+async def movie_facets(
+    db: AsyncSession = Depends(get_read_session),
+    title: Optional[str] = Query(None, description="Название фильма для поиска"),
+    genre: Optional[List[str]] = Query(None, description="Жанры фильма"),
+    country: Optional[List[str]] = Query(None, description="Страны производства"),
+    type_: Optional[str] = Query(None, description="Тип фильма (movie или series)"),
+    release_year_from: Optional[int] = Query(None, description="Год выпуска от"),
+    release_year_to: Optional[int] = Query(None, description="Год выпуска до"),
+    rating_min: Optional[float] = Query(None, description="Минимальный рейтинг"),
+    rating_max: Optional[float] = Query(None, description="Максимальный рейтинг")
+):
     """
-    Возвращает подробную информацию о фильме по его идентификатору.
+    Возвращает количество фильмов по жанрам, странам, типам, десятилетиям и рейтингу
+    с учётом переданных фильтров (тех же, что у списка фильмов).
+    """
+    params = {
+        "title": title, "genre": dimension_filter(genre), "country": dimension_filter(country), "type": type_,
+        "release_year_from": release_year_from, "release_year_to": release_year_to,
+        "rating_min": rating_min, "rating_max": rating_max,
+    }
+
+    async def compute() -> dict:
+        facets = await movie_service.facet_counts(
+            db, genre, country, type_, release_year_from, release_year_to, rating_min, rating_max, title
+        )
+        return {"body": MovieFacets.model_validate(facets).model_dump_json()}
+
+    cached = await catalog_cache.get_or_compute("facets", params, compute)
+    return Response(content=cached["body"], media_type="application/json")
+
+@router.get("/suggest", response_model=List[MovieSuggestion])
+async def suggest_movies(
+    q: str = Query(..., min_length=1, max_length=100, description="Введённая часть названия"),
+    limit: int = Query(10, ge=1, le=20, description="Количество подсказок"),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """
+    Подсказки названий при вводе из индекса в памяти: совпадения с начала названия,
+    затем с начала слов, по популярности.
+    """
+    suggestions = await movie_service.suggest_titles(db, q, limit)
+    return [MovieSuggestion(id=id, title=title) for id, title in suggestions]
+
+@router.get("/trending", response_model=List[MovieRead])
+async def trending_movies(
+    limit: int = Query(20, ge=1, le=50, description="Количество фильмов"),
+    db: AsyncSession = Depends(get_read_session)
+):
     """
-    movie = await movie_service.get_movie(db, movie_id)
-    movie_data = MovieRead.from_orm(movie).dict()
-    total_minutes = movie.duration if movie.duration is not None else 0
+    Возвращает фильмы в тренде: популярность по свежим отзывам с затуханием во времени.
+    """
+    async def compute() -> dict:
+        charts = await movie_service.get_charts(db, limit=limit)
+        body = "[" + ",".join(MovieRead.model_validate(movie).model_dump_json() for movie in charts["trending"]) + "]"
+        return {"body": body}
+
+    cached = await catalog_cache.get_or_compute("trending", {"limit": limit}, compute)
+    return Response(content=cached["body"], media_type="application/json")
+
+@router.get("/top-rated", response_model=List[MovieRead])
+async def top_rated_movies(
+    genre: str = Query(..., description="Жанр"),
+    limit: int = Query(20, ge=1, le=50, description="Количество фильмов"),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """
+    Возвращает лучшие фильмы жанра по оценкам зрителей.
+    """
+    async def compute() -> dict:
+        charts = await movie_service.get_charts(db, [genre], trending=False, limit=limit)
+        body = "[" + ",".join(MovieRead.model_validate(movie).model_dump_json() for movie in charts[genre]) + "]"
+        return {"body": body}
+
+    params = {"genre": dimension_filter(genre), "limit": limit}
+    cached = await catalog_cache.get_or_compute("top_rated", params, compute)
+    return Response(content=cached["body"], media_type="application/json")
+
+def format_duration(total_minutes: Optional[int]) -> str:
+    total_minutes = total_minutes if total_minutes is not None else 0
     hours = total_minutes // 60
     minutes = total_minutes % 60
-    formatted = f"{hours} hr {minutes} min" if minutes else f"{hours} hr"
-    movie_data["duration_formatted"] = formatted
-    return movie_data
+    return f"{hours} hr {minutes} min" if minutes else f"{hours} hr"
+
+
+@router.get("/{movie_id}", response_model=MovieRead)
+async def get_movie(
+    movie_id: int,
+    fields: Optional[str] = Query(None, description="Поля ответа через запятую, например id,title,description"),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """
+    Возвращает подробную информацию о фильме по его идентификатору.
+    С fields из базы читаются и в ответ попадают только перечисленные поля.
+    """
+    selected_fields = _selected_fields(fields)
+
+    async def compute() -> dict:
+        movie = await movie_service.get_movie(db, movie_id, selected_fields)
+        values = {}
+        if selected_fields is None or "duration_formatted" in selected_fields:
+            values["duration_formatted"] = format_duration(movie.duration)
+        return {"body": movie_read_json(movie, selected_fields, **values)}
+
+    params = {"id": movie_id, "fields": ",".join(selected_fields) if selected_fields else None}
+    cached = await catalog_cache.get_or_compute("detail", params, compute)
+    return Response(content=cached["body"], media_type="application/json")
+
+@router.get("/{movie_id}/similar", response_model=List[MovieRead])
+async def similar_movies(
+    movie_id: int,
+    limit: int = Query(10, ge=1, le=50, description="Количество похожих фильмов"),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """
+    Возвращает похожие фильмы по оценкам пользователей (предрасчитанный список).
+    """
+    async def compute() -> dict:
+        movies = await movie_service.get_similar_movies(db, movie_id, limit)
+        body = "[" + ",".join(MovieRead.model_validate(movie).model_dump_json() for movie in movies) + "]"
+        return {"body": body}
+
+    cached = await catalog_cache.get_or_compute("similar", {"id": movie_id, "limit": limit}, compute)
+    return Response(content=cached["body"], media_type="application/json")
 
 @router.put("/{movie_id}", response_model=MovieRead)
 async def update_movie(
@@ -118,8 +304,8 @@ async def update_movie(
     release_date: Optional[str] = Form(None, example="2020-01-01T00:00:00Z"),
     duration: Optional[int] = Form(None, example=120),
     rating: Optional[float] = Form(None, example=8.0),
-    genre: Optional[str] = Form(None, example="Comedy"),
-    country: Optional[str] = Form(None, example="USA"),
+    genre: Optional[str] = Form(None, max_length=GENRE_MAX_LENGTH, example="Comedy"),
+    country: Optional[str] = Form(None, max_length=COUNTRY_MAX_LENGTH, example="USA"),
     type_: Optional[str] = Form(None, example="movie"),
     age_rating: Optional[int] = Form(None, example=16),
     required_subscription: Optional[str] = Form(None, example="Premium"),
@@ -171,16 +357,16 @@ async def watch_movie(
     Предоставляет доступ к просмотру фильма.
     Проверяется подтверждение возраста и наличие активной подписки, если требуется.
     """
-    movie = await movie_service.get_movie(db, movie_id)
-    if movie.age_rating and movie.age_rating >= 18:
+    entitlement_service = EntitlementService()
+    movie = await entitlement_service.get_movie_requirement(db, movie_id)
+    if movie["age_rating"] and movie["age_rating"] >= 18:
         if age_confirmed != "true":
             raise AgeNotConfirmedException()
-    if not movie.required_subscription:
-        return {"movie_id": movie.id, "stream_url": f"http://example.com/stream/{movie.id}"}
-    subscription_service = SubscriptionService()
-    subscription = await subscription_service.get_active_subscription(db, current_user.id)
-    if not subscription:
-        raise SubscriptionRequiredException("Подписка не оформлена или не оплачена. Пожалуйста, оформите и оплатите подписку перед просмотром.")
-    if subscription.plan.lower() != movie.required_subscription.lower():
-        raise AccessDeniedException(f"Ваша подписка ({subscription.plan}) не дает доступа к этому фильму. Для просмотра требуется подписка {movie.required_subscription}.")
-    return {"movie_id": movie.id, "stream_url": f"http://example.com/stream/{movie.id}"}
+    required = movie["required_subscription"]
+    if required:
+        entitlements = await entitlement_service.get_user_entitlements(db, current_user.id)
+        if not entitlements["plan"]:
+            raise SubscriptionRequiredException("Подписка не оформлена или не оплачена. Пожалуйста, оформите и оплатите подписку перед просмотром.")
+        if not entitlement_service.allows(entitlements, required):
+            raise AccessDeniedException(f"Ваша подписка ({entitlements['plan']}) не дает доступа к этому фильму. Для просмотра требуется подписка {required}.")
+    return {"movie_id": movie["id"], "stream_url": f"http://example.com/stream/{movie['id']}"}
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request, Depends, Form
 import stripe
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.dependencies import get_db_session
+from app.database.unit_of_work import unit_of_work
 from app.core.config import settings
 from app.services.payments_dao import PaymentService
 from app.services.subscriptions_service import SubscriptionService
@@ -37,15 +38,15 @@ async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_db_ses
         order_id = session["metadata"]["order_id"]
         subscription_id_str = session["metadata"].get("subscription_id", "").strip()
         payment_service = PaymentService()
-        await payment_service.update_payment(db, int(order_id), {"status": PaymentStatus.COMPLETED})
-        payment = await payment_service.get_payment(db, int(order_id))
-        if subscription_id_str:
-            subscription_service = SubscriptionService()
-            try:
-                subscription = await subscription_service.get_subscription(db, int(subscription_id_str))
-                await subscription_service.update_subscription(db, subscription.id, {"status": SubStatus.active})
-            except SubscriptionNotFoundException:
-                pass
+        # Платёж и подписка обновляются в одной транзакции: два UPDATE ... RETURNING и один коммит
+        async with unit_of_work(db):
+            await payment_service.update_payment(db, int(order_id), {"status": PaymentStatus.COMPLETED})
+            if subscription_id_str:
+                subscription_service = SubscriptionService()
+                try:
+                    await subscription_service.update_subscription(db, int(subscription_id_str), {"status": SubStatus.active})
+                except SubscriptionNotFoundException:
+                    pass
     return {"status": "success"}
 
 
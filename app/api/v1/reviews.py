@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, status, Form
+from fastapi import APIRouter, Depends, status, Form, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.schemas.reviews import ReviewCreate, ReviewRead, ReviewUpdate
 from app.services.reviews_service import ReviewService
-from app.database.dependencies import get_db_session
+from app.database.dependencies import get_db_session, get_read_session
 from app.core.security import get_current_user
+from app.core.config import settings
 from app.models.users import User
+from app.models.reviews import REVIEW_RATING_MIN, REVIEW_RATING_MAX
 from app.exceptions.custom_exceptions import (
     ReviewNotFoundException,
     AccessDeniedException,
@@ -18,7 +20,7 @@ review_service = ReviewService()
 @router.post("/", response_model=ReviewRead, status_code=status.HTTP_201_CREATED)
 async def create_review(
     movie_id: int = Form(..., example=1),
-    rating: int = Form(..., example=8),
+    rating: int = Form(..., ge=REVIEW_RATING_MIN, le=REVIEW_RATING_MAX, example=8),
     comment: Optional[str] = Form(None, example="Great movie!"),
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user)
@@ -33,12 +35,18 @@ async def create_review(
 @router.get("/movie/{movie_id}", response_model=List[ReviewRead])
 async def get_reviews_for_movie(
     movie_id: int,
-    db: AsyncSession = Depends(get_db_session)
+    response: Response,
+    limit: int = Query(settings.REVIEWS_PAGE_SIZE, ge=1, le=settings.REVIEWS_MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
-    Возвращает список отзывов для фильма.
+    Возвращает страницу отзывов для фильма, новые первыми.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
     """
-    reviews = await review_service.list_reviews_for_movie(db, movie_id)
+    reviews, next_cursor = await review_service.list_reviews_page(db, movie_id, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return reviews
 
 @router.delete("/{review_id}", status_code=status.HTTP_200_OK)
@@ -58,7 +66,7 @@ async def delete_review(
 @router.put("/{review_id}", response_model=ReviewRead)
 async def update_review(
     review_id: int,
-    rating: Optional[int] = Form(None, example=9),
+    rating: Optional[int] = Form(None, ge=REVIEW_RATING_MIN, le=REVIEW_RATING_MAX, example=9),
     comment: Optional[str] = Form(None, example="Updated review"),
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user)
@@ -8,8 +8,7 @@ from app.database.dependencies import get_db_session
 from app.exceptions.custom_exceptions import (
     SubscriptionNotFoundException,
     NoUpdateDataException,
-    InvalidDateFormatException,
-    SubscriptionConflictException
+    InvalidDateFormatException
 )
 from app.core.security import get_current_user
 from app.models.users import User
@@ -28,10 +27,6 @@ async def purchase_subscription(
     """
     Оформляет подписку для текущего пользователя.
     """
-    user_subscriptions = await subscription_service.list_subscriptions(db, skip=0, limit=100)
-    for sub in user_subscriptions:
-        if sub.user_id == current_user.id and sub.status.value.lower() in ["pending", "active"]:
-            raise SubscriptionConflictException(f"У вас уже есть подписка: {sub.plan} со статусом {sub.status.value}. Завершите оплату, чтобы продолжить.")
     try:
         sd = datetime.fromisoformat(start_date.replace("Z", "+00:00"))
     except ValueError:
@@ -51,7 +46,7 @@ async def purchase_subscription(
     sub_data = sub_in.model_dump()
     sub_data["user_id"] = current_user.id
     sub_data["status"] = SubscriptionStatus.pending
-    new_subscription = await subscription_service.create_subscription(db, sub_data)
+    new_subscription = await subscription_service.purchase_subscription(db, sub_data)
     return {
         "message": "Подписка оформлена. Пожалуйста, перейдите к оплате.",
         "subscription": SubscriptionRead.from_orm(new_subscription)
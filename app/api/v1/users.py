@@ -1,20 +1,17 @@
 from fastapi import APIRouter, Depends, status, Response, Form
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timezone, timedelta
 from pydantic import EmailStr
 from typing import Optional
 from app.schemas.users import UserCreate, UserRead, UserUpdate, UserWithSubscription
 from app.services.users_service import UserService
-from app.services.subscriptions_service import SubscriptionService
-from app.schemas.subscriptions import SubscriptionRead
-from app.database.dependencies import get_db_session
+from app.database.dependencies import get_db_session, get_read_session
 from app.exceptions.custom_exceptions import (
     UserAlreadyExistsException,
     UserNotFoundException,
     NoUpdateDataException,
     AuthenticationException
 )
-from app.core.security import verify_password, create_access_token, get_current_user
+from app.core.security import verify_password_async, create_access_token, get_current_user
 from app.models.users import User
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -39,32 +36,13 @@ async def create_user(
 @router.get("/me", response_model=UserWithSubscription)
 async def get_me_info(
     db: AsyncSession = Depends(get_db_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    user_service: UserService = Depends(get_user_service)
 ):
     """
     Возвращает информацию о залогиненном пользователе, включая активную подписку.
     """
-    subscription_service = SubscriptionService()
-    subscriptions = await subscription_service.list_subscriptions(db, skip=0, limit=100)
-    user_sub = next(
-        (sub for sub in subscriptions if sub.user_id == current_user.id and sub.status.value.lower() == "active"), None
-    )
-    now = datetime.now(timezone.utc)
-    if user_sub:
-        end_date = user_sub.end_date if user_sub.end_date else (user_sub.start_date + timedelta(days=30))
-        remaining_days = (end_date - now).days
-        if remaining_days < 0:
-            remaining_days = 0
-        msg = "Подписка активна"
-    else:
-        remaining_days = 0
-        msg = "Подписка отсутствует"
-    return UserWithSubscription(
-        user=UserRead.from_orm(current_user),
-        subscription=SubscriptionRead.from_orm(user_sub) if user_sub else None,
-        remaining_days=remaining_days,
-        message=msg
-    )
+    return await user_service.get_profile_snapshot(db, current_user.id)
 
 @router.post("/login")
 async def login(
@@ -81,7 +59,7 @@ async def login(
         user = await user_service.get_user_by_username(db, username)
     except UserNotFoundException:
         raise AuthenticationException("Неверные учетные данные")
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         raise AuthenticationException("Неверные учетные данные")
     token = create_access_token({"sub": str(user.id)})
     response.set_cookie(
@@ -113,7 +91,7 @@ async def confirm_age(response: Response):
 @router.get("/{user_id}", response_model=UserRead)
 async def get_user(
     user_id: int,
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_read_session),
     user_service: UserService = Depends(get_user_service)
 ):
     """
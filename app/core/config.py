@@ -1,6 +1,6 @@
 # File: app/core/config.py
 from pydantic_settings import BaseSettings
-from typing import Literal
+from typing import List, Literal
 
 class Settings(BaseSettings):
     MODE: Literal["DEV", "TEST", "PROD"]
@@ -17,13 +17,112 @@ class Settings(BaseSettings):
 
     REDIS_HOST: str
     REDIS_PORT: int
+    REDIS_CACHE_ENABLED: bool = False
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_RETRY_INTERVAL: int = 30
+
+    # Поиск по каталогу: полнотекстовый ("fts") или прежний ilike
+    MOVIE_SEARCH_MODE: Literal["fts", "ilike"] = "fts"
+
+    # Размер пачки для массовых вставок и обновлений
+    DB_BULK_BATCH_SIZE: int = 1000
+
+    # Кэш ответов каталога в Redis
+    CATALOG_CACHE_TTL: int = 60
+    CATALOG_CACHE_VERSION_TTL: float = 1.0
+    CATALOG_CACHE_LOCK_TTL_MS: int = 2000
+
+    # Колоночный индекс каталога в памяти процесса (нужен numpy). Перечитывается из базы раз в TTL секунд
+    CATALOG_INDEX_ENABLED: bool = False
+    CATALOG_INDEX_TTL: int = 300
+
+    # Префиксный индекс названий для подсказок /movies/suggest. Результаты префиксов,
+    # под которые попадает больше SUGGEST_MEMO_MIN_MATCHES ключей, запоминаются
+    SUGGEST_INDEX_ENABLED: bool = True
+    SUGGEST_INDEX_TTL: int = 300
+    SUGGEST_MEMO_MIN_MATCHES: int = 500
+
+    # Размер страницы отзывов и его верхняя граница
+    REVIEWS_PAGE_SIZE: int = 20
+    REVIEWS_MAX_PAGE_SIZE: int = 100
+
+    # Похожие фильмы: сколько соседей хранить на фильм и сколько фильмов считать за один блок
+    # (блок — плотная матрица block × число фильмов float32)
+    SIMILAR_MOVIES_TOP_K: int = 20
+    SIMILAR_MOVIES_BLOCK_SIZE: int = 256
+    SIMILAR_MOVIES_STREAM_BATCH: int = 50000
+
+    # Подборки "в тренде" и "лучшие по жанру": период пересборки (0 — только вручную),
+    # длина подборок, окно и период полураспада популярности, сглаживание рейтинга
+    # (фильмы с меньшим числом отзывов в подборки по жанрам не попадают)
+    CHARTS_REFRESH_INTERVAL: int = 600
+    CHARTS_SIZE: int = 50
+    CHARTS_TRENDING_WINDOW_DAYS: int = 14
+    CHARTS_TRENDING_HALF_LIFE_HOURS: float = 72.0
+    CHARTS_MIN_REVIEWS: int = 5
+
+    # Перевод активных подписок с прошедшим end_date в EXPIRED: период запуска
+    # (0 — только вручную) и число подписок в одном UPDATE
+    SUBSCRIPTION_EXPIRY_INTERVAL: int = 300
+    SUBSCRIPTION_EXPIRY_BATCH_SIZE: int = 1000
+
+    # Хэширование паролей вне event loop
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 8
+
+    # Кэш аутентифицированных пользователей (principal cache)
+    PRINCIPAL_CACHE_TTL: int = 900
+    PRINCIPAL_CACHE_LOCAL_TTL: int = 30
+    PRINCIPAL_CACHE_SIZE: int = 10000
+
+    # Кэш прав на просмотр: тарифы пользователя (не дольше окончания подписки)
+    # и требования фильмов к подписке и возрасту
+    ENTITLEMENT_CACHE_TTL: int = 300
+    ENTITLEMENT_CACHE_LOCAL_TTL: int = 30
+    ENTITLEMENT_CACHE_SIZE: int = 10000
+    MOVIE_REQUIREMENT_CACHE_TTL: int = 60
+
+    # Кэш профиля (/users/me и страница профиля): пользователь, активная подписка, оставшиеся дни
+    PROFILE_CACHE_TTL: int = 300
+    PROFILE_CACHE_LOCAL_TTL: int = 30
+    PROFILE_CACHE_SIZE: int = 10000
 
     TEST_DATABASE_URL: str = ""
 
+    # Реплики для чтения: DSN через запятую. Пусто — все запросы идут в основную базу
+    DB_REPLICA_URLS: str = ""
+    # Реплика с отставанием больше порога не используется (0 — не проверять)
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = 5.0
+    # Сколько секунд после собственной записи клиент читает из основной базы
+    DB_READ_YOUR_WRITES_SECONDS: int = 10
+
+    # Пул соединений (в режиме TEST используется NullPool)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    # Пересоздавать соединения старше N секунд (-1 — никогда)
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Кэш подготовленных выражений asyncpg (0 — отключить, нужно за pgbouncer в transaction mode)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Ожидание соединения дольше порога (в секундах) пишется в лог
+    DB_POOL_WAIT_LOG_THRESHOLD: float = 0.1
+
     # Stripe настройки
     STRIPE_SECRET_KEY: str
     STRIPE_PUBLISHABLE_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+    # Клиент Stripe API: пул соединений, таймауты (в секундах), повторы с экспоненциальной
+    # задержкой и случайным разбросом, ограничение числа одновременных запросов
+    STRIPE_API_BASE: str = "https://api.stripe.com"
+    STRIPE_CONNECT_TIMEOUT: float = 3.0
+    STRIPE_TIMEOUT: float = 10.0
+    STRIPE_MAX_CONNECTIONS: int = 20
+    STRIPE_MAX_IN_FLIGHT: int = 20
+    STRIPE_MAX_RETRIES: int = 2
+    STRIPE_RETRY_BACKOFF: float = 0.25
+    STRIPE_RETRY_BACKOFF_MAX: float = 2.0
 
     @property
     def DATABASE_URL(self) -> str:
@@ -31,6 +130,10 @@ class Settings(BaseSettings):
             return self.TEST_DATABASE_URL
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def REPLICA_URLS(self) -> List[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
+
     class Config:
         env_file = ".env"
 
@@ -1,3 +1,6 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 import jwt
@@ -11,17 +14,118 @@ from app.exceptions.custom_exceptions import (
     AuthenticationException,
     InvalidTokenException
 )
-from app.models.users import User
+from app.models.users import User, UserRole
+from app.utils.cache import TieredCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = "Bearer"  # Фиктивное значение
 
+# Кэш пользователей по id: избавляет от запроса в БД на каждый авторизованный запрос
+principal_cache = TieredCache(
+    "principals",
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    local_ttl=settings.PRINCIPAL_CACHE_LOCAL_TTL,
+)
+
+PRINCIPAL_FIELDS = ("id", "email", "username", "role", "created_at", "updated_at")
+
+def _principal_from_user(user: User) -> Dict[str, Any]:
+    data = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+    data["role"] = user.role.value
+    data["created_at"] = user.created_at.isoformat() if user.created_at else None
+    data["updated_at"] = user.updated_at.isoformat() if user.updated_at else None
+    return data
+
+def _user_from_principal(data: Dict[str, Any]) -> User:
+    """
+    Восстанавливает пользователя из кэша. Объект не привязан к сессии
+    и не содержит хэша пароля.
+    """
+    return User(
+        id=data["id"],
+        email=data["email"],
+        username=data["username"],
+        role=UserRole(data["role"]),
+        created_at=datetime.fromisoformat(data["created_at"]) if data["created_at"] else None,
+        updated_at=datetime.fromisoformat(data["updated_at"]) if data["updated_at"] else None,
+    )
+
+async def invalidate_principal(user_id: int) -> None:
+    await principal_cache.delete(int(user_id))
+
+# bcrypt занимает 100–300 мс CPU, поэтому в async-обработчиках он выполняется
+# в отдельном пуле потоков (bcrypt отпускает GIL), а число одновременных
+# вычислений ограничено семафором
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_hash_semaphore: Optional[asyncio.Semaphore] = None
+
+password_hash_stats: Dict[str, Any] = {
+    "calls": 0,
+    "in_flight": 0,
+    "waiting": 0,
+    "queue_time_total": 0.0,
+    "queue_time_max": 0.0,
+    "run_time_total": 0.0,
+}
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def _get_hash_semaphore() -> asyncio.Semaphore:
+    global _hash_semaphore
+    if _hash_semaphore is None:
+        _hash_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+    return _hash_semaphore
+
+async def _run_in_hash_pool(func, *args):
+    queued_at = time.perf_counter()
+    password_hash_stats["waiting"] += 1
+    try:
+        async with _get_hash_semaphore():
+            started = {}
+
+            def job():
+                started["at"] = time.perf_counter()
+                return func(*args)
+
+            password_hash_stats["in_flight"] += 1
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(_hash_executor, job)
+            finally:
+                password_hash_stats["in_flight"] -= 1
+    finally:
+        password_hash_stats["waiting"] -= 1
+    finished_at = time.perf_counter()
+    queue_time = started["at"] - queued_at
+    password_hash_stats["calls"] += 1
+    password_hash_stats["queue_time_total"] += queue_time
+    password_hash_stats["queue_time_max"] = max(password_hash_stats["queue_time_max"], queue_time)
+    password_hash_stats["run_time_total"] += finished_at - started["at"]
+    return result
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+def password_hash_metrics() -> Dict[str, Any]:
+    calls = password_hash_stats["calls"]
+    return {
+        **password_hash_stats,
+        "queue_time_avg": password_hash_stats["queue_time_total"] / calls if calls else None,
+        "run_time_avg": password_hash_stats["run_time_total"] / calls if calls else None,
+        "max_concurrency": settings.PASSWORD_HASH_MAX_CONCURRENCY,
+        "workers": settings.PASSWORD_HASH_WORKERS,
+    }
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta if expires_delta else timedelta(minutes=15))
@@ -54,6 +158,13 @@ async def get_current_user(
     user_id: Optional[str] = payload.get("sub")
     if user_id is None:
         raise AuthenticationException("Неверные учетные данные")
+    cached = await principal_cache.get(int(user_id))
+    if cached is not None:
+        return _user_from_principal(cached)
     from app.services.users_service import UserService
     user_service = UserService()
-    return await user_service.get_user_by_id(db, int(user_id))
+    user = await user_service.get_user_by_id(db, int(user_id))
+    # Запись не должна пережить токен, которым она была получена
+    ttl = payload["exp"] - datetime.now(timezone.utc).timestamp() if "exp" in payload else None
+    await principal_cache.set(user.id, _principal_from_user(user), ttl)
+    return user
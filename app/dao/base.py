@@ -2,28 +2,68 @@
 import enum
 from typing import Any, Dict
 from collections import deque
-from typing import Type, TypeVar, Generic, List, Optional, Any, Dict
+from typing import Type, TypeVar, Generic, List, Optional, Any, Dict, Tuple, Iterator, Sequence
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.sql import Select
 from sqlalchemy.exc import SQLAlchemyError
+from app.core.config import settings
 from app.database.base import Base
+from app.database.unit_of_work import in_unit_of_work
+from app.utils.pagination import decode_cursor, keyset_condition, keyset_order_by, next_cursor_for
 
 ModelType = TypeVar("ModelType", bound=Base)
 
 def _normalize_obj_in(obj_in: Dict[str, Any]) -> Dict[str, Any]:
     return {k: (v.value.upper() if isinstance(v, enum.Enum) else v) for k, v in obj_in.items()}
 
+def _chunks(rows: List[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
 class BaseDAO(Generic[ModelType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
-    async def get_by_id(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+    @staticmethod
+    async def _commit(db: AsyncSession) -> None:
+        """
+        Внутри единицы работы изменения только отправляются в базу (flush),
+        коммит делает владелец транзакции. Иначе — фиксируем сразу.
+        """
+        if in_unit_of_work(db):
+            await db.flush()
+        else:
+            await db.commit()
+
+    @staticmethod
+    async def _rollback(db: AsyncSession) -> None:
+        if not in_unit_of_work(db):
+            await db.rollback()
+
+    async def get_by_id(self, db: AsyncSession, id: Any, options: Sequence[Any] = ()) -> Optional[ModelType]:
         try:
-            result = await db.execute(select(self.model).where(self.model.id == id))
+            result = await db.execute(select(self.model).where(self.model.id == id).options(*options))
             return result.scalars().first()
         except SQLAlchemyError as e:
             raise e
 
+    async def get_by_ids(self, db: AsyncSession, ids: Sequence[Any], options: Sequence[Any] = ()) -> List[ModelType]:
+        """
+        Возвращает объекты в порядке переданных id; отсутствующие id пропускаются.
+        options — опции загрузки (например, load_only).
+        """
+        if not ids:
+            return []
+        try:
+            result = await db.execute(select(self.model).where(self.model.id.in_(ids)).options(*options))
+            by_id = {obj.id: obj for obj in result.scalars().all()}
+            return [by_id[id] for id in ids if id in by_id]
+        except SQLAlchemyError as e:
+            raise e
+
     async def list(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[ModelType]:
         try:
             result = await db.execute(select(self.model).offset(skip).limit(limit))
@@ -31,16 +71,50 @@ class BaseDAO(Generic[ModelType]):
         except SQLAlchemyError as e:
             raise e
 
+    async def list_keyset(
+        self,
+        db: AsyncSession,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort_by: str = "id",
+        order: str = "asc",
+        filters: Sequence[Any] = (),
+        base_stmt: Optional[Select] = None
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Постраничная выборка по курсору: стоимость страницы не зависит от её номера.
+        filters — дополнительные условия WHERE; base_stmt — исходный select(self.model)
+        с нужными join и опциями загрузки.
+        Возвращает записи и курсор следующей страницы (None, если страниц больше нет).
+        """
+        column = getattr(self.model, sort_by)
+        descending = order.lower() == "desc"
+        stmt = base_stmt if base_stmt is not None else select(self.model)
+        stmt = stmt.order_by(*keyset_order_by(column, self.model.id, descending))
+        if filters:
+            stmt = stmt.where(*filters)
+        if cursor:
+            position = decode_cursor(cursor, sort_by, order.lower())
+            stmt = stmt.where(keyset_condition(column, self.model.id, position["value"], position["id"], descending))
+        try:
+            result = await db.execute(stmt.limit(limit))
+            items = result.scalars().all()
+        except SQLAlchemyError as e:
+            raise e
+        return items, next_cursor_for(items, limit, sort_by, order.lower(), lambda obj: getattr(obj, sort_by))
+
+    # Значения по умолчанию вычисляются на стороне Python, а id возвращается через
+    # RETURNING при flush, поэтому после коммита refresh не нужен
+    # (сессии создаются с expire_on_commit=False).
     async def create(self, db: AsyncSession, obj_in: Dict[str, Any]) -> ModelType:
         normalized_obj_in = _normalize_obj_in(obj_in)
         db_obj = self.model(**normalized_obj_in)
         db.add(db_obj)
         try:
-            await db.commit()
-            await db.refresh(db_obj)
+            await self._commit(db)
             return db_obj
         except SQLAlchemyError as e:
-            await db.rollback()
+            await self._rollback(db)
             raise e
 
     async def update(self, db: AsyncSession, db_obj: ModelType, obj_in: Dict[str, Any]) -> ModelType:
@@ -49,11 +123,32 @@ class BaseDAO(Generic[ModelType]):
             setattr(db_obj, field, value)
         try:
             db.add(db_obj)
-            await db.commit()
-            await db.refresh(db_obj)
+            await self._commit(db)
             return db_obj
         except SQLAlchemyError as e:
-            await db.rollback()
+            await self._rollback(db)
+            raise e
+
+    async def update_by_id(self, db: AsyncSession, id: Any, obj_in: Dict[str, Any]) -> Optional[ModelType]:
+        """
+        Обновляет запись одним UPDATE ... RETURNING без предварительного SELECT.
+        Возвращает обновлённую запись или None, если записи с таким id нет.
+        """
+        normalized_obj_in = _normalize_obj_in({k: v for k, v in obj_in.items() if v is not None})
+        stmt = (
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**normalized_obj_in)
+            .returning(self.model)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        try:
+            result = await db.scalars(stmt)
+            db_obj = result.first()
+            await self._commit(db)
+            return db_obj
+        except SQLAlchemyError as e:
+            await self._rollback(db)
             raise e
 
     async def delete(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
@@ -61,9 +156,87 @@ class BaseDAO(Generic[ModelType]):
         if db_obj:
             try:
                 await db.delete(db_obj)
-                await db.commit()
+                await self._commit(db)
                 return db_obj
             except SQLAlchemyError as e:
-                await db.rollback()
+                await self._rollback(db)
                 raise e
         return None
+
+    async def bulk_create(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[Dict[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> List[ModelType]:
+        """
+        Вставляет записи пачками (многострочный INSERT ... RETURNING) в одной транзакции.
+        """
+        rows = [_normalize_obj_in(obj_in) for obj_in in objs_in]
+        created: List[ModelType] = []
+        try:
+            for chunk in _chunks(rows, batch_size or settings.DB_BULK_BATCH_SIZE):
+                result = await db.scalars(insert(self.model).returning(self.model), chunk)
+                created.extend(result.all())
+            await self._commit(db)
+            return created
+        except SQLAlchemyError as e:
+            await self._rollback(db)
+            raise e
+
+    async def bulk_update(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[Dict[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> int:
+        """
+        Обновляет записи по первичному ключу: каждый словарь должен содержать "id".
+        Возвращает количество переданных записей.
+        """
+        rows = [_normalize_obj_in(obj_in) for obj_in in objs_in]
+        try:
+            for chunk in _chunks(rows, batch_size or settings.DB_BULK_BATCH_SIZE):
+                await db.execute(update(self.model), chunk)
+            await self._commit(db)
+            return len(rows)
+        except SQLAlchemyError as e:
+            await self._rollback(db)
+            raise e
+
+    async def upsert(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+        batch_size: Optional[int] = None
+    ) -> List[ModelType]:
+        """
+        INSERT ... ON CONFLICT (index_elements) DO UPDATE ... RETURNING пачками.
+        Если обновлять нечего, конфликтующие строки пропускаются (DO NOTHING)
+        и в результат не попадают.
+        """
+        rows = [_normalize_obj_in(obj_in) for obj_in in objs_in]
+        upserted: List[ModelType] = []
+        try:
+            for chunk in _chunks(rows, batch_size or settings.DB_BULK_BATCH_SIZE):
+                stmt = pg_insert(self.model).values(chunk)
+                fields = update_fields if update_fields is not None else [
+                    key for key in chunk[0] if key not in index_elements
+                ]
+                if fields:
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=list(index_elements),
+                        set_={field: stmt.excluded[field] for field in fields}
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+                stmt = stmt.returning(self.model).execution_options(populate_existing=True)
+                result = await db.scalars(stmt)
+                upserted.extend(result.all())
+            await self._commit(db)
+            return upserted
+        except SQLAlchemyError as e:
+            await self._rollback(db)
+            raise e
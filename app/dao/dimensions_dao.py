@@ -0,0 +1,32 @@
+# File: app/dao/dimensions_dao.py
+from typing import Dict, Iterable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.dao.base import BaseDAO, ModelType
+from app.models.countries import Country
+from app.models.genres import Genre
+from app.utils.dimensions import dimension_slug
+
+class DimensionDAO(BaseDAO[ModelType]):
+    async def ensure(self, db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Возвращает словарь slug -> id, добавляя в справочник недостающие значения.
+        """
+        by_slug: Dict[str, str] = {}
+        for name in names:
+            by_slug.setdefault(dimension_slug(name), " ".join(name.split()))
+        if not by_slug:
+            return {}
+        await self.upsert(
+            db, [{"name": name, "slug": slug} for slug, name in by_slug.items()], ["slug"], update_fields=[]
+        )
+        result = await db.execute(select(self.model.id, self.model.slug).where(self.model.slug.in_(list(by_slug))))
+        return {slug: id for id, slug in result.all()}
+
+class GenreDAO(DimensionDAO[Genre]):
+    def __init__(self):
+        super().__init__(Genre)
+
+class CountryDAO(DimensionDAO[Country]):
+    def __init__(self):
+        super().__init__(Country)
@@ -1,8 +1,105 @@
 # File: app/dao/movies_dao.py
+from typing import Dict, List, Sequence
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from app.core.config import settings
 from app.models.movies import Movie
-from app.dao.base import BaseDAO
+from app.models.genres import movie_genres
+from app.models.similarities import MovieSimilarity
+from app.models.charts import MovieChart
+from app.dao.base import BaseDAO, _chunks
 
 class MovieDAO(BaseDAO[Movie]):
     def __init__(self):
         super().__init__(Movie)
+
+    async def set_genres(self, db: AsyncSession, genre_ids_by_movie: Dict[int, List[int]]) -> None:
+        """
+        Заменяет жанры у переданных фильмов.
+        """
+        if not genre_ids_by_movie:
+            return
+        rows = [
+            {"movie_id": movie_id, "genre_id": genre_id}
+            for movie_id, genre_ids in genre_ids_by_movie.items()
+            for genre_id in genre_ids
+        ]
+        try:
+            await db.execute(delete(movie_genres).where(movie_genres.c.movie_id.in_(list(genre_ids_by_movie))))
+            for chunk in _chunks(rows, settings.DB_BULK_BATCH_SIZE):
+                await db.execute(insert(movie_genres), chunk)
+            await self._commit(db)
+        except SQLAlchemyError as e:
+            await self._rollback(db)
+            raise e
+
+    async def apply_review_delta(
+        self,
+        db: AsyncSession,
+        movie_id: int,
+        count_delta: int,
+        sum_delta: int,
+        histogram_delta: Dict[int, int]
+    ) -> None:
+        """
+        Изменяет агрегаты отзывов фильма на приращения одним UPDATE, без пересчёта по reviews.
+        histogram_delta — оценка -> изменение числа отзывов с этой оценкой.
+        """
+        values = {
+            # Новый отзыв не считается изменением самого фильма
+            Movie.updated_at: Movie.updated_at,
+            Movie.review_count: Movie.review_count + count_delta,
+            Movie.rating_sum: Movie.rating_sum + sum_delta,
+        }
+        for rating, delta in histogram_delta.items():
+            if delta:
+                values[Movie.rating_histogram[rating]] = Movie.rating_histogram[rating] + delta
+        try:
+            await db.execute(
+                update(Movie)
+                .where(Movie.id == movie_id)
+                .values(values)
+                .execution_options(synchronize_session=False)
+            )
+            await self._commit(db)
+        except SQLAlchemyError as e:
+            await self._rollback(db)
+            raise e
+
+    async def get_similar(self, db: AsyncSession, movie_id: int, limit: int) -> List[Movie]:
+        """
+        Похожие фильмы из предрасчитанной таблицы movie_similarities, по убыванию близости.
+        """
+        stmt = (
+            select(Movie)
+            .join(MovieSimilarity, MovieSimilarity.similar_movie_id == Movie.id)
+            .where(MovieSimilarity.movie_id == movie_id)
+            .order_by(MovieSimilarity.score.desc(), Movie.id)
+            .limit(limit)
+        )
+        try:
+            result = await db.execute(stmt)
+            return result.scalars().all()
+        except SQLAlchemyError as e:
+            raise e
+
+    async def get_charts(self, db: AsyncSession, charts: Sequence[str], limit: int) -> Dict[str, List[Movie]]:
+        """
+        Первые limit фильмов каждой подборки одним запросом по первичному ключу movie_charts.
+        Подборки, которых нет, возвращаются пустыми.
+        """
+        stmt = (
+            select(MovieChart.chart, Movie)
+            .join(Movie, Movie.id == MovieChart.movie_id)
+            .where(MovieChart.chart.in_(list(charts)), MovieChart.rank <= limit)
+            .order_by(MovieChart.chart, MovieChart.rank)
+        )
+        try:
+            result = await db.execute(stmt)
+        except SQLAlchemyError as e:
+            raise e
+        movies: Dict[str, List[Movie]] = {chart: [] for chart in charts}
+        for chart, movie in result.all():
+            movies[chart].append(movie)
+        return movies
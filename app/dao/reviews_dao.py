@@ -1,8 +1,37 @@
 # File: app/dao/reviews_dao.py
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.sql import Select
+from app.models.movies import Movie
 from app.models.reviews import Review
+from app.models.users import User
 from app.dao.base import BaseDAO
 
 class ReviewDAO(BaseDAO[Review]):
     def __init__(self):
         super().__init__(Review)
+
+    async def get_for_update(self, db: AsyncSession, id: int) -> Optional[Review]:
+        """
+        Читает отзыв с блокировкой строки до конца транзакции, чтобы параллельные
+        изменения одного отзыва не применили приращения агрегатов по устаревшим данным.
+        """
+        stmt = select(Review).where(Review.id == id).with_for_update().execution_options(populate_existing=True)
+        result = await db.execute(stmt)
+        return result.scalars().first()
+
+    def with_author_stmt(self, with_movie: bool = False) -> Select:
+        """
+        Отзывы вместе с именем автора (и, при with_movie, названием фильма) одним запросом:
+        связи заполняются из JOIN, из users и movies читаются только нужные колонки.
+        """
+        stmt = (
+            select(Review)
+            .join(Review.user)
+            .options(contains_eager(Review.user).load_only(User.id, User.username))
+        )
+        if with_movie:
+            stmt = stmt.join(Review.movie).options(contains_eager(Review.movie).load_only(Movie.id, Movie.title))
+        return stmt
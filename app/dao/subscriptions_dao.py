@@ -1,8 +1,77 @@
 # File: app/dao/subscriptions_dao.py
+from typing import Any, Dict, Optional, Sequence
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.subscriptions import Subscription
-from app.dao.base import BaseDAO
+from sqlalchemy.future import select
+from app.models.subscriptions import OPEN_STATUSES_PREDICATE, Subscription, SubscriptionStatus
+from app.dao.base import BaseDAO, _normalize_obj_in
 
 class SubscriptionDAO(BaseDAO[Subscription]):
     def __init__(self):
         super().__init__(Subscription)
+
+    async def get_by_user_and_status(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        statuses: Sequence[SubscriptionStatus]
+    ) -> Optional[Subscription]:
+        """
+        Возвращает самую свежую подписку пользователя с одним из указанных статусов.
+        Запрос обслуживается индексом ix_subscriptions_user_id_status.
+        """
+        try:
+            stmt = (
+                select(Subscription)
+                .where(Subscription.user_id == user_id, Subscription.status.in_(statuses))
+                .order_by(Subscription.start_date.desc(), Subscription.id.desc())
+                .limit(1)
+            )
+            result = await db.execute(stmt)
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            raise e
+
+    async def create_if_none_open(self, db: AsyncSession, obj_in: Dict[str, Any]) -> Optional[Subscription]:
+        """
+        Создаёт подписку одним INSERT ... ON CONFLICT DO NOTHING RETURNING: если у пользователя
+        уже есть ожидающая оплаты или активная подписка (уникальный частичный индекс
+        uq_subscriptions_user_open), ничего не вставляется и возвращается None.
+        Одновременные запросы одного пользователя создают не больше одной подписки.
+        """
+        stmt = (
+            pg_insert(Subscription)
+            .values(**_normalize_obj_in(obj_in))
+            .on_conflict_do_nothing(
+                index_elements=[Subscription.user_id],
+                index_where=text(OPEN_STATUSES_PREDICATE),
+            )
+            .returning(Subscription)
+        )
+        try:
+            result = await db.scalars(stmt)
+            db_obj = result.first()
+            await self._commit(db)
+            return db_obj
+        except SQLAlchemyError as e:
+            await self._rollback(db)
+            raise e
+
+    async def get_by_user_and_plan(self, db: AsyncSession, user_id: int, plan: str) -> Optional[Subscription]:
+        """
+        Возвращает самую свежую подписку пользователя на тариф plan без учёта регистра.
+        Запрос обслуживается индексом ix_subscriptions_user_id_lower_plan.
+        """
+        try:
+            stmt = (
+                select(Subscription)
+                .where(Subscription.user_id == user_id, func.lower(Subscription.plan) == plan.lower())
+                .order_by(Subscription.start_date.desc(), Subscription.id.desc())
+                .limit(1)
+            )
+            result = await db.execute(stmt)
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            raise e
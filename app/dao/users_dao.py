@@ -1,8 +1,12 @@
 # File: app/dao/users_dao.py
+from datetime import timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+from sqlalchemy import Integer, and_, cast, func
+from sqlalchemy.engine import Row
 from sqlalchemy.future import select
 from app.models.users import User
+from app.models.subscriptions import Subscription, SubscriptionStatus
 from app.dao.base import BaseDAO
 
 class UserDAO(BaseDAO[User]):
@@ -22,3 +26,27 @@ class UserDAO(BaseDAO[User]):
             return result.scalars().first()
         except Exception as e:
             raise e
+
+    async def get_profile(self, db: AsyncSession, user_id: int) -> Optional[Row]:
+        """
+        Пользователь, его активная подписка (или None) и число оставшихся дней подписки
+        одним запросом с LEFT JOIN. Активная подписка у пользователя не больше одной
+        (индекс uq_subscriptions_user_open). Без end_date подписка считается 30-дневной.
+        """
+        end_date = func.coalesce(Subscription.end_date, Subscription.start_date + timedelta(days=30))
+        remaining_days = cast(
+            func.greatest(func.floor(func.extract("epoch", end_date - func.now()) / 86400), 0), Integer
+        )
+        stmt = (
+            select(User, Subscription, remaining_days.label("remaining_days"))
+            .outerjoin(
+                Subscription,
+                and_(Subscription.user_id == User.id, Subscription.status == SubscriptionStatus.ACTIVE),
+            )
+            .where(User.id == user_id)
+        )
+        try:
+            result = await db.execute(stmt)
+            return result.first()
+        except Exception as e:
+            raise e
@@ -4,17 +4,33 @@ from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
 from app.core.config import settings
+from app.database.pool_metrics import InstrumentedAsyncPool, instrument_engine
 
 if settings.MODE == "TEST":
     DATABASE_URL = settings.TEST_DATABASE_URL
     DATABASE_PARAMS = {"poolclass": NullPool}
 else:
     DATABASE_URL = settings.DATABASE_URL
-    DATABASE_PARAMS = {}
+    DATABASE_PARAMS = {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    }
 
-engine = create_async_engine(DATABASE_URL, **DATABASE_PARAMS)
+engine = instrument_engine(create_async_engine(DATABASE_URL, **DATABASE_PARAMS), "primary")
 
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# Реплики только для чтения; маршрутизация — в app/database/routing.py
+replica_engines = [
+    instrument_engine(create_async_engine(url, **DATABASE_PARAMS), f"replica-{i}")
+    for i, url in enumerate(settings.REPLICA_URLS)
+]
+replica_session_makers = [async_sessionmaker(e, expire_on_commit=False) for e in replica_engines]
+
 class Base(DeclarativeBase):
     pass
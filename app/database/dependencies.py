@@ -1,8 +1,21 @@
 # File: app/database/dependencies.py
 from typing import AsyncGenerator
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.base import async_session_maker
+from app.database.routing import replica_router, parse_primary_until, PRIMARY_UNTIL_COOKIE
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия только для чтения: реплика, если она есть и не отстаёт,
+    иначе основная база. После собственной записи клиент какое-то время
+    читает из основной базы (см. ReadYourWritesMiddleware).
+    """
+    primary_until = parse_primary_until(request.cookies.get(PRIMARY_UNTIL_COOKIE))
+    session_maker = await replica_router.session_maker_for(primary_until)
+    async with session_maker() as session:
+        yield session
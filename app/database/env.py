@@ -13,6 +13,10 @@ sys.path.insert(0, dirname(dirname(dirname(abspath(__file__)))))
 # Импорт моделей, чтобы они попали в метаданные
 from app.models.users import User
 from app.models.movies import Movie
+from app.models.genres import Genre
+from app.models.countries import Country
+from app.models.similarities import MovieSimilarity
+from app.models.charts import MovieChart
 from app.models.subscriptions import Subscription
 from app.models.payments import Payment
 from app.models.reviews import Review  # <--- Добавлено, чтобы таблица reviews была в метаданных
@@ -0,0 +1,140 @@
+# File: app/database/pool_metrics.py
+import bisect
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы ожидания соединения, в секундах
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Пулы, о которых отдаётся статистика: имя -> движок
+instrumented_engines: Dict[str, AsyncEngine] = {}
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.connected_at: Dict[int, float] = {}
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+        self.wait_count += 1
+        self.wait_sum += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def histogram(self) -> Dict[str, int]:
+        """Кумулятивная гистограмма в формате le -> count."""
+        result, total = {}, 0
+        for bound, count in zip(list(WAIT_BUCKETS) + ["+Inf"], self.wait_buckets):
+            total += count
+            result[str(bound)] = total
+        return result
+
+    def connection_ages(self) -> Dict[str, Optional[float]]:
+        now = time.time()
+        ages = [now - connected_at for connected_at in self.connected_at.values()]
+        return {
+            "count": len(ages),
+            "max": round(max(ages), 3) if ages else None,
+            "avg": round(sum(ages) / len(ages), 3) if ages else None,
+        }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, измеряющий время ожидания свободного соединения.
+    Долгие ожидания пишутся в лог событием db_pool_wait.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        self.pool_name = "unnamed"
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        pool.pool_name = self.pool_name
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.metrics.observe_wait(waited)
+            if waited >= settings.DB_POOL_WAIT_LOG_THRESHOLD:
+                logger.warning(json.dumps({
+                    "event": "db_pool_wait",
+                    "pool": self.pool_name,
+                    "wait_ms": round(waited * 1000, 2),
+                    "checked_out": self.checkedout(),
+                    "overflow": self.overflow(),
+                    "size": self.size(),
+                }))
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> AsyncEngine:
+    """Регистрирует движок для отдачи статистики и отслеживает возраст соединений."""
+    pool = engine.sync_engine.pool
+    instrumented_engines[name] = engine
+    if not isinstance(pool, InstrumentedAsyncPool):
+        return engine
+    pool.pool_name = name
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        engine.sync_engine.pool.metrics.connects += 1
+        engine.sync_engine.pool.metrics.connected_at[id(dbapi_connection)] = time.time()
+
+    @event.listens_for(engine.sync_engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        engine.sync_engine.pool.metrics.disconnects += 1
+        engine.sync_engine.pool.metrics.connected_at.pop(id(dbapi_connection), None)
+
+    return engine
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    stats = {}
+    for name, engine in instrumented_engines.items():
+        pool = engine.sync_engine.pool
+        data: Dict[str, Any] = {"status": pool.status()}
+        if isinstance(pool, InstrumentedAsyncPool):
+            metrics = pool.metrics
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "timeouts": metrics.timeouts,
+                "connects": metrics.connects,
+                "disconnects": metrics.disconnects,
+                "wait_count": metrics.wait_count,
+                "wait_avg_ms": round(metrics.wait_sum / metrics.wait_count * 1000, 3) if metrics.wait_count else None,
+                "wait_max_ms": round(metrics.wait_max * 1000, 3),
+                "wait_histogram": metrics.histogram(),
+                "connection_age_seconds": metrics.connection_ages(),
+            })
+        stats[name] = data
+    return stats
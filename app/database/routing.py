@@ -0,0 +1,103 @@
+# File: app/database/routing.py
+import itertools
+import logging
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.core.config import settings
+from app.database.base import async_session_maker, replica_engines, replica_session_makers
+
+logger = logging.getLogger(__name__)
+
+# Cookie, по которой клиент после собственной записи читает из основной базы
+PRIMARY_UNTIL_COOKIE = "db_primary_until"
+
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """
+    Выбирает фабрику сессий для чтения: реплику по кругу или основную базу,
+    если реплик нет, все они отстают больше допустимого, либо клиент недавно писал.
+    Отставание каждой реплики проверяется не чаще раза в check_interval секунд.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replicas: Sequence[Tuple[AsyncEngine, async_sessionmaker]],
+        max_lag: float,
+        check_interval: float
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lag: Dict[int, Optional[float]] = {}
+        self._checked_at: Dict[int, float] = {}
+        self._cycle = itertools.cycle(range(len(self.replicas)))
+        self.stats = {"replica_reads": 0, "primary_reads": 0, "sticky_reads": 0, "lag_fallbacks": 0}
+
+    async def _replica_lag(self, index: int) -> Optional[float]:
+        """Отставание реплики в секундах или None, если реплика недоступна."""
+        now = time.monotonic()
+        if now - self._checked_at.get(index, 0.0) < self.check_interval:
+            return self._lag.get(index)
+        engine, _ = self.replicas[index]
+        try:
+            async with engine.connect() as conn:
+                lag = float(await conn.scalar(REPLICA_LAG_QUERY))
+        except Exception as e:
+            logger.warning(f"Реплика {index} недоступна для проверки отставания: {e}")
+            lag = None
+        self._lag[index] = lag
+        self._checked_at[index] = now
+        return lag
+
+    async def _healthy_replica(self) -> Optional[async_sessionmaker]:
+        for _ in range(len(self.replicas)):
+            index = next(self._cycle)
+            if self.max_lag <= 0:
+                return self.replicas[index][1]
+            lag = await self._replica_lag(index)
+            if lag is not None and lag <= self.max_lag:
+                return self.replicas[index][1]
+        return None
+
+    async def session_maker_for(self, primary_until: Optional[float] = None) -> async_sessionmaker:
+        if not self.replicas:
+            self.stats["primary_reads"] += 1
+            return self.primary
+        if primary_until and primary_until > time.time():
+            self.stats["sticky_reads"] += 1
+            return self.primary
+        session_maker = await self._healthy_replica()
+        if session_maker is None:
+            self.stats["lag_fallbacks"] += 1
+            return self.primary
+        self.stats["replica_reads"] += 1
+        return session_maker
+
+    def snapshot(self) -> Dict[str, object]:
+        return {**self.stats, "replicas": len(self.replicas), "lag": dict(self._lag)}
+
+
+replica_router = ReplicaRouter(
+    async_session_maker,
+    list(zip(replica_engines, replica_session_makers)),
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DB_REPLICA_LAG_CHECK_INTERVAL,
+)
+
+
+def parse_primary_until(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
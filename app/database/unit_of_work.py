@@ -0,0 +1,44 @@
+# File: app/database/unit_of_work.py
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+
+UNIT_OF_WORK_KEY = "unit_of_work"
+AFTER_COMMIT_KEY = "after_commit"
+
+def in_unit_of_work(db: AsyncSession) -> bool:
+    return bool(db.info.get(UNIT_OF_WORK_KEY))
+
+async def run_after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """
+    Выполняет callback (например, сброс кэша) после фиксации изменений: внутри единицы
+    работы — после её коммита, иначе сразу (DAO вне единицы работы коммитят сами).
+    """
+    if in_unit_of_work(db):
+        db.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+    else:
+        await callback()
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Единица работы: DAO внутри блока только отправляют изменения (flush),
+    а фиксация выполняется одним коммитом при выходе из блока.
+    При исключении транзакция откатывается. Вложенные блоки присоединяются
+    к внешнему. Колбэки run_after_commit выполняются только после успешного коммита.
+    """
+    if in_unit_of_work(db):
+        yield db
+        return
+    db.info[UNIT_OF_WORK_KEY] = True
+    try:
+        yield db
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    finally:
+        db.info.pop(UNIT_OF_WORK_KEY, None)
+        callbacks = db.info.pop(AFTER_COMMIT_KEY, [])
+    for callback in callbacks:
+        await callback()
@@ -0,0 +1,26 @@
+"""subscriptions user_id/status index
+
+Revision ID: 3f9c1a7d2b10
+Revises: None
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1a7d2b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_index(
+        "ix_subscriptions_user_id_status",
+        "subscriptions",
+        ["user_id", "status"],
+    )
+
+def downgrade():
+    op.drop_index("ix_subscriptions_user_id_status", table_name="subscriptions")
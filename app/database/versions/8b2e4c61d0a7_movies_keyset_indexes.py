@@ -0,0 +1,26 @@
+"""movies keyset pagination indexes
+
+Revision ID: 8b2e4c61d0a7
+Revises: 3f9c1a7d2b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4c61d0a7'
+down_revision = '3f9c1a7d2b10'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_index("ix_movies_rating_id", "movies", ["rating", "id"])
+    op.create_index("ix_movies_release_date_id", "movies", ["release_date", "id"])
+    op.create_index("ix_movies_title_id", "movies", ["title", "id"])
+
+def downgrade():
+    op.drop_index("ix_movies_title_id", table_name="movies")
+    op.drop_index("ix_movies_release_date_id", table_name="movies")
+    op.drop_index("ix_movies_rating_id", table_name="movies")
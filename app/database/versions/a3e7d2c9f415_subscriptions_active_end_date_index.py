@@ -0,0 +1,27 @@
+"""subscriptions partial index for the expiry sweeper
+
+Revision ID: a3e7d2c9f415
+Revises: f1c7a9e4d308
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a3e7d2c9f415'
+down_revision = 'f1c7a9e4d308'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_index(
+        "ix_subscriptions_active_end_date",
+        "subscriptions",
+        ["end_date"],
+        postgresql_where=sa.text("status = 'ACTIVE'"),
+    )
+
+def downgrade():
+    op.drop_index("ix_subscriptions_active_end_date", table_name="subscriptions")
@@ -0,0 +1,54 @@
+"""movie review aggregates
+
+Revision ID: a7d4e2c9b813
+Revises: e5a8b3f27c14
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4e2c9b813'
+down_revision = 'e5a8b3f27c14'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+RATING_MAX = 10
+
+def upgrade():
+    op.add_column("movies", sa.Column("review_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("movies", sa.Column("rating_sum", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column(
+        "movies",
+        sa.Column(
+            "rating_histogram",
+            postgresql.ARRAY(sa.Integer()),
+            nullable=False,
+            server_default="{" + ",".join(["0"] * RATING_MAX) + "}",
+        ),
+    )
+    histogram = ", ".join(f"count(*) FILTER (WHERE rating = {i})" for i in range(1, RATING_MAX + 1))
+    op.execute(f"""
+        UPDATE movies SET
+            review_count = r.review_count,
+            rating_sum = r.rating_sum,
+            rating_histogram = r.rating_histogram
+        FROM (
+            SELECT movie_id,
+                   count(*)::int AS review_count,
+                   sum(rating)::int AS rating_sum,
+                   ARRAY[{histogram}]::int[] AS rating_histogram
+            FROM reviews
+            WHERE is_deleted IS NOT TRUE
+            GROUP BY movie_id
+        ) r
+        WHERE movies.id = r.movie_id
+    """)
+
+def downgrade():
+    op.drop_column("movies", "rating_histogram")
+    op.drop_column("movies", "rating_sum")
+    op.drop_column("movies", "review_count")
@@ -0,0 +1,27 @@
+"""partial index for the movie review feed
+
+Revision ID: b2f6c8d1e4a9
+Revises: a7d4e2c9b813
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b2f6c8d1e4a9'
+down_revision = 'a7d4e2c9b813'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_index(
+        "ix_reviews_movie_id_created_at_live",
+        "reviews",
+        ["movie_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        postgresql_where=sa.text("is_deleted = false"),
+    )
+
+def downgrade():
+    op.drop_index("ix_reviews_movie_id_created_at_live", table_name="reviews")
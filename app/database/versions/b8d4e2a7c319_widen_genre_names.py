@@ -0,0 +1,26 @@
+"""widen genre name and slug to the length of movies.genre
+
+Revision ID: b8d4e2a7c319
+Revises: c6b1f4e8a2d7
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4e2a7c319'
+down_revision = 'c6b1f4e8a2d7'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # movies.genre вмещает 255 символов, а справочник жанров — только 50:
+    # длинный жанр проходил в фильм, но падал при записи в genres
+    op.alter_column("genres", "name", type_=sa.String(length=255), existing_type=sa.String(length=50), existing_nullable=False)
+    op.alter_column("genres", "slug", type_=sa.String(length=255), existing_type=sa.String(length=50), existing_nullable=False)
+
+def downgrade():
+    op.alter_column("genres", "slug", type_=sa.String(length=50), existing_type=sa.String(length=255), existing_nullable=False)
+    op.alter_column("genres", "name", type_=sa.String(length=50), existing_type=sa.String(length=255), existing_nullable=False)
@@ -0,0 +1,33 @@
+"""movies full-text search vector
+
+Revision ID: c41d7e9a5f32
+Revises: 8b2e4c61d0a7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a5f32'
+down_revision = '8b2e4c61d0a7'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+def upgrade():
+    op.add_column(
+        "movies",
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True)),
+    )
+    op.create_index("ix_movies_search_vector", "movies", ["search_vector"], postgresql_using="gin")
+
+def downgrade():
+    op.drop_index("ix_movies_search_vector", table_name="movies")
+    op.drop_column("movies", "search_vector")
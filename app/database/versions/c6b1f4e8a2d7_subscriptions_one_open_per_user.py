@@ -0,0 +1,46 @@
+"""at most one pending or active subscription per user
+
+Revision ID: c6b1f4e8a2d7
+Revises: a3e7d2c9f415
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c6b1f4e8a2d7'
+down_revision = 'a3e7d2c9f415'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Лишние открытые подписки (созданные до появления индекса) отменяются:
+    # у пользователя остаётся активная, а среди ожидающих — самая свежая
+    op.execute(
+        """
+        UPDATE subscriptions SET status = 'CANCELLED', updated_at = now()
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user_id
+                    ORDER BY status = 'ACTIVE' DESC, start_date DESC, id DESC
+                ) AS position
+                FROM subscriptions
+                WHERE status IN ('PENDING', 'ACTIVE')
+            ) ranked
+            WHERE position > 1
+        )
+        """
+    )
+    op.create_index(
+        "uq_subscriptions_user_open",
+        "subscriptions",
+        ["user_id"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('PENDING', 'ACTIVE')"),
+    )
+
+def downgrade():
+    op.drop_index("uq_subscriptions_user_open", table_name="subscriptions")
@@ -0,0 +1,23 @@
+"""movies lower(title) prefix index for suggestions
+
+Revision ID: d3a9f6c1e5b4
+Revises: b8d4e2a7c319
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9f6c1e5b4'
+down_revision = 'b8d4e2a7c319'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Запасной путь подсказок: lower(title) LIKE 'префикс%' читает этот индекс, а не всю таблицу
+    op.execute("CREATE INDEX ix_movies_title_lower_pattern ON movies (lower(title) text_pattern_ops)")
+
+def downgrade():
+    op.drop_index("ix_movies_title_lower_pattern", table_name="movies")
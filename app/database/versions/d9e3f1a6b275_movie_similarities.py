@@ -0,0 +1,37 @@
+"""movie similarities table
+
+Revision ID: d9e3f1a6b275
+Revises: b2f6c8d1e4a9
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd9e3f1a6b275'
+down_revision = 'b2f6c8d1e4a9'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_table(
+        "movie_similarities",
+        sa.Column("movie_id", sa.Integer(), sa.ForeignKey("movies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("similar_movie_id", sa.Integer(), sa.ForeignKey("movies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("movie_id", "similar_movie_id"),
+    )
+    op.create_index(
+        "ix_movie_similarities_movie_id_score",
+        "movie_similarities",
+        ["movie_id", sa.text("score DESC")],
+    )
+    op.create_index("ix_movie_similarities_similar_movie_id", "movie_similarities", ["similar_movie_id"])
+
+def downgrade():
+    op.drop_index("ix_movie_similarities_similar_movie_id", table_name="movie_similarities")
+    op.drop_index("ix_movie_similarities_movie_id_score", table_name="movie_similarities")
+    op.drop_table("movie_similarities")
@@ -0,0 +1,26 @@
+"""subscriptions (user_id, lower(plan)) index
+
+Revision ID: e2c7b5a9d416
+Revises: d3a9f6c1e5b4
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e2c7b5a9d416'
+down_revision = 'd3a9f6c1e5b4'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_index(
+        "ix_subscriptions_user_id_lower_plan",
+        "subscriptions",
+        ["user_id", sa.text("lower(plan)"), sa.text("start_date DESC"), sa.text("id DESC")],
+    )
+
+def downgrade():
+    op.drop_index("ix_subscriptions_user_id_lower_plan", table_name="subscriptions")
@@ -0,0 +1,94 @@
+"""genre and country lookup tables with backfill
+
+Revision ID: e5a8b3f27c14
+Revises: c41d7e9a5f32
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e5a8b3f27c14'
+down_revision = 'c41d7e9a5f32'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+# То же правило, что dimension_slug в app/utils/dimensions.py
+def _name(expr):
+    # Сначала схлопываем любые пробельные символы (табуляции, переводы строк), затем обрезаем края:
+    # trim() убирает только пробелы, а str.split() — любые пробельные символы
+    return f"btrim(regexp_replace({expr}, '\\s+', ' ', 'g'))"
+
+def _slug(expr):
+    return f"lower({_name(expr)})"
+
+def upgrade():
+    op.create_table(
+        "genres",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("slug", sa.String(length=50), nullable=False, unique=True),
+    )
+    op.create_table(
+        "countries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("slug", sa.String(length=50), nullable=False, unique=True),
+    )
+    op.create_table(
+        "movie_genres",
+        sa.Column("movie_id", sa.Integer(), sa.ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("genre_id", sa.Integer(), sa.ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True),
+    )
+    op.create_index("ix_movie_genres_genre_id_movie_id", "movie_genres", ["genre_id", "movie_id"])
+    op.alter_column("movies", "genre", type_=sa.String(length=255), existing_type=sa.String(length=50))
+    op.add_column(
+        "movies",
+        sa.Column("country_id", sa.Integer(), sa.ForeignKey("countries.id", ondelete="SET NULL"), nullable=True),
+    )
+    op.create_index("ix_movies_country_id", "movies", ["country_id"])
+
+    # Заполняем справочники из текстовых колонок; жанры в genre разделены запятыми
+    op.execute(f"""
+        INSERT INTO genres (name, slug)
+        SELECT DISTINCT ON (slug) name, slug FROM (
+            SELECT {_name('g.value')} AS name, {_slug('g.value')} AS slug
+            FROM movies m CROSS JOIN LATERAL regexp_split_to_table(m.genre, ',') AS g(value)
+        ) s
+        WHERE slug <> ''
+        ORDER BY slug, name
+        ON CONFLICT (slug) DO NOTHING
+    """)
+    op.execute(f"""
+        INSERT INTO movie_genres (movie_id, genre_id)
+        SELECT DISTINCT m.id, gn.id
+        FROM movies m
+        CROSS JOIN LATERAL regexp_split_to_table(m.genre, ',') AS g(value)
+        JOIN genres gn ON gn.slug = {_slug('g.value')}
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute(f"""
+        INSERT INTO countries (name, slug)
+        SELECT DISTINCT ON (slug) name, slug FROM (
+            SELECT {_name('country')} AS name, {_slug('country')} AS slug FROM movies WHERE country IS NOT NULL
+        ) s
+        WHERE slug <> ''
+        ORDER BY slug, name
+        ON CONFLICT (slug) DO NOTHING
+    """)
+    op.execute(f"""
+        UPDATE movies SET country_id = c.id
+        FROM countries c
+        WHERE c.slug = {_slug('movies.country')}
+    """)
+
+def downgrade():
+    op.drop_index("ix_movies_country_id", table_name="movies")
+    op.drop_column("movies", "country_id")
+    op.alter_column("movies", "genre", type_=sa.String(length=50), existing_type=sa.String(length=255))
+    op.drop_index("ix_movie_genres_genre_id_movie_id", table_name="movie_genres")
+    op.drop_table("movie_genres")
+    op.drop_table("countries")
+    op.drop_table("genres")
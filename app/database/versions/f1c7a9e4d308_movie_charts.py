@@ -0,0 +1,32 @@
+"""materialized trending and per-genre charts
+
+Revision ID: f1c7a9e4d308
+Revises: d9e3f1a6b275
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7a9e4d308'
+down_revision = 'd9e3f1a6b275'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_table(
+        "movie_charts",
+        sa.Column("chart", sa.String(length=64), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("movie_id", sa.Integer(), sa.ForeignKey("movies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("chart", "rank"),
+    )
+    op.create_index("ix_movie_charts_movie_id", "movie_charts", ["movie_id"])
+
+def downgrade():
+    op.drop_index("ix_movie_charts_movie_id", table_name="movie_charts")
+    op.drop_table("movie_charts")
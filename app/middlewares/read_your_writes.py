@@ -0,0 +1,32 @@
+# File: app/middlewares/read_your_writes.py
+import time
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from app.core.config import settings
+from app.database.routing import replica_router, PRIMARY_UNTIL_COOKIE
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """
+    После успешного изменяющего запроса ставит клиенту cookie, по которой
+    get_read_session в течение DB_READ_YOUR_WRITES_SECONDS читает из основной базы,
+    чтобы клиент сразу видел свои изменения несмотря на отставание реплик.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if (
+            replica_router.replicas
+            and request.method in WRITE_METHODS
+            and response.status_code < 400
+        ):
+            ttl = settings.DB_READ_YOUR_WRITES_SECONDS
+            response.set_cookie(
+                key=PRIMARY_UNTIL_COOKIE,
+                value=str(time.time() + ttl),
+                max_age=ttl,
+                httponly=True,
+                samesite="lax",
+            )
+        return response
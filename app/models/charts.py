@@ -0,0 +1,23 @@
+# File: app/models/charts.py
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from app.database.base import Base
+
+# Имена подборок: "trending" и "genre:<ключ жанра>" (см. app/utils/dimensions.py)
+TRENDING_CHART = "trending"
+
+def genre_chart(genre_slug: str) -> str:
+    return f"genre:{genre_slug}"
+
+class MovieChart(Base):
+    """
+    Материализованные подборки фильмов, пересобираются задачей app/tasks/charts.py.
+    Первичный ключ (chart, rank) отдаёт подборку одним range-сканом по индексу.
+    """
+    __tablename__ = "movie_charts"
+
+    chart = Column(String(64), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
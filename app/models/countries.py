@@ -0,0 +1,13 @@
+# File: app/models/countries.py
+from sqlalchemy import Column, Integer, String
+from app.database.base import Base
+
+# Длина как у movies.country
+COUNTRY_MAX_LENGTH = 50
+
+class Country(Base):
+    __tablename__ = "countries"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(COUNTRY_MAX_LENGTH), nullable=False)
+    slug = Column(String(COUNTRY_MAX_LENGTH), nullable=False, unique=True)  # ключ для фильтров, см. app/utils/dimensions.py
@@ -0,0 +1,23 @@
+# File: app/models/genres.py
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, Table
+from app.database.base import Base
+
+# Связь фильмов и жанров: первичный ключ обслуживает выборку жанров фильма,
+# индекс (genre_id, movie_id) — фильтр каталога по жанру
+movie_genres = Table(
+    "movie_genres",
+    Base.metadata,
+    Column("movie_id", Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True),
+    Column("genre_id", Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_movie_genres_genre_id_movie_id", "genre_id", "movie_id"),
+)
+
+# Длина как у movies.genre: жанр, поместившийся в текстовую колонку фильма, помещается и в справочник
+GENRE_MAX_LENGTH = 255
+
+class Genre(Base):
+    __tablename__ = "genres"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(GENRE_MAX_LENGTH), nullable=False)
+    slug = Column(String(GENRE_MAX_LENGTH), nullable=False, unique=True)  # ключ для фильтров, см. app/utils/dimensions.py
@@ -1,7 +1,22 @@
 # File: app/models/movies.py
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index, Computed, ForeignKey, case, cast, func
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.orm import column_property, deferred
 from app.database.base import Base
+from app.models.countries import COUNTRY_MAX_LENGTH, Country  # noqa: F401 — таблицы справочников должны быть в метаданных
+from app.models.genres import GENRE_MAX_LENGTH, Genre, movie_genres  # noqa: F401
+from app.models.reviews import REVIEW_RATING_MAX
+from app.models.similarities import MovieSimilarity  # noqa: F401
+from app.models.charts import MovieChart  # noqa: F401
+
+# Конфигурация полнотекстового поиска. "simple" не делает стемминга, зато одинаково
+# работает для русских и английских названий
+SEARCH_CONFIG = "simple"
+SEARCH_VECTOR_EXPRESSION = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
 
 class Movie(Base):
     __tablename__ = 'movies'
@@ -12,10 +27,44 @@ class Movie(Base):
     release_date = Column(DateTime(timezone=True), nullable=True)
     duration = Column(Integer)  # продолжительность фильма в минутах
     rating = Column(Float, default=0.0)
-    genre = Column(String(50), nullable=True)       # жанр фильма, например "Comedy", "Horror"
-    country = Column(String(50), nullable=True)       # страна производства
+    genre = Column(String(GENRE_MAX_LENGTH), nullable=True)      # жанры через запятую, например "Comedy, Horror"; для фильтров — movie_genres
+    country = Column(String(COUNTRY_MAX_LENGTH), nullable=True)     # страна производства
+    country_id = Column(Integer, ForeignKey("countries.id", ondelete="SET NULL"), nullable=True, index=True)
     type = Column(String(20), nullable=True)          # "movie" или "series"
     age_rating = Column(Integer, nullable=True)       # минимальный возраст (например, 18)
     required_subscription = Column(String(50), nullable=True)  # если указан, для просмотра требуется подписка
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Агрегаты отзывов (без удалённых); поддерживаются приращениями в ReviewService,
+    # пересчитываются задачей app/tasks/review_aggregates.py
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    # rating_histogram[i] (с 1, как в Postgres) — число отзывов с оценкой i
+    rating_histogram = Column(
+        ARRAY(Integer),
+        nullable=False,
+        default=lambda: [0] * REVIEW_RATING_MAX,
+        server_default="{" + ",".join(["0"] * REVIEW_RATING_MAX) + "}"
+    )
+    # Поисковый вектор вычисляется самой базой; по умолчанию не загружается
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_EXPRESSION, persisted=True)))
+
+    # Средняя оценка зрителей; NULL, пока отзывов нет
+    audience_score = column_property(
+        case((review_count > 0, cast(rating_sum, Float) / cast(review_count, Float)), else_=None)
+    )
+
+    __table_args__ = (
+        # Ключи для постраничной выборки по курсору (sort_field, id)
+        Index("ix_movies_rating_id", "rating", "id"),
+        Index("ix_movies_release_date_id", "release_date", "id"),
+        Index("ix_movies_title_id", "title", "id"),
+        Index("ix_movies_search_vector", "search_vector", postgresql_using="gin"),
+        # Подсказки по началу названия без учёта регистра: lower(title) LIKE 'префикс%'.
+        # text_pattern_ops нужен, чтобы LIKE по префиксу использовал btree при любой локали базы
+        Index(
+            "ix_movies_title_lower_pattern",
+            func.lower(title).label("title_lower"),
+            postgresql_ops={"title_lower": "text_pattern_ops"},
+        ),
+    )
@@ -1,9 +1,14 @@
 # File: app/models/reviews.py
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index
+from typing import Optional
+from sqlalchemy.orm import backref, relationship
 from app.database.base import Base
 
+# Допустимые оценки; гистограмма оценок в movies.rating_histogram хранит по ячейке на каждую
+REVIEW_RATING_MIN = 1
+REVIEW_RATING_MAX = 10
+
 class Review(Base):
     __tablename__ = "reviews"
 
@@ -16,6 +21,28 @@ class Review(Base):
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
-    # Связи
-    movie = relationship("Movie", backref="reviews")
-    user = relationship("User", backref="reviews")
+    # Связи не загружаются неявно: обращение без явной загрузки (contains_eager/selectinload)
+    # бросает исключение, чтобы N+1 и ленивый IO в async-коде сразу проявлялись в тестах
+    movie = relationship("Movie", backref=backref("reviews", lazy="raise", passive_deletes=True), lazy="raise")
+    user = relationship("User", backref=backref("reviews", lazy="raise", passive_deletes=True), lazy="raise")
+
+    @property
+    def author_username(self) -> Optional[str]:
+        """Имя автора, если пользователь загружен вместе с отзывом, иначе None."""
+        user = self.__dict__.get("user")
+        return user.username if user is not None else None
+
+    @property
+    def movie_title(self) -> Optional[str]:
+        """Название фильма, если фильм загружен вместе с отзывом, иначе None."""
+        movie = self.__dict__.get("movie")
+        return movie.title if movie is not None else None
+
+    __table_args__ = (
+        # Лента отзывов фильма (новые первыми) по курсору; удалённые отзывы в индекс не входят
+        Index(
+            "ix_reviews_movie_id_created_at_live",
+            movie_id, created_at.desc(), id.desc(),
+            postgresql_where=(is_deleted == False),
+        ),
+    )
@@ -0,0 +1,23 @@
+# File: app/models/similarities.py
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from app.database.base import Base
+
+class MovieSimilarity(Base):
+    """
+    Предрасчитанные похожие фильмы (top-K по косинусной близости оценок),
+    заполняется задачей app/tasks/movie_similarities.py.
+    """
+    __tablename__ = "movie_similarities"
+
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    similar_movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Выдача похожих фильмов: WHERE movie_id = ? ORDER BY score DESC LIMIT k
+        Index("ix_movie_similarities_movie_id_score", "movie_id", score.desc()),
+        # Инкрементальный пересчёт ищет фильмы, у которых в соседях есть изменённые
+        Index("ix_movie_similarities_similar_movie_id", "similar_movie_id"),
+    )
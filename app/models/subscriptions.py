@@ -1,7 +1,7 @@
 # File: app/models/subscriptions.py
 from datetime import datetime, timezone
 import enum
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Index, func, text
 from sqlalchemy.orm import relationship
 from app.database.base import Base
 
@@ -11,6 +11,15 @@ class SubscriptionStatus(enum.Enum):
     EXPIRED = "expired"
     CANCELLED = "cancelled"
 
+# Статусы "открытой" подписки: у пользователя может быть только одна такая подписка
+OPEN_STATUSES = (SubscriptionStatus.PENDING, SubscriptionStatus.ACTIVE)
+# Условие частичного индекса uq_subscriptions_user_open. В ON CONFLICT оно передаётся текстом:
+# с параметрами вместо литералов Postgres не сопоставит его с индексом в generic-плане
+OPEN_STATUSES_PREDICATE = "status IN ('PENDING', 'ACTIVE')"
+
+# Уровни тарифов: подписка даёт доступ к фильмам своего и более низких уровней
+PLAN_LEVELS = {"basic": 1, "standard": 2, "premium": 3}
+
 class Subscription(Base):
     __tablename__ = 'subscriptions'
 
@@ -24,3 +33,26 @@ class Subscription(Base):
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     user = relationship("User", back_populates="subscriptions")
+
+    __table_args__ = (
+        # Поиск подписки пользователя по статусу (активная, ожидающая оплаты)
+        Index("ix_subscriptions_user_id_status", "user_id", "status"),
+        # Последняя подписка пользователя на тариф без учёта регистра (SubscriptionDAO.get_by_user_and_plan)
+        Index(
+            "ix_subscriptions_user_id_lower_plan",
+            "user_id", func.lower(plan), start_date.desc(), id.desc(),
+        ),
+        # Не больше одной ожидающей оплаты или активной подписки на пользователя
+        Index(
+            "uq_subscriptions_user_open",
+            "user_id",
+            unique=True,
+            postgresql_where=text(OPEN_STATUSES_PREDICATE),
+        ),
+        # Поиск истёкших активных подписок фоновой задачей app/tasks/subscription_expiry.py
+        Index(
+            "ix_subscriptions_active_end_date",
+            "end_date",
+            postgresql_where=(status == SubscriptionStatus.ACTIVE),
+        ),
+    )
@@ -4,12 +4,15 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from pathlib import Path
+from urllib.parse import urlencode
 
-from app.database.dependencies import get_db_session
+from app.database.base import async_session_maker
+from app.database.dependencies import get_db_session, get_read_session
 from app.core.security import get_current_user
 from app.services.movies_service import MovieService
 from app.services.reviews_service import ReviewService
-from app.services.subscriptions_service import SubscriptionService
+from app.services.users_service import UserService
+from app.services.entitlements_service import EntitlementService
 from app.models.users import User
 from app.schemas.movies import MovieRead
 
@@ -17,22 +20,31 @@ router = APIRouter(include_in_schema=False)
 templates = Jinja2Templates(directory=Path(__file__).parent.parent / "templates")
 movie_service = MovieService()
 review_service = ReviewService()
-subscription_service = SubscriptionService()
+user_service = UserService()
+entitlement_service = EntitlementService()
 
 async def get_user_data(request: Request) -> dict:
     """Helper function to get common template data"""
     context = {"request": request}
     try:
-        user = await get_current_user(request)
+        # Сессия не берёт соединение, пока пользователь находится в кэше
+        async with async_session_maker() as db:
+            user = await get_current_user(request, db)
         context["user"] = user
     except:
         context["user"] = None
     return context
 
+# Жанры с подборками "лучшие по жанру" на главной
+HOME_GENRES = ["Action", "Comedy", "Drama", "Horror"]
+
 @router.get("/", response_class=HTMLResponse)
-async def index(request: Request):
+async def index(request: Request, db: AsyncSession = Depends(get_read_session)):
     """Render home page"""
     context = await get_user_data(request)
+    charts = await movie_service.get_charts(db, HOME_GENRES, limit=6)
+    context["trending"] = charts.pop("trending")
+    context["top_rated"] = charts
     return templates.TemplateResponse("index.html", context)
 
 # Auth Routes
@@ -52,24 +64,43 @@ async def register_page(request: Request):
 @router.get("/movies", response_class=HTMLResponse)
 async def movies_page(
     request: Request,
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_read_session),
     genre: Optional[str] = None,
     release_year_from: Optional[int] = None,
     release_year_to: Optional[int] = None,
     rating_min: Optional[float] = None,
     rating_max: Optional[float] = None,
-    sort_by: str = "release_date",
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
     order: str = "desc",
     skip: int = 0,
-    limit: int = 12
+    limit: int = 12,
+    cursor: Optional[str] = None
 ):
     """Render movies catalog or return movie grid fragment for HTMX"""
     context = await get_user_data(request)
-    movies = await movie_service.list_movies(
+    movies, next_cursor = await movie_service.list_movies_page(
         db, genre, None, None, release_year_from, release_year_to,
-        rating_min, rating_max, None, sort_by, order, skip, limit
+        rating_min, rating_max, search or None, sort_by or None, order, skip, limit, cursor
     )
     context["movies"] = movies
+    context["is_next_page"] = bool(cursor)
+    context["next_page_query"] = None
+    if next_cursor:
+        # Бесконечная лента: следующая порция запрашивается по курсору с теми же фильтрами
+        params = {
+            "genre": genre,
+            "release_year_from": release_year_from,
+            "release_year_to": release_year_to,
+            "rating_min": rating_min,
+            "rating_max": rating_max,
+            "search": search,
+            "sort_by": sort_by,
+            "order": order,
+            "limit": limit,
+            "cursor": next_cursor,
+        }
+        context["next_page_query"] = urlencode({k: v for k, v in params.items() if v is not None})
 
     if request.headers.get("HX-Request"):
         return templates.TemplateResponse(
@@ -78,11 +109,24 @@ async def movies_page(
         )
     return templates.TemplateResponse("movies/catalog.html", context)
 
+@router.get("/search/suggestions", response_class=HTMLResponse)
+async def search_suggestions(
+    request: Request,
+    search: str = "",
+    db: AsyncSession = Depends(get_read_session)
+):
+    """Return title suggestions as datalist options for HTMX"""
+    suggestions = await movie_service.suggest_titles(db, search, 8) if search.strip() else []
+    return templates.TemplateResponse(
+        "components/title_suggestions.html",
+        {"request": request, "suggestions": suggestions}
+    )
+
 @router.get("/movies/{movie_id}", response_class=HTMLResponse)
 async def movie_details(
     request: Request,
     movie_id: int,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """Render movie details page"""
     context = await get_user_data(request)
@@ -90,6 +134,7 @@ async def movie_details(
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
     context["movie"] = movie
+    context["similar_movies"] = await movie_service.get_similar_movies(db, movie_id, 6)
     return templates.TemplateResponse("movies/details.html", context)
 
 @router.get("/movies/{movie_id}/watch", response_class=HTMLResponse)
@@ -111,13 +156,8 @@ async def watch_movie(
     context["age_confirmed"] = request.cookies.get("age_confirmed") == "true"
 
     if movie.required_subscription:
-        subscription = await subscription_service.get_active_subscription(
-            db, context["user"].id
-        )
-        context["subscription_valid"] = (
-            subscription and
-            subscription.plan.lower() == movie.required_subscription.lower()
-        )
+        entitlements = await entitlement_service.get_user_entitlements(db, context["user"].id)
+        context["subscription_valid"] = entitlement_service.allows(entitlements, movie.required_subscription)
     else:
         context["subscription_valid"] = True
 
@@ -127,17 +167,16 @@ async def watch_movie(
 @router.get("/profile", response_class=HTMLResponse)
 async def profile_page(
     request: Request,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_db_session)  # промах кэша профиля читается из основной базы
 ):
     """Render user profile page"""
     context = await get_user_data(request)
     if not context["user"]:
         return RedirectResponse(url="/auth/login", status_code=303)
 
-    subscription = await subscription_service.get_active_subscription(
-        db, context["user"].id
-    )
-    context["subscription"] = subscription
+    profile = await user_service.get_profile_snapshot(db, context["user"].id)
+    context["subscription"] = profile.subscription
+    context["remaining_days"] = profile.remaining_days
     return templates.TemplateResponse("profile/index.html", context)
 
 @router.get("/profile/edit", response_class=HTMLResponse)
@@ -158,16 +197,20 @@ async def subscription_plans(request: Request):
     return templates.TemplateResponse("subscription/plans.html", context)
 
 # Review Routes
-@router.get("/reviews/movie/{movie_id}", response_class=HTMLResponse)
+@router.get("/movies/{movie_id}/reviews", response_class=HTMLResponse)
 async def movie_reviews(
     request: Request,
     movie_id: int,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_session),
+    cursor: Optional[str] = None
 ):
     """Return movie reviews fragment for HTMX"""
     context = await get_user_data(request)
-    reviews = await review_service.list_reviews_for_movie(db, movie_id)
+    reviews, next_cursor = await review_service.list_reviews_page(db, movie_id, cursor=cursor)
     context["reviews"] = reviews
+    context["movie_id"] = movie_id
+    # Следующая порция подгружается по курсору, когда пользователь долистает до конца
+    context["next_page_query"] = urlencode({"cursor": next_cursor}) if next_cursor else None
     return templates.TemplateResponse("reviews/movie_reviews.html", context)
 
 @router.get("/reviews/{review_id}/edit", response_class=HTMLResponse)
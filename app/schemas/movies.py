@@ -1,7 +1,11 @@
 # File: app/schemas/movies.py
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Any, List, Optional, Sequence, Union
+from pydantic import BaseModel, Field, field_validator
+from pydantic_core import to_json
+from app.models.countries import COUNTRY_MAX_LENGTH
+from app.models.genres import GENRE_MAX_LENGTH
+from app.utils.dimensions import split_dimension_values
 
 class MovieBase(BaseModel):
     title: str
@@ -9,14 +13,23 @@ class MovieBase(BaseModel):
     release_date: Optional[datetime] = None
     duration: Optional[int] = None
     rating: Optional[float] = 0.0
-    genre: Optional[str] = None
-    country: Optional[str] = None
+    genre: Optional[str] = Field(None, max_length=GENRE_MAX_LENGTH)
+    country: Optional[str] = Field(None, max_length=COUNTRY_MAX_LENGTH)
     type: Optional[str] = None
     age_rating: Optional[int] = None
     required_subscription: Optional[str] = None
 
+def _check_genres_length(genres: Optional[List[str]]) -> Optional[List[str]]:
+    # Жанры сохраняются в movies.genre одной строкой через запятую — она должна поместиться в колонку
+    if genres is not None and len(", ".join(split_dimension_values(",".join(genres)))) > GENRE_MAX_LENGTH:
+        raise ValueError(f"Жанры через запятую не должны быть длиннее {GENRE_MAX_LENGTH} символов")
+    return genres
+
 class MovieCreate(MovieBase):
     title: str
+    genres: Optional[List[str]] = None  # если задан, заменяет genre: жанры сохраняются через запятую
+
+    _genres_length = field_validator("genres")(_check_genres_length)
 
 class MovieUpdate(BaseModel):
     title: Optional[str] = None
@@ -24,18 +37,66 @@ class MovieUpdate(BaseModel):
     release_date: Optional[datetime] = None
     duration: Optional[int] = None
     rating: Optional[float] = None
-    genre: Optional[str] = None
-    country: Optional[str] = None
+    genre: Optional[str] = Field(None, max_length=GENRE_MAX_LENGTH)
+    country: Optional[str] = Field(None, max_length=COUNTRY_MAX_LENGTH)
     type: Optional[str] = None
     age_rating: Optional[int] = None
     required_subscription: Optional[str] = None
+    genres: Optional[List[str]] = None
+
+    _genres_length = field_validator("genres")(_check_genres_length)
 
 class MovieRead(MovieBase):
     id: int
     created_at: datetime
     updated_at: datetime
     duration_formatted: Optional[str] = None  # Новое поле для форматированной продолжительности
+    review_count: int = 0
+    audience_score: Optional[float] = None  # средняя оценка по отзывам
+    rating_histogram: Optional[List[int]] = None  # число отзывов с оценками 1..10
 
     class Config:
         orm_mode = True
         from_attributes = True
+
+def parse_movie_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Разбирает параметр fields=id,title,... в список полей MovieRead без повторов.
+    None — нужны все поля. ValueError, если поле неизвестно или список пуст.
+    """
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in MovieRead.model_fields]
+    if not requested or unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown) or fields}. Доступны: {', '.join(MovieRead.model_fields)}")
+    return requested
+
+def movie_read_json(movie: Any, fields: Optional[Sequence[str]] = None, **values: Any) -> str:
+    """
+    JSON фильма по схеме MovieRead. values — вычисляемые поля (например, duration_formatted).
+    С fields сериализуются только эти поля, и другие атрибуты movie не читаются:
+    при выборке с load_only обращение к незагруженной колонке означало бы лишний запрос.
+    """
+    if fields is None:
+        return MovieRead.model_validate(movie).model_copy(update=values).model_dump_json()
+    # Значения уже нужных типов (из базы), поэтому сериализуем словарь без построения модели
+    data = {name: values[name] if name in values else getattr(movie, name, None) for name in fields}
+    return to_json(data).decode()
+
+class MovieSuggestion(BaseModel):
+    id: int
+    title: str
+
+class FacetBucket(BaseModel):
+    value: Union[int, str]
+    label: str
+    count: int
+
+class MovieFacets(BaseModel):
+    total: int
+    genre: List[FacetBucket]
+    country: List[FacetBucket]
+    type: List[FacetBucket]
+    decade: List[FacetBucket]   # value — первый год десятилетия, например 1990
+    rating: List[FacetBucket]   # value — целая часть рейтинга
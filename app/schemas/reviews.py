@@ -1,7 +1,8 @@
 # File: app/schemas/reviews.py
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from app.models.reviews import REVIEW_RATING_MIN, REVIEW_RATING_MAX
 
 class ReviewBase(BaseModel):
     movie_id: int
@@ -10,10 +11,10 @@ class ReviewBase(BaseModel):
     comment: Optional[str] = None
 
 class ReviewCreate(ReviewBase):
-    pass
+    rating: int = Field(..., ge=REVIEW_RATING_MIN, le=REVIEW_RATING_MAX)
 
 class ReviewUpdate(BaseModel):
-    rating: Optional[int] = None
+    rating: Optional[int] = Field(None, ge=REVIEW_RATING_MIN, le=REVIEW_RATING_MAX)
     comment: Optional[str] = None
     is_deleted: Optional[bool] = None
 
@@ -25,6 +26,8 @@ class ReviewRead(ReviewBase):
     is_deleted: bool
     created_at: datetime
     updated_at: datetime
+    author_username: Optional[str] = None  # заполняется, если автор загружен вместе с отзывом
+    movie_title: Optional[str] = None
 
     class Config:
         orm_mode = True
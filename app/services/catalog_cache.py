@@ -0,0 +1,165 @@
+# File: app/services/catalog_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.utils.cache import RedisError, caches, get_redis, mark_redis_failed
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "catalog:version"
+# Параметры, значение которых не зависит от регистра: для них "Drama" и "drama" — один ключ
+CASE_INSENSITIVE_PARAMS = frozenset({"genre", "country", "sort_by", "order"})
+
+
+class CatalogCache:
+    """
+    Кэш готовых JSON-ответов каталога в Redis.
+    Ключ включает версию каталога: при изменении фильмов версия увеличивается,
+    и старые записи просто перестают читаться (и истекают по TTL).
+    Одновременные промахи по одному ключу вычисляются один раз: внутри процесса
+    через asyncio.Lock, между воркерами — через блокировку SET NX в Redis.
+    """
+
+    def __init__(self, name: str = "catalog"):
+        self.name = name
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._version: Optional[str] = None
+        self._version_read_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "version_bumps": 0, "errors": 0}
+        caches[name] = self
+
+    @staticmethod
+    def make_key(kind: str, params: Dict[str, Any]) -> str:
+        """
+        Нормализует параметры запроса: порядок и пустые значения не влияют на ключ.
+        Регистр приводится только у параметров из CASE_INSENSITIVE_PARAMS; курсор
+        и свободный текст входят в ключ без изменений.
+        """
+        normalized = {
+            k: (v.strip().lower() if k in CASE_INSENSITIVE_PARAMS and isinstance(v, str) else v)
+            for k, v in sorted(params.items())
+            if v is not None and v != ""
+        }
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{kind}:{digest}"
+
+    async def _get_version(self, redis) -> str:
+        # Версию держим локально недолго, чтобы не делать лишний запрос на каждый хит
+        now = time.monotonic()
+        if self._version is None or now - self._version_read_at > settings.CATALOG_CACHE_VERSION_TTL:
+            self._version = await redis.get(VERSION_KEY) or "0"
+            self._version_read_at = now
+        return self._version
+
+    async def get_or_compute(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Dict[str, str]]]
+    ) -> Dict[str, str]:
+        """
+        Возвращает закэшированный ответ (словарь строк) или вычисляет и сохраняет его.
+        Без Redis просто вызывает compute.
+        """
+        redis = get_redis()
+        if redis is None:
+            return await compute()
+        try:
+            version = await self._get_version(redis)
+            key = f"{self.name}:{version}:{self.make_key(kind, params)}"
+            cached = await redis.hgetall(key)
+            if cached:
+                self.stats["hits"] += 1
+                return cached
+        except RedisError as e:
+            self.stats["errors"] += 1
+            mark_redis_failed(e)
+            return await compute()
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                return await self._fill(redis, key, compute)
+        finally:
+            if not lock.locked():
+                self._locks.pop(key, None)
+
+    async def _fill(self, redis, key: str, compute: Callable[[], Awaitable[Dict[str, str]]]) -> Dict[str, str]:
+        lock_key = f"{key}:lock"
+        try:
+            # Пока мы ждали локальную блокировку, значение мог заполнить другой запрос
+            cached = await redis.hgetall(key)
+            if cached:
+                self.stats["coalesced"] += 1
+                return cached
+            owner = await redis.set(lock_key, "1", nx=True, px=settings.CATALOG_CACHE_LOCK_TTL_MS)
+            if not owner:
+                # Значение считает другой воркер: ждём его недолго, потом считаем сами.
+                # Если блокировка снята без значения (вычисление упало), не ждём до конца срока
+                deadline = time.monotonic() + settings.CATALOG_CACHE_LOCK_TTL_MS / 1000
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.02)
+                    cached = await redis.hgetall(key)
+                    if cached:
+                        self.stats["coalesced"] += 1
+                        return cached
+                    if not await redis.exists(lock_key):
+                        break
+        except RedisError as e:
+            self.stats["errors"] += 1
+            mark_redis_failed(e)
+            return await compute()
+
+        self.stats["misses"] += 1
+        try:
+            value = await compute()
+        except Exception:
+            # Ошибка (например, фильм не найден) не кэшируется; снимаем блокировку,
+            # чтобы остальные запросы по ключу сразу получили ту же ошибку, а не ждали её срока
+            if owner:
+                try:
+                    await redis.delete(lock_key)
+                except RedisError as e:
+                    self.stats["errors"] += 1
+                    mark_redis_failed(e)
+            raise
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=value)
+                pipe.expire(key, settings.CATALOG_CACHE_TTL)
+                if owner:
+                    pipe.delete(lock_key)
+                await pipe.execute()
+        except RedisError as e:
+            self.stats["errors"] += 1
+            mark_redis_failed(e)
+        return value
+
+    async def bump_version(self) -> None:
+        """Инвалидирует все ответы каталога."""
+        self.stats["version_bumps"] += 1
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            self._version = str(await redis.incr(VERSION_KEY))
+            self._version_read_at = time.monotonic()
+        except RedisError as e:
+            self.stats["errors"] += 1
+            mark_redis_failed(e)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["coalesced"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "version": self._version,
+            "hit_ratio": round((lookups - self.stats["misses"]) / lookups, 4) if lookups else None,
+        }
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,285 @@
+# File: app/services/catalog_index.py
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.countries import Country
+from app.models.genres import Genre, movie_genres
+from app.models.movies import Movie
+from app.utils.cache import caches
+from app.utils.dimensions import dimension_slug, split_dimension_values
+
+try:
+    import numpy as np
+except ImportError:  # numpy — необязательная зависимость, без неё каталог всегда читается из базы
+    np = None
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_COLUMNS = ("country", "type")
+SORT_COLUMNS = ("rating", "release_date", "title")
+# Символы, которые в ilike (фильтр по типу) работают как шаблон: такие фильтры отдаём базе
+LIKE_SPECIAL_CHARS = ("%", "_", "\\")
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return float("nan")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _number(value: Optional[float]) -> float:
+    return float("nan") if value is None else float(value)
+
+
+def _country_slug(country: Optional[str]) -> Optional[str]:
+    return dimension_slug(country) if country and country.strip() else None
+
+
+class CatalogIndex:
+    """
+    Колоночный индекс каталога в памяти процесса для запросов list_movies без поиска и курсора.
+    Хранит id, рейтинг, дату выхода и позицию по названию в массивах numpy, страну
+    и тип — словарными кодами, жанры — парами (позиция фильма, код жанра).
+    Для каждого ключа сортировки лениво строится перестановка (значение по возрастанию,
+    NULL в конце, затем id) — убывающий порядок это она же наоборот, как в keyset_order_by.
+    Порядок названий берётся из базы (row_number по title), чтобы совпадать с её collation;
+    пока название добавленного или изменённого фильма не перечитано, сортировка по title идёт в базу.
+    Изменения из этого процесса применяются сразу через apply(), изменения других воркеров
+    становятся видны после перечитывания раз в ttl секунд.
+    """
+
+    def __init__(self, name: str = "catalog_index", ttl: float = settings.CATALOG_INDEX_TTL):
+        self.name = name
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"queries": 0, "fallbacks": 0, "loads": 0, "deltas": 0, "rebuilds": 0}
+        caches[name] = self
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CATALOG_INDEX_ENABLED and np is not None
+
+    def _encode(self, column: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self._code_of[column].get(value)
+        if code is None:
+            code = len(self.dictionaries[column])
+            self._code_of[column][value] = code
+            self.dictionaries[column].append(value)
+        return code
+
+    def load_rows(self, rows: Sequence[Sequence[Any]], genre_rows: Sequence[Sequence[Any]] = ()) -> None:
+        """
+        Строит индекс из строк (id, rating, release_date, country_slug, type, title_position)
+        и пар (movie_id, genre_slug).
+        """
+        count = len(rows)
+        self.dictionaries: Dict[str, List[str]] = {column: [] for column in ("genre",) + CATEGORY_COLUMNS}
+        self._code_of: Dict[str, Dict[str, int]] = {column: {} for column in ("genre",) + CATEGORY_COLUMNS}
+        self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        self.values = {
+            "rating": np.fromiter((_number(row[1]) for row in rows), dtype=np.float64, count=count),
+            "release_date": np.fromiter((_timestamp(row[2]) for row in rows), dtype=np.float64, count=count),
+            "title": np.fromiter((_number(row[5]) for row in rows), dtype=np.float64, count=count),
+        }
+        self.codes = {
+            column: np.fromiter((self._encode(column, row[3 + i]) for row in rows), dtype=np.int32, count=count)
+            for i, column in enumerate(CATEGORY_COLUMNS)
+        }
+        self._position = {int(id): position for position, id in enumerate(self.ids)}
+        genre_rows = [row for row in genre_rows if row[0] in self._position]
+        self._genre_positions = np.fromiter(
+            (self._position[row[0]] for row in genre_rows), dtype=np.int64, count=len(genre_rows)
+        )
+        self._genre_codes = np.fromiter(
+            (self._encode("genre", row[1]) for row in genre_rows), dtype=np.int32, count=len(genre_rows)
+        )
+        self._permutations: Dict[str, Any] = {}
+        self._title_stale = False
+        self.loaded_at = time.monotonic()
+        self.stats["loads"] += 1
+
+    async def load(self, db: AsyncSession) -> None:
+        stmt = select(
+            Movie.id, Movie.rating, Movie.release_date, Country.slug, Movie.type,
+            func.row_number().over(order_by=(Movie.title, Movie.id))
+        ).outerjoin(Country, Country.id == Movie.country_id)
+        rows = (await db.execute(stmt)).all()
+        genre_stmt = select(movie_genres.c.movie_id, Genre.slug).join(Genre, Genre.id == movie_genres.c.genre_id)
+        genre_rows = (await db.execute(genre_stmt)).all()
+        self.load_rows(rows, genre_rows)
+        logger.info(f"Индекс каталога загружен: {len(self.ids)} фильмов")
+
+    async def _ensure_loaded(self, db: AsyncSession) -> None:
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return
+        async with self._lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl:
+                await self.load(db)
+
+    def _permutation(self, column: str):
+        permutation = self._permutations.get(column)
+        if permutation is None:
+            permutation = np.lexsort((self.ids, self.values[column]))
+            self._permutations[column] = permutation
+            self.stats["rebuilds"] += 1
+        return permutation
+
+    def _codes_for(self, column: str, slugs: Sequence[str]) -> List[int]:
+        return [self._code_of[column][slug] for slug in slugs if slug in self._code_of[column]]
+
+    def _type_mask(self, needle: str):
+        # Тот же смысл, что у ilike '%needle%', но проверяется один раз на значение словаря
+        needle = needle.lower()
+        matching = [code for code, value in enumerate(self.dictionaries["type"]) if needle in value.lower()]
+        return np.isin(self.codes["type"], matching)
+
+    def _genre_mask(self, slugs: Sequence[str]):
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[self._genre_positions[np.isin(self._genre_codes, self._codes_for("genre", slugs))]] = True
+        return mask
+
+    def search(
+        self,
+        genres: Sequence[str] = (),
+        countries: Sequence[str] = (),
+        type_: Optional[str] = None,
+        release_year_from: Optional[int] = None,
+        release_year_to: Optional[int] = None,
+        rating_min: Optional[float] = None,
+        rating_max: Optional[float] = None,
+        sort_by: str = "release_date",
+        order: str = "desc",
+        skip: int = 0,
+        limit: int = 100
+    ) -> Optional[List[int]]:
+        """
+        Возвращает id фильмов страницы в порядке сортировки
+        или None, если запрос должна выполнить база.
+        genres и countries — ключи справочников (см. dimension_filter).
+        """
+        if type_ and any(ch in type_ for ch in LIKE_SPECIAL_CHARS):
+            self.stats["fallbacks"] += 1
+            return None
+        if sort_by not in self.values or (sort_by == "title" and self._title_stale):
+            self.stats["fallbacks"] += 1
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        if genres:
+            mask &= self._genre_mask(genres)
+        if countries:
+            mask &= np.isin(self.codes["country"], self._codes_for("country", countries))
+        if type_:
+            mask &= self._type_mask(type_)
+        release_date = self.values["release_date"]
+        if release_year_from:
+            mask &= release_date >= _timestamp(datetime(release_year_from, 1, 1, tzinfo=timezone.utc))
+        if release_year_to:
+            mask &= release_date <= _timestamp(datetime(release_year_to, 12, 31, tzinfo=timezone.utc))
+        rating = self.values["rating"]
+        if rating_min is not None:
+            mask &= rating >= rating_min
+        if rating_max is not None:
+            mask &= rating <= rating_max
+        permutation = self._permutation(sort_by)
+        if order == "desc":
+            permutation = permutation[::-1]
+        selected = permutation[mask[permutation]]
+        self.stats["queries"] += 1
+        return self.ids[selected[skip:skip + limit]].tolist()
+
+    async def query(self, db: AsyncSession, **params) -> Optional[List[int]]:
+        """
+        Загружает индекс при необходимости и выполняет search(). None — индекс выключен
+        или запрос ему не подходит.
+        """
+        if not self.enabled:
+            return None
+        await self._ensure_loaded(db)
+        return self.search(**params)
+
+    def _category_code(self, column: str, movie: Movie) -> int:
+        if column == "country":
+            return self._encode(column, _country_slug(movie.country))
+        return self._encode(column, getattr(movie, column))
+
+    def apply(self, movies: Iterable[Movie], fields: Optional[Iterable[str]] = None) -> None:
+        """
+        Применяет созданные или изменённые фильмы. fields — изменённые поля (None — все).
+        Жанры берутся из поля genre, как их раскладывает MovieService.
+        Перестановки сортировки перестраиваются лениво при следующем запросе.
+        """
+        if self.loaded_at is None:
+            return
+        fields = set(fields) if fields is not None else None
+        new_movies = []
+        genre_updates: Dict[int, List[str]] = {}
+        for movie in movies:
+            position = self._position.get(movie.id)
+            if position is None:
+                new_movies.append(movie)
+                continue
+            self.values["rating"][position] = _number(movie.rating)
+            self.values["release_date"][position] = _timestamp(movie.release_date)
+            for column in CATEGORY_COLUMNS:
+                self.codes[column][position] = self._category_code(column, movie)
+            if fields is None or "genre" in fields:
+                genre_updates[position] = split_dimension_values(movie.genre)
+            if fields is None or "title" in fields:
+                self._title_stale = True
+        if new_movies:
+            start = len(self.ids)
+            count = len(new_movies)
+            self.ids = np.concatenate([self.ids, np.fromiter((m.id for m in new_movies), dtype=np.int64, count=count)])
+            self.values["rating"] = np.concatenate([
+                self.values["rating"], np.fromiter((_number(m.rating) for m in new_movies), dtype=np.float64, count=count)
+            ])
+            self.values["release_date"] = np.concatenate([
+                self.values["release_date"],
+                np.fromiter((_timestamp(m.release_date) for m in new_movies), dtype=np.float64, count=count)
+            ])
+            self.values["title"] = np.concatenate([self.values["title"], np.full(count, np.nan)])
+            for column in CATEGORY_COLUMNS:
+                self.codes[column] = np.concatenate([
+                    self.codes[column],
+                    np.fromiter((self._category_code(column, m) for m in new_movies), dtype=np.int32, count=count)
+                ])
+            for offset, movie in enumerate(new_movies):
+                self._position[movie.id] = start + offset
+                genre_updates[start + offset] = split_dimension_values(movie.genre)
+            self._title_stale = True
+        if genre_updates:
+            keep = ~np.isin(self._genre_positions, list(genre_updates))
+            pairs = [(position, dimension_slug(name)) for position, names in genre_updates.items() for name in names]
+            self._genre_positions = np.concatenate([
+                self._genre_positions[keep], np.array([p for p, _ in pairs], dtype=np.int64)
+            ])
+            self._genre_codes = np.concatenate([
+                self._genre_codes[keep], np.array([self._encode("genre", slug) for _, slug in pairs], dtype=np.int32)
+            ])
+        self._permutations.clear()
+        self.stats["deltas"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        loaded = self.loaded_at is not None
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "rows": len(self.ids) if loaded else 0,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if loaded else None,
+            "title_stale": self._title_stale if loaded else None,
+        }
+
+
+catalog_index = CatalogIndex()
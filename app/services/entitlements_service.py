@@ -0,0 +1,107 @@
+# File: app/services/entitlements_service.py
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.dao.movies_dao import MovieDAO
+from app.dao.subscriptions_dao import SubscriptionDAO
+from app.exceptions.custom_exceptions import MovieNotFoundException
+from app.models.subscriptions import PLAN_LEVELS, SubscriptionStatus
+from app.utils.cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+# Тарифы пользователя: {"plan": активный тариф или None, "plans": тарифы, к фильмам которых есть доступ}
+entitlement_cache = TieredCache(
+    "entitlements",
+    maxsize=settings.ENTITLEMENT_CACHE_SIZE,
+    ttl=settings.ENTITLEMENT_CACHE_TTL,
+    local_ttl=settings.ENTITLEMENT_CACHE_LOCAL_TTL,
+)
+# Требования фильма: {"id", "age_rating", "required_subscription"}
+movie_requirement_cache = TieredCache(
+    "movie_requirements",
+    maxsize=settings.ENTITLEMENT_CACHE_SIZE,
+    ttl=settings.MOVIE_REQUIREMENT_CACHE_TTL,
+)
+
+
+def covered_plans(plan: str) -> list:
+    """Тарифы, доступ к которым даёт plan: он сам и все тарифы ниже по уровню."""
+    plan = plan.strip().lower()
+    level = PLAN_LEVELS.get(plan)
+    if level is None:
+        return [plan]  # неизвестный тариф даёт доступ только к фильмам с тем же тарифом
+    return [name for name, name_level in PLAN_LEVELS.items() if name_level <= level]
+
+
+async def invalidate_entitlements(user_id: int) -> None:
+    await entitlement_cache.delete(int(user_id))
+
+
+async def invalidate_movie_requirement(movie_id: int) -> None:
+    await movie_requirement_cache.delete(int(movie_id))
+
+
+class EntitlementService:
+    """
+    Решение "пользователь может смотреть фильм" из двух закэшированных частей: набора тарифов
+    пользователя и требований фильма. Тарифы пользователя хранятся не дольше окончания подписки
+    и сбрасываются при изменении подписок (SubscriptionService), требования фильма — при его изменении.
+    Попадания и промахи обоих кэшей видны в /internal/cache.
+    """
+
+    def __init__(self, movie_dao: Optional[MovieDAO] = None, subscription_dao: Optional[SubscriptionDAO] = None):
+        self.movie_dao = movie_dao or MovieDAO()
+        self.subscription_dao = subscription_dao or SubscriptionDAO()
+
+    async def get_movie_requirement(self, db: AsyncSession, movie_id: int) -> Dict[str, Any]:
+        requirement = await movie_requirement_cache.get(movie_id)
+        if requirement is not None:
+            return requirement
+        movie = await self.movie_dao.get_by_id(db, movie_id)
+        if not movie:
+            logger.warning(f"Фильм с id {movie_id} не найден")
+            raise MovieNotFoundException()
+        requirement = {
+            "id": movie.id,
+            "age_rating": movie.age_rating,
+            "required_subscription": movie.required_subscription,
+        }
+        await movie_requirement_cache.set(movie_id, requirement)
+        return requirement
+
+    async def get_user_entitlements(self, db: AsyncSession, user_id: int) -> Dict[str, Any]:
+        entitlements = await entitlement_cache.get(user_id)
+        if entitlements is not None:
+            return entitlements
+        now = datetime.now(timezone.utc)
+        subscription = await self.subscription_dao.get_by_user_and_status(db, user_id, [SubscriptionStatus.ACTIVE])
+        end_date = subscription.end_date if subscription else None
+        if end_date is not None and end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+        ttl = None
+        if subscription is None or (end_date is not None and end_date <= now):
+            # Истёкшая, но ещё не переведённая в EXPIRED подписка доступа не даёт
+            entitlements = {"plan": None, "plans": []}
+        else:
+            entitlements = {"plan": subscription.plan, "plans": covered_plans(subscription.plan)}
+            if end_date is not None:
+                ttl = (end_date - now).total_seconds()
+        await entitlement_cache.set(user_id, entitlements, ttl)
+        return entitlements
+
+    @staticmethod
+    def allows(entitlements: Dict[str, Any], required_subscription: Optional[str]) -> bool:
+        if not required_subscription:
+            return True
+        return required_subscription.strip().lower() in entitlements["plans"]
+
+    async def can_watch(self, db: AsyncSession, user_id: int, movie_id: int) -> bool:
+        requirement = await self.get_movie_requirement(db, movie_id)
+        if not requirement["required_subscription"]:
+            return True
+        return self.allows(await self.get_user_entitlements(db, user_id), requirement["required_subscription"])
@@ -1,64 +1,195 @@
 # File: app/services/movies_service.py
 import logging
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, or_, func, distinct, tuple_
+from sqlalchemy.orm import load_only
 from datetime import datetime, timezone
 from app.dao.movies_dao import MovieDAO
+from app.dao.dimensions_dao import CountryDAO, GenreDAO
+from app.database.unit_of_work import unit_of_work
 from app.schemas.movies import MovieCreate, MovieUpdate
-from app.models.movies import Movie
+from app.models.movies import Movie, SEARCH_CONFIG
+from app.models.countries import Country
+from app.models.genres import Genre, movie_genres
+from app.models.charts import TRENDING_CHART, genre_chart
+from app.core.config import settings
 from app.exceptions.custom_exceptions import MovieNotFoundException
+from app.services.catalog_cache import catalog_cache
+from app.services.catalog_index import catalog_index
+from app.services.entitlements_service import invalidate_movie_requirement
+from app.services.suggest_index import suggest_index
+from app.utils.pagination import decode_cursor, keyset_condition, keyset_order_by, next_cursor_for
+from app.utils.dimensions import dimension_filter, dimension_slug, split_dimension_values
 
 logger = logging.getLogger(__name__)
 
+# Поля, по которым разрешена сортировка каталога (кроме relevance при поиске)
+SORT_FIELDS = {
+    "rating": Movie.rating,
+    "release_date": Movie.release_date,
+    "title": Movie.title,
+    "audience_score": Movie.audience_score
+}
+
+# Поля MovieRead, которые вычисляются из других колонок Movie
+FIELD_COLUMNS = {"duration_formatted": ("duration",)}
+
+def _load_options(fields: Optional[Sequence[str]], *required: str) -> List[Any]:
+    """
+    Опции загрузки для выборки только нужных колонок: поля MovieRead из fields,
+    id и required (например, поле сортировки для курсора). None — все колонки.
+    """
+    if fields is None:
+        return []
+    names = {"id", *required}
+    for name in fields:
+        names.update(FIELD_COLUMNS.get(name, (name,)))
+    return [load_only(*(getattr(Movie, name) for name in sorted(names)))]
+
+def _movie_data(movie_in: Union[MovieCreate, MovieUpdate], **kwargs) -> Dict[str, Any]:
+    data = movie_in.dict(**kwargs)
+    genres = data.pop("genres", None)
+    if genres is not None:
+        data["genre"] = ", ".join(split_dimension_values(",".join(genres))) or None
+    return data
+
 class MovieService:
     def __init__(self, movie_dao: Optional[MovieDAO] = None):
         self.movie_dao = movie_dao or MovieDAO()
+        self.genre_dao = GenreDAO()
+        self.country_dao = CountryDAO()
+
+    async def _sync_dimensions(self, db: AsyncSession, movies: Sequence[Movie]) -> None:
+        """
+        Приводит movie_genres и country_id в соответствие с текстовыми полями genre и country.
+        """
+        genre_names = {movie.id: split_dimension_values(movie.genre) for movie in movies}
+        genre_ids = await self.genre_dao.ensure(db, [name for names in genre_names.values() for name in names])
+        await self.movie_dao.set_genres(db, {
+            movie_id: [genre_ids[dimension_slug(name)] for name in names]
+            for movie_id, names in genre_names.items()
+        })
+        country_ids = await self.country_dao.ensure(db, [movie.country for movie in movies if movie.country and movie.country.strip()])
+        for movie in movies:
+            movie.country_id = country_ids.get(dimension_slug(movie.country)) if movie.country else None
 
     async def create_movie(self, db: AsyncSession, movie_in: MovieCreate) -> Movie:
-        movie = await self.movie_dao.create(db, movie_in.dict())
+        async with unit_of_work(db):
+            movie = await self.movie_dao.create(db, _movie_data(movie_in))
+            await self._sync_dimensions(db, [movie])
+        catalog_index.apply([movie])
+        suggest_index.apply([movie])
+        await catalog_cache.bump_version()
         logger.info(f"Создан фильм с id {movie.id}")
         return movie
 
+    async def bulk_create_movies(self, db: AsyncSession, movies_in: List[MovieCreate]) -> List[Movie]:
+        async with unit_of_work(db):
+            movies = await self.movie_dao.bulk_create(db, [_movie_data(movie_in) for movie_in in movies_in])
+            await self._sync_dimensions(db, movies)
+        catalog_index.apply(movies)
+        suggest_index.apply(movies)
+        await catalog_cache.bump_version()
+        logger.info(f"Импортировано {len(movies)} фильмов")
+        return movies
+
     async def update_movie(self, db: AsyncSession, movie_id: int, movie_in: MovieUpdate) -> Movie:
         movie = await self.movie_dao.get_by_id(db, movie_id)
         if not movie:
             logger.error(f"Фильм с id {movie_id} не найден для обновления")
             raise MovieNotFoundException()
-        updated_data = movie_in.dict(exclude_unset=True)
-        movie = await self.movie_dao.update(db, movie, updated_data)
+        updated_data = _movie_data(movie_in, exclude_unset=True)
+        async with unit_of_work(db):
+            movie = await self.movie_dao.update(db, movie, updated_data)
+            if "genre" in updated_data or "country" in updated_data:
+                await self._sync_dimensions(db, [movie])
+        catalog_index.apply([movie], updated_data.keys())
+        suggest_index.apply([movie])
+        if "age_rating" in updated_data or "required_subscription" in updated_data:
+            await invalidate_movie_requirement(movie.id)
+        await catalog_cache.bump_version()
         logger.info(f"Фильм с id {movie.id} обновлён")
         return movie
 
-    async def get_movie(self, db: AsyncSession, movie_id: int) -> Movie:
-        movie = await self.movie_dao.get_by_id(db, movie_id)
+    async def get_movie(self, db: AsyncSession, movie_id: int, fields: Optional[Sequence[str]] = None) -> Movie:
+        """fields — поля MovieRead, только их колонки читаются из базы (None — все)."""
+        movie = await self.movie_dao.get_by_id(db, movie_id, _load_options(fields))
         if not movie:
             logger.warning(f"Фильм с id {movie_id} не найден")
             raise MovieNotFoundException()
         return movie
 
-    async def list_movies(
+    async def suggest_titles(self, db: AsyncSession, query: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """
+        Подсказки названий при вводе: совпадение с начала названия или с начала любого слова,
+        без учёта регистра и диакритики. Без индекса в памяти — запрос в базу по началу названия
+        (без учёта регистра, но с учётом диакритики).
+        """
+        suggestions = await suggest_index.query(db, query, limit)
+        if suggestions is not None:
+            return suggestions
+        prefix = query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        if not prefix:
+            return []
+        result = await db.execute(
+            select(Movie.id, Movie.title)
+            .where(func.lower(Movie.title).like(f"{prefix.lower()}%"))  # индекс ix_movies_title_lower_pattern
+            .order_by(Movie.review_count.desc(), Movie.rating.desc().nulls_last(), Movie.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def get_similar_movies(self, db: AsyncSession, movie_id: int, limit: Optional[int] = None) -> List[Movie]:
+        """
+        Похожие фильмы («кто оценил этот фильм, оценил и…»). Список считается
+        задачей app/tasks/movie_similarities.py; до первого расчёта он пуст.
+        """
+        limit = min(limit or settings.SIMILAR_MOVIES_TOP_K, settings.SIMILAR_MOVIES_TOP_K)
+        return await self.movie_dao.get_similar(db, movie_id, limit)
+
+    async def get_charts(
         self,
         db: AsyncSession,
-        genre: Optional[str] = None,
-        country: Optional[str] = None,
-        type_: Optional[str] = None,
-        release_year_from: Optional[int] = None,
-        release_year_to: Optional[int] = None,
-        rating_min: Optional[float] = None,
-        rating_max: Optional[float] = None,
-        search: Optional[str] = None,
-        sort_by: Optional[str] = "release_date",  # по умолчанию сортировка по дате выпуска
-        order: Optional[str] = "desc",            # по умолчанию — от новых к старым
-        skip: int = 0,
-        limit: int = 100
-    ) -> List[Movie]:
-        stmt = select(Movie)
+        genres: Sequence[str] = (),
+        trending: bool = True,
+        limit: Optional[int] = None
+    ) -> Dict[str, List[Movie]]:
+        """
+        Подборки "trending" и "лучшие по жанру" (ключи — "trending" и названия жанров как переданы)
+        одним запросом. Подборки пересобирает задача app/tasks/charts.py.
+        """
+        limit = min(limit or settings.CHARTS_SIZE, settings.CHARTS_SIZE)
+        names = {genre: genre_chart(dimension_slug(genre)) for genre in genres}
+        if trending:
+            names[TRENDING_CHART] = TRENDING_CHART
+        charts = await self.movie_dao.get_charts(db, list(names.values()), limit)
+        return {key: charts[chart] for key, chart in names.items()}
+
+    @staticmethod
+    def _filter_conditions(
+        genre_slugs: Sequence[str],
+        country_slugs: Sequence[str],
+        type_: Optional[str],
+        release_year_from: Optional[int],
+        release_year_to: Optional[int],
+        rating_min: Optional[float],
+        rating_max: Optional[float],
+        search: Optional[str]
+    ) -> Tuple[List[Any], Optional[Any]]:
+        """
+        Условия фильтров каталога; общие для списка фильмов и счётчиков фасетов.
+        Возвращает условия и поисковый tsquery (None без полнотекстового поиска).
+        """
         conditions = []
-        if genre:
-            conditions.append(Movie.genre.ilike(f"%{genre}%"))
-        if country:
-            conditions.append(Movie.country.ilike(f"%{country}%"))
+        if genre_slugs:
+            conditions.append(Movie.id.in_(
+                select(movie_genres.c.movie_id)
+                .join(Genre, Genre.id == movie_genres.c.genre_id)
+                .where(Genre.slug.in_(genre_slugs))
+            ))
+        if country_slugs:
+            conditions.append(Movie.country_id.in_(select(Country.id).where(Country.slug.in_(country_slugs))))
         if type_:
             conditions.append(Movie.type.ilike(f"%{type_}%"))
         if release_year_from:
@@ -69,26 +200,205 @@ class MovieService:
             conditions.append(Movie.rating >= rating_min)
         if rating_max is not None:
             conditions.append(Movie.rating <= rating_max)
-        if search:
+        ts_query = None
+        if search and settings.MOVIE_SEARCH_MODE == "fts":
+            ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, search)
+            conditions.append(Movie.search_vector.op("@@")(ts_query))
+        elif search:
             conditions.append(or_(
                 Movie.title.ilike(f"%{search}%"),
                 Movie.description.ilike(f"%{search}%")
             ))
+        return conditions, ts_query
+
+    async def list_movies(
+        self,
+        db: AsyncSession,
+        genre: Union[str, Sequence[str], None] = None,  # один или несколько жанров (строка через запятую или список)
+        country: Union[str, Sequence[str], None] = None,
+        type_: Optional[str] = None,
+        release_year_from: Optional[int] = None,
+        release_year_to: Optional[int] = None,
+        rating_min: Optional[float] = None,
+        rating_max: Optional[float] = None,
+        search: Optional[str] = None,
+        sort_by: Optional[str] = None,  # по умолчанию — по релевантности при поиске, иначе по дате выпуска
+        order: Optional[str] = "desc",  # по умолчанию — от новых к старым
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> List[Movie]:
+        movies, _ = await self.list_movies_page(
+            db, genre, country, type_, release_year_from, release_year_to,
+            rating_min, rating_max, search, sort_by, order, skip, limit, cursor
+        )
+        return movies
+
+    async def list_movies_page(
+        self,
+        db: AsyncSession,
+        genre: Union[str, Sequence[str], None] = None,
+        country: Union[str, Sequence[str], None] = None,
+        type_: Optional[str] = None,
+        release_year_from: Optional[int] = None,
+        release_year_to: Optional[int] = None,
+        rating_min: Optional[float] = None,
+        rating_max: Optional[float] = None,
+        search: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        order: Optional[str] = "desc",
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Movie], Optional[str]]:
+        """
+        Возвращает страницу фильмов и курсор следующей страницы.
+        fields — поля MovieRead, только их колонки (и поле сортировки) читаются из базы.
+        Если передан cursor, выборка идёт по ключу (sort_field, id) и skip игнорируется.
+        Поиск выполняется по полнотекстовому индексу; сортировка "relevance"
+        упорядочивает результаты по ts_rank и листается курсором по (ts_rank, id).
+        Жанры и страны фильтруются точным совпадением по справочникам (любой из переданных).
+        Запросы без поиска и курсора обслуживает индекс каталога в памяти, если он включён.
+        """
+        genre_slugs = dimension_filter(genre)
+        country_slugs = dimension_filter(country)
+        if not search and not cursor:
+            index_sort_by = sort_by if sort_by in SORT_FIELDS else "release_date"
+            index_order = "desc" if (order or "").lower() == "desc" else "asc"
+            ids = await catalog_index.query(
+                db, genres=genre_slugs, countries=country_slugs, type_=type_,
+                release_year_from=release_year_from, release_year_to=release_year_to,
+                rating_min=rating_min, rating_max=rating_max,
+                sort_by=index_sort_by, order=index_order, skip=skip, limit=limit
+            )
+            if ids is not None:
+                movies = await self.movie_dao.get_by_ids(db, ids, _load_options(fields, index_sort_by))
+                logger.info(f"Получено {len(movies)} фильмов из индекса каталога")
+                return movies, next_cursor_for(
+                    movies, limit, index_sort_by, index_order, lambda movie: getattr(movie, index_sort_by)
+                )
+        stmt = select(Movie)
+        conditions, ts_query = self._filter_conditions(
+            genre_slugs, country_slugs, type_, release_year_from, release_year_to, rating_min, rating_max, search
+        )
+        if sort_by is None:
+            sort_by = "relevance" if ts_query is not None else "release_date"
+        if sort_by == "relevance" and ts_query is not None:
+            # Ключ (ts_rank по убыванию, id по возрастанию): направления разные, поэтому
+            # условие курсора записано явно, а не сравнением кортежей
+            rank = func.ts_rank(Movie.search_vector, ts_query)
+            stmt = select(Movie, rank.label("rank")).options(*_load_options(fields)).order_by(rank.desc(), Movie.id.asc())
+            if cursor:
+                position = decode_cursor(cursor, "relevance", "desc")
+                conditions.append(or_(
+                    rank < position["value"],
+                    and_(rank == position["value"], Movie.id > position["id"]),
+                ))
+            elif skip:
+                stmt = stmt.offset(skip)
+            if conditions:
+                stmt = stmt.where(and_(*conditions))
+            rows = (await db.execute(stmt.limit(limit))).all()
+            movies = [movie for movie, _ in rows]
+            ranks = {movie.id: movie_rank for movie, movie_rank in rows}
+            logger.info(f"Получено {len(movies)} фильмов по поисковому запросу")
+            return movies, next_cursor_for(movies, limit, "relevance", "desc", lambda movie: ranks[movie.id])
+        if sort_by not in SORT_FIELDS:
+            sort_by = "release_date"
+        order = "desc" if (order or "").lower() == "desc" else "asc"
+        sort_field = SORT_FIELDS[sort_by]
+        descending = order == "desc"
+        stmt = stmt.options(*_load_options(fields, sort_by))
+        # id — дополнительный ключ сортировки, чтобы порядок был однозначным
+        stmt = stmt.order_by(*keyset_order_by(sort_field, Movie.id, descending))
+        if cursor:
+            position = decode_cursor(cursor, sort_by, order)
+            conditions.append(keyset_condition(sort_field, Movie.id, position["value"], position["id"], descending))
+        elif skip:
+            stmt = stmt.offset(skip)
         if conditions:
             stmt = stmt.where(and_(*conditions))
-        # Сортировка: разрешаем сортировать по rating, release_date, title
-        allowed_sort_fields = {
-            "rating": Movie.rating,
-            "release_date": Movie.release_date,
-            "title": Movie.title
-        }
-        sort_field = allowed_sort_fields.get(sort_by, Movie.release_date)
-        if order.lower() == "desc":
-            stmt = stmt.order_by(sort_field.desc())
-        else:
-            stmt = stmt.order_by(sort_field.asc())
-        stmt = stmt.offset(skip).limit(limit)
+        stmt = stmt.limit(limit)
         result = await db.execute(stmt)
         movies = result.scalars().all()
         logger.info(f"Получено {len(movies)} фильмов по фильтру")
-        return movies
+        return movies, next_cursor_for(movies, limit, sort_by, order, lambda movie: getattr(movie, sort_by))
+
+    async def facet_counts(
+        self,
+        db: AsyncSession,
+        genre: Union[str, Sequence[str], None] = None,
+        country: Union[str, Sequence[str], None] = None,
+        type_: Optional[str] = None,
+        release_year_from: Optional[int] = None,
+        release_year_to: Optional[int] = None,
+        rating_min: Optional[float] = None,
+        rating_max: Optional[float] = None,
+        search: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Количество фильмов по жанрам, странам, типам, десятилетиям выхода и целым значениям
+        рейтинга среди фильмов, подходящих под фильтры (те же, что в list_movies).
+        Все счётчики считаются одним запросом с GROUPING SETS; фильм с несколькими
+        жанрами учитывается в каждом из них, но в остальных фасетах — один раз.
+        """
+        conditions, _ = self._filter_conditions(
+            dimension_filter(genre), dimension_filter(country), type_,
+            release_year_from, release_year_to, rating_min, rating_max, search
+        )
+        decade = (func.floor(func.extract("year", Movie.release_date) / 10) * 10).label("decade")
+        rating_bucket = func.floor(Movie.rating).label("rating_bucket")
+        stmt = (
+            select(
+                Genre.slug.label("genre"), Genre.name.label("genre_name"),
+                Country.slug.label("country"), Country.name.label("country_name"),
+                Movie.type.label("type"), decade, rating_bucket,
+                func.grouping(Genre.slug).label("by_genre"),
+                func.grouping(Country.slug).label("by_country"),
+                func.grouping(Movie.type).label("by_type"),
+                func.grouping(decade).label("by_decade"),
+                func.grouping(rating_bucket).label("by_rating"),
+                func.count(distinct(Movie.id)).label("count"),
+            )
+            .select_from(Movie)
+            .outerjoin(movie_genres, movie_genres.c.movie_id == Movie.id)
+            .outerjoin(Genre, Genre.id == movie_genres.c.genre_id)
+            .outerjoin(Country, Country.id == Movie.country_id)
+            .group_by(func.grouping_sets(
+                tuple_(Genre.slug, Genre.name),
+                tuple_(Country.slug, Country.name),
+                tuple_(Movie.type),
+                tuple_(decade),
+                tuple_(rating_bucket),
+                tuple_(),
+            ))
+        )
+        if conditions:
+            stmt = stmt.where(and_(*conditions))
+        result = await db.execute(stmt)
+        facets: Dict[str, Any] = {"total": 0, "genre": [], "country": [], "type": [], "decade": [], "rating": []}
+        for row in result.all():
+            if row.by_genre == 0:
+                bucket = ("genre", row.genre, row.genre_name)
+            elif row.by_country == 0:
+                bucket = ("country", row.country, row.country_name)
+            elif row.by_type == 0:
+                bucket = ("type", row.type, row.type)
+            elif row.by_decade == 0:
+                bucket = ("decade", int(row.decade) if row.decade is not None else None, None)
+            elif row.by_rating == 0:
+                bucket = ("rating", int(row.rating_bucket) if row.rating_bucket is not None else None, None)
+            else:
+                facets["total"] = row.count
+                continue
+            name, value, label = bucket
+            # Фильмы без значения (например, без жанра) в фасет не попадают
+            if value is not None:
+                facets[name].append({"value": value, "label": label if label is not None else str(value), "count": row.count})
+        for name in ("genre", "country", "type"):
+            facets[name].sort(key=lambda item: (-item["count"], item["label"]))
+        for name in ("decade", "rating"):
+            facets[name].sort(key=lambda item: item["value"])
+        logger.info(f"Посчитаны фасеты каталога для {facets['total']} фильмов")
+        return facets
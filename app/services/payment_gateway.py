@@ -0,0 +1,165 @@
+# File: app/services/payment_gateway.py
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+
+from app.core.config import settings
+from app.exceptions.custom_exceptions import ExternalAPIErrorException, ExternalServiceUnavailableException
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых запрос имеет смысл повторить: конфликт блокировки, лимит запросов, сбои Stripe
+RETRY_STATUSES = {409, 429, 500, 502, 503, 504}
+
+
+def form_params(value: Any, prefix: str = "") -> List[Tuple[str, str]]:
+    """
+    Параметры в формате application/x-www-form-urlencoded, как их ждёт Stripe API:
+    вложенные словари и списки — через квадратные скобки (line_items[0][quantity]=1).
+    """
+    if isinstance(value, dict):
+        pairs = []
+        for key, item in value.items():
+            pairs += form_params(item, f"{prefix}[{key}]" if prefix else str(key))
+        return pairs
+    if isinstance(value, (list, tuple)):
+        pairs = []
+        for index, item in enumerate(value):
+            pairs += form_params(item, f"{prefix}[{index}]")
+        return pairs
+    if value is None:
+        return []
+    if isinstance(value, bool):
+        return [(prefix, "true" if value else "false")]
+    return [(prefix, str(value))]
+
+
+class StripeGateway:
+    """
+    Асинхронный клиент Stripe API поверх общего httpx.AsyncClient: соединения переиспользуются
+    из пула, у запросов строгие таймауты, число одновременных запросов ограничено семафором.
+    Сетевые ошибки и ответы из RETRY_STATUSES повторяются до max_retries раз с экспоненциальной
+    задержкой со случайным разбросом (full jitter); повторы безопасны благодаря Idempotency-Key.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url or settings.STRIPE_API_BASE
+        self.max_retries = settings.STRIPE_MAX_RETRIES if max_retries is None else max_retries
+        self.max_in_flight = max_in_flight or settings.STRIPE_MAX_IN_FLIGHT
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "last_latency_ms": None,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key or settings.STRIPE_SECRET_KEY}"},
+                timeout=httpx.Timeout(settings.STRIPE_TIMEOUT, connect=settings.STRIPE_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.STRIPE_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.STRIPE_MAX_CONNECTIONS,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return random.uniform(0, min(settings.STRIPE_RETRY_BACKOFF_MAX, settings.STRIPE_RETRY_BACKOFF * 2 ** attempt))
+
+    async def _send(self, path: str, params: Dict[str, Any], idempotency_key: Optional[str]) -> httpx.Response:
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        content = urlencode(form_params(params))
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            started = time.perf_counter()
+            try:
+                return await self.client.post(path, content=content, headers=headers)
+            finally:
+                self.stats["in_flight"] -= 1
+                latency_ms = (time.perf_counter() - started) * 1000
+                self.stats["last_latency_ms"] = round(latency_ms, 1)
+                self.stats["max_latency_ms"] = round(max(self.stats["max_latency_ms"], latency_ms), 1)
+                self.stats["total_latency_ms"] = round(self.stats["total_latency_ms"] + latency_ms, 1)
+
+    async def post(self, path: str, params: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        POST к Stripe API с повторами. Возвращает JSON ответа.
+        ExternalAPIErrorException — Stripe отклонил запрос, ExternalServiceUnavailableException —
+        Stripe недоступен и повторы исчерпаны.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._send(path, params, idempotency_key)
+            except httpx.TransportError as e:  # таймауты и ошибки соединения
+                reason = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                should_retry = response.headers.get("Stripe-Should-Retry")
+                retryable = response.status_code in RETRY_STATUSES if should_retry is None else should_retry == "true"
+                reason = f"HTTP {response.status_code}: {_error_message(response)}"
+                if not retryable:
+                    self.stats["errors"] += 1
+                    logger.error(f"Stripe отклонил запрос {path}: {reason}")
+                    raise ExternalAPIErrorException(f"Ошибка Stripe: {_error_message(response)}")
+            if attempt == self.max_retries:
+                break
+            self.stats["retries"] += 1
+            delay = self._backoff(attempt)
+            logger.warning(f"Запрос {path} к Stripe не удался ({reason}), повтор через {delay:.2f} с")
+            await asyncio.sleep(delay)
+        self.stats["errors"] += 1
+        logger.error(f"Stripe недоступен, запрос {path} не выполнен: {reason}")
+        raise ExternalServiceUnavailableException("Платёжный сервис временно недоступен. Попробуйте повторить запрос позже")
+
+    async def create_checkout_session(self, idempotency_key: Optional[str] = None, **params: Any) -> Dict[str, Any]:
+        """Создаёт Checkout Session; параметры — как у stripe.checkout.Session.create."""
+        return await self.post("/v1/checkout/sessions", params, idempotency_key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "limit": self.max_in_flight}
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        return response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return response.text[:200]
+
+
+stripe_gateway = StripeGateway()
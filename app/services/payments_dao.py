@@ -1,18 +1,18 @@
 # File: app/services/payments_dao.py
-import stripe
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.dao.payments_dao import PaymentDAO
 from app.schemas.payments import PaymentCreate
 from app.models.payments import Payment, PaymentStatus
 from app.exceptions.custom_exceptions import PaymentNotFoundException
-from app.core.config import settings
+from app.services.payment_gateway import StripeGateway, stripe_gateway
 
 logger = logging.getLogger(__name__)
 
 class PaymentService:
-    def __init__(self, payment_dao: PaymentDAO = None):
+    def __init__(self, payment_dao: PaymentDAO = None, gateway: StripeGateway = None):
         self.payment_dao = payment_dao or PaymentDAO()
+        self.gateway = gateway or stripe_gateway
 
     async def create_payment(self, db: AsyncSession, payment_in: PaymentCreate) -> Payment:
         payment_data = payment_in.dict()
@@ -20,11 +20,12 @@ class PaymentService:
         logger.info(f"Создан платёж с id {payment.id} для пользователя {payment.user_id}")
         return payment
 
-    async def update_payment(self, db: AsyncSession, payment_id: int, update_data: dict) -> Payment:
-        payment = await self.payment_dao.get_by_id(db, payment_id)
+    async def update_payment(self, db: AsyncSession, payment_id: int, update_data) -> Payment:
+        if not isinstance(update_data, dict):
+            update_data = update_data.dict(exclude_unset=True)
+        payment = await self.payment_dao.update_by_id(db, payment_id, update_data)
         if not payment:
             raise PaymentNotFoundException()
-        payment = await self.payment_dao.update(db, payment, update_data)
         logger.info(f"Обновлён платёж с id {payment.id}")
         return payment
 
@@ -37,24 +38,22 @@ class PaymentService:
     async def initiate_payment(self, db: AsyncSession, payment_in: PaymentCreate) -> dict:
         payment = await self.create_payment(db, payment_in)
         order_id = str(payment.id)
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        try:
-            checkout_session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=[{
-                    "price_data": {
-                        "currency": "usd",
-                        "product_data": {"name": f"Subscription Payment {payment_in.subscription_id}".strip()},
-                        "unit_amount": int(payment.amount * 100)
-                    },
-                    "quantity": 1,
-                }],
-                mode="payment",
-                success_url="http://localhost:8000/success?session_id={CHECKOUT_SESSION_ID}",
-                cancel_url="http://localhost:8000/cancel",
-                metadata={"order_id": order_id, "subscription_id": payment_in.subscription_id}
-            )
-            logger.info(f"Создан Stripe Checkout Session для платежа {payment.id}")
-            return {"payment_id": payment.id, "checkout_url": checkout_session.url}
-        except Exception as e:
-            raise Exception(f"Ошибка Stripe: {str(e)}")
+        # Вызов Stripe не блокирует event loop; повтор с тем же ключом не создаст вторую сессию
+        checkout_session = await self.gateway.create_checkout_session(
+            idempotency_key=f"checkout-{payment.id}",
+            payment_method_types=["card"],
+            line_items=[{
+                "price_data": {
+                    "currency": "usd",
+                    "product_data": {"name": f"Subscription Payment {payment_in.subscription_id}".strip()},
+                    "unit_amount": int(payment.amount * 100)
+                },
+                "quantity": 1,
+            }],
+            mode="payment",
+            success_url="http://localhost:8000/success?session_id={CHECKOUT_SESSION_ID}",
+            cancel_url="http://localhost:8000/cancel",
+            metadata={"order_id": order_id, "subscription_id": payment_in.subscription_id}
+        )
+        logger.info(f"Создан Stripe Checkout Session для платежа {payment.id}")
+        return {"payment_id": payment.id, "checkout_url": checkout_session["url"]}
@@ -1,41 +1,107 @@
 # File: app/services/reviews_service.py
 import logging
-from typing import List, Optional
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.dao.movies_dao import MovieDAO
 from app.dao.reviews_dao import ReviewDAO
+from app.database.unit_of_work import unit_of_work
 from app.schemas.reviews import ReviewCreate, ReviewUpdate
 from app.models.reviews import Review
 from app.exceptions.custom_exceptions import ReviewNotFoundException
 
 logger = logging.getLogger(__name__)
 
+def _contribution(review: Review) -> Tuple[int, int, Dict[int, int]]:
+    """Вклад отзыва в агрегаты фильма: (количество, сумма оценок, гистограмма)."""
+    if review.is_deleted:
+        return 0, 0, {}
+    return 1, review.rating, {review.rating: 1}
+
 class ReviewService:
-    def __init__(self, review_dao: Optional[ReviewDAO] = None):
+    def __init__(self, review_dao: Optional[ReviewDAO] = None, movie_dao: Optional[MovieDAO] = None):
         self.review_dao = review_dao or ReviewDAO()
+        self.movie_dao = movie_dao or MovieDAO()
+
+    async def _apply_delta(
+        self,
+        db: AsyncSession,
+        movie_id: int,
+        before: Tuple[int, int, Dict[int, int]],
+        after: Tuple[int, int, Dict[int, int]]
+    ) -> None:
+        histogram = Counter(after[2])
+        histogram.subtract(before[2])
+        if after[0] == before[0] and after[1] == before[1] and not any(histogram.values()):
+            return
+        await self.movie_dao.apply_review_delta(db, movie_id, after[0] - before[0], after[1] - before[1], histogram)
+        # Кэш каталога намеренно не сбрасывается: число отзывов и оценка зрителей в закэшированных
+        # ответах отстают не дольше CATALOG_CACHE_TTL, а горячие ключи не уходят в базу разом
 
     async def create_review(self, db: AsyncSession, review_in: ReviewCreate) -> Review:
-        review = await self.review_dao.create(db, review_in.dict())
+        async with unit_of_work(db):
+            review = await self.review_dao.create(db, review_in.dict())
+            await self._apply_delta(db, review.movie_id, (0, 0, {}), _contribution(review))
         logger.info(f"Создан отзыв с id {review.id} для фильма {review.movie_id}")
         return review
 
-    async def list_reviews_for_movie(self, db: AsyncSession, movie_id: int) -> List[Review]:
-        from sqlalchemy import select
-        stmt = select(Review).where(Review.movie_id == movie_id, Review.is_deleted == False)
-        result = await db.execute(stmt)
-        reviews = result.scalars().all()
+    async def list_reviews_for_movie(
+        self,
+        db: AsyncSession,
+        movie_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        with_movie: bool = False
+    ) -> List[Review]:
+        reviews, _ = await self.list_reviews_page(db, movie_id, limit, cursor, with_movie)
         return reviews
 
+    async def list_reviews_page(
+        self,
+        db: AsyncSession,
+        movie_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        with_movie: bool = False
+    ) -> Tuple[List[Review], Optional[str]]:
+        """
+        Страница неудалённых отзывов фильма, новые первыми, и курсор следующей страницы.
+        Автор (и при with_movie — фильм) загружается тем же запросом.
+        Размер страницы ограничен REVIEWS_MAX_PAGE_SIZE; выборку обслуживает частичный
+        индекс ix_reviews_movie_id_created_at_live.
+        """
+        limit = min(limit or settings.REVIEWS_PAGE_SIZE, settings.REVIEWS_MAX_PAGE_SIZE)
+        return await self.review_dao.list_keyset(
+            db,
+            limit=limit,
+            cursor=cursor,
+            sort_by="created_at",
+            order="desc",
+            filters=[Review.movie_id == movie_id, Review.is_deleted == False],
+            base_stmt=self.review_dao.with_author_stmt(with_movie)
+        )
+
+    async def get_review(self, db: AsyncSession, review_id: int) -> Optional[Review]:
+        return await self.review_dao.get_by_id(db, review_id)
+
     async def delete_review(self, db: AsyncSession, review_id: int) -> Review:
-        review = await self.review_dao.get_by_id(db, review_id)
-        if not review:
-            raise ReviewNotFoundException()
-        # Вместо физического удаления, помечаем как удалённый
-        review = await self.review_dao.update(db, review, {"is_deleted": True})
-        return review
+        return await self._change_review(db, review_id, {"is_deleted": True})
 
     async def update_review(self, db: AsyncSession, review_id: int, review_in: ReviewUpdate) -> Review:
-        review = await self.review_dao.get_by_id(db, review_id)
-        if not review:
-            raise ReviewNotFoundException()
-        review = await self.review_dao.update(db, review, review_in.dict(exclude_unset=True))
+        return await self._change_review(db, review_id, review_in.dict(exclude_unset=True))
+
+    async def _change_review(self, db: AsyncSession, review_id: int, changes: Dict) -> Review:
+        """
+        Изменяет отзыв и в той же транзакции сдвигает агрегаты фильма на разницу вкладов
+        до и после изменения. Строка отзыва блокируется до коммита.
+        """
+        async with unit_of_work(db):
+            review = await self.review_dao.get_for_update(db, review_id)
+            if not review:
+                raise ReviewNotFoundException()
+            before = _contribution(review)
+            # Вместо физического удаления отзыв помечается как удалённый (is_deleted)
+            review = await self.review_dao.update(db, review, changes)
+            await self._apply_delta(db, review.movie_id, before, _contribution(review))
         return review
@@ -2,14 +2,23 @@
 import logging
 from typing import List, Optional
 from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.dao.subscriptions_dao import SubscriptionDAO
 from app.schemas.subscriptions import SubscriptionCreate, SubscriptionUpdate
-from app.models.subscriptions import Subscription
-from app.exceptions.custom_exceptions import SubscriptionNotFoundException
+from app.models.subscriptions import OPEN_STATUSES, Subscription, SubscriptionStatus
+from app.exceptions.custom_exceptions import SubscriptionConflictException, SubscriptionNotFoundException
+from app.database.unit_of_work import run_after_commit
+from app.services.entitlements_service import invalidate_entitlements
+from app.services.users_service import invalidate_profile
 
 logger = logging.getLogger(__name__)
 
+async def invalidate_subscription_caches(user_id: int) -> None:
+    """Сбрасывает закэшированные данные, зависящие от подписок пользователя."""
+    await invalidate_entitlements(user_id)
+    await invalidate_profile(user_id)
+
 class SubscriptionService:
     def __init__(self, subscription_dao: Optional[SubscriptionDAO] = None):
         self.subscription_dao = subscription_dao or SubscriptionDAO()
@@ -18,19 +27,50 @@ class SubscriptionService:
         if not sub_data.get("start_date"):
             sub_data["start_date"] = datetime.now(timezone.utc)
         subscription = await self.subscription_dao.create(db, sub_data)
+        await run_after_commit(db, lambda: invalidate_subscription_caches(subscription.user_id))
         logger.info(f"Создана подписка с id {subscription.id} для пользователя {subscription.user_id}")
         return subscription
 
+    async def purchase_subscription(self, db: AsyncSession, sub_data: dict) -> Subscription:
+        """
+        Оформляет подписку, если у пользователя нет ожидающей оплаты или активной:
+        проверка и вставка — один запрос, поэтому из одновременных покупок проходит одна.
+        """
+        if not sub_data.get("start_date"):
+            sub_data["start_date"] = datetime.now(timezone.utc)
+        subscription = await self.subscription_dao.create_if_none_open(db, sub_data)
+        if subscription is None:
+            existing = await self.get_open_subscription(db, sub_data["user_id"])
+            logger.info(f"Пользователь {sub_data['user_id']} уже имеет открытую подписку")
+            if existing is None:
+                raise SubscriptionConflictException()
+            raise SubscriptionConflictException(
+                f"У вас уже есть подписка: {existing.plan} со статусом {existing.status.value}. Завершите оплату, чтобы продолжить."
+            )
+        await run_after_commit(db, lambda: invalidate_subscription_caches(subscription.user_id))
+        logger.info(f"Оформлена подписка с id {subscription.id} для пользователя {subscription.user_id}")
+        return subscription
+
     async def update_subscription(self, db: AsyncSession, sub_id: int, sub_in) -> Subscription:
-        subscription = await self.subscription_dao.get_by_id(db, sub_id)
-        if not subscription:
-            logger.error(f"Подписка с id {sub_id} не найдена")
-            raise SubscriptionNotFoundException()
         if isinstance(sub_in, dict):
             updated_data = sub_in
         else:
             updated_data = sub_in.dict(exclude_unset=True)
-        subscription = await self.subscription_dao.update(db, subscription, updated_data)
+        try:
+            subscription = await self.subscription_dao.update_by_id(db, sub_id, updated_data)
+        except IntegrityError as e:
+            # Перевод второй подписки пользователя в ожидающие или активные нарушает
+            # uq_subscriptions_user_open; транзакцию DAO (или единица работы) уже откатывает
+            if "uq_subscriptions_user_open" not in str(e.orig):
+                raise
+            logger.info(f"Подписка с id {sub_id} не обновлена: у пользователя уже есть открытая подписка")
+            raise SubscriptionConflictException(
+                "У пользователя уже есть подписка, ожидающая оплаты или активная"
+            )
+        if not subscription:
+            logger.error(f"Подписка с id {sub_id} не найдена")
+            raise SubscriptionNotFoundException()
+        await run_after_commit(db, lambda: invalidate_subscription_caches(subscription.user_id))
         logger.info(f"Подписка с id {subscription.id} обновлена")
         return subscription
 
@@ -46,16 +86,14 @@ class SubscriptionService:
         logger.info(f"Получено {len(subscriptions)} подписок")
         return subscriptions
 
-    async def get_active_subscription(self, db: AsyncSession, user_id: int):
-        subscriptions = await self.subscription_dao.list(db, skip=0, limit=100)
-        for sub in subscriptions:
-            if sub.user_id == user_id and sub.status.value.lower() == "active":
-                return sub
-        return None
+    async def get_active_subscription(self, db: AsyncSession, user_id: int) -> Optional[Subscription]:
+        return await self.subscription_dao.get_by_user_and_status(db, user_id, [SubscriptionStatus.ACTIVE])
+
+    async def get_open_subscription(self, db: AsyncSession, user_id: int) -> Optional[Subscription]:
+        """
+        Возвращает подписку пользователя, ожидающую оплаты или уже активную.
+        """
+        return await self.subscription_dao.get_by_user_and_status(db, user_id, OPEN_STATUSES)
 
     async def get_subscription_by_plan(self, db: AsyncSession, user_id: int, plan: str) -> Optional[Subscription]:
-        subscriptions = await self.subscription_dao.list(db, skip=0, limit=1000)
-        for sub in subscriptions:
-            if sub.user_id == user_id and sub.plan.lower() == plan.lower():
-                return sub
-        return None
+        return await self.subscription_dao.get_by_user_and_plan(db, user_id, plan)
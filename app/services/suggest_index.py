@@ -0,0 +1,207 @@
+# File: app/services/suggest_index.py
+import asyncio
+import heapq
+import logging
+import re
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.movies import Movie
+from app.utils.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+# Таблица для str.translate, удаляющая комбинируемые знаки (ударения, диерезис и т. п.)
+_COMBINING = dict.fromkeys(cp for cp in range(0x300, 0x10000) if unicodedata.combining(chr(cp)))
+# Верхняя граница кодовых точек: ключи с префиксом q лежат в [q, q + _MAX_CHAR)
+_MAX_CHAR = "\U0010ffff"
+
+
+def fold_title(text: str) -> str:
+    """
+    Ключ для поиска по началу слов: без регистра и диакритики (é → e, ё → е),
+    знаки препинания и повторные пробелы заменены одним пробелом.
+    """
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).translate(_COMBINING)
+    return " ".join(_WORD_RE.findall(text))
+
+
+def _keys(title: str) -> Tuple[str, List[str]]:
+    """Ключ всего названия и ключи, начинающиеся с каждого следующего слова."""
+    folded = fold_title(title)
+    starts = [m.start() for m in _WORD_RE.finditer(folded)][1:]
+    return folded, [folded[start:] for start in starts]
+
+
+class _SortedKeys:
+    """Отсортированные пары (ключ, id фильма) в двух параллельных списках."""
+
+    def __init__(self, keys: Sequence[str] = (), ids: Sequence[int] = ()):
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.ids = [ids[i] for i in order]
+
+    def add(self, key: str, id: int) -> None:
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, id)
+
+    def remove(self, key: str, id: int) -> None:
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == id:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def range(self, prefix: str) -> Tuple[int, int]:
+        return bisect_left(self.keys, prefix), bisect_left(self.keys, prefix + _MAX_CHAR)
+
+
+class SuggestIndex:
+    """
+    Префиксный индекс названий фильмов в памяти процесса для подсказок при вводе.
+    Хранит отсортированные ключи названий (совпадение с начала названия) и ключи
+    с начала каждого следующего слова; диапазон совпадений находится двоичным поиском.
+    Совпадения с начала названия идут раньше совпадений по слову, внутри — по популярности
+    (число отзывов), затем по рейтингу. Для коротких префиксов с большим числом совпадений
+    результат ранжирования запоминается до следующего изменения индекса.
+    Изменения из этого процесса применяются сразу через apply(), изменения других воркеров
+    становятся видны после перечитывания раз в ttl секунд.
+    """
+
+    def __init__(self, name: str = "suggest_index", ttl: float = settings.SUGGEST_INDEX_TTL):
+        self.name = name
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"queries": 0, "memo_hits": 0, "loads": 0, "deltas": 0}
+        caches[name] = self
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SUGGEST_INDEX_ENABLED
+
+    @staticmethod
+    def _build(rows: Sequence[Sequence[Any]]) -> Tuple[Dict[int, str], Dict[int, Tuple[int, float]], _SortedKeys, _SortedKeys]:
+        titles: Dict[int, str] = {}
+        rank: Dict[int, Tuple[int, float]] = {}
+        title_keys, title_ids, word_keys, word_ids = [], [], [], []
+        for id, title, review_count, rating in rows:
+            titles[id] = title
+            rank[id] = (review_count or 0, rating or 0.0)
+            folded, words = _keys(title)
+            title_keys.append(folded)
+            title_ids.append(id)
+            word_keys.extend(words)
+            word_ids.extend([id] * len(words))
+        return titles, rank, _SortedKeys(title_keys, title_ids), _SortedKeys(word_keys, word_ids)
+
+    def _install(self, titles, rank, by_title: _SortedKeys, by_word: _SortedKeys) -> None:
+        # Без await между присваиваниями: запросы в event loop не видят индекс наполовину заменённым
+        self._titles, self._rank, self._by_title, self._by_word = titles, rank, by_title, by_word
+        self._memo: Dict[Tuple[str, int], List[int]] = {}
+        self.loaded_at = time.monotonic()
+        self.stats["loads"] += 1
+
+    def load_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        """Строит индекс из строк (id, title, review_count, rating)."""
+        self._install(*self._build(rows))
+
+    async def load(self, db: AsyncSession) -> None:
+        result = await db.execute(select(Movie.id, Movie.title, Movie.review_count, Movie.rating))
+        # Сборка сотен тысяч ключей занимает секунды — выполняем её вне event loop
+        self._install(*await asyncio.to_thread(self._build, result.all()))
+        logger.info(f"Индекс подсказок загружен: {len(self._titles)} фильмов")
+
+    async def _ensure_loaded(self, db: AsyncSession) -> None:
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return
+        if self.loaded_at is not None and self._lock.locked():
+            return  # индекс уже перечитывается, пока отвечаем по прежнему
+        async with self._lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl:
+                await self.load(db)
+
+    def _best(self, keys: _SortedKeys, bounds: Tuple[int, int], limit: int, exclude: Iterable[int] = ()) -> List[int]:
+        lo, hi = bounds
+        exclude = set(exclude)
+        candidates = {id for id in keys.ids[lo:hi] if id not in exclude}
+        return heapq.nlargest(limit, candidates, key=lambda id: (self._rank[id], -id))
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """Возвращает до limit пар (id, название) для введённого текста."""
+        prefix = fold_title(query)
+        if not prefix:
+            return []
+        self.stats["queries"] += 1
+        memo_key = (prefix, limit)
+        ids = self._memo.get(memo_key)
+        if ids is not None:
+            self.stats["memo_hits"] += 1
+        else:
+            title_bounds, word_bounds = self._by_title.range(prefix), self._by_word.range(prefix)
+            ids = self._best(self._by_title, title_bounds, limit)
+            if len(ids) < limit:
+                ids += self._best(self._by_word, word_bounds, limit - len(ids), exclude=ids)
+            matches = title_bounds[1] - title_bounds[0] + word_bounds[1] - word_bounds[0]
+            if matches > settings.SUGGEST_MEMO_MIN_MATCHES:
+                self._memo[memo_key] = ids
+        return [(id, self._titles[id]) for id in ids]
+
+    async def query(self, db: AsyncSession, query: str, limit: int = 10) -> Optional[List[Tuple[int, str]]]:
+        """Загружает индекс при необходимости и выполняет search(). None — индекс выключен."""
+        if not self.enabled:
+            return None
+        await self._ensure_loaded(db)
+        return self.search(query, limit)
+
+    def apply(self, movies: Iterable[Movie]) -> None:
+        """Применяет созданные или изменённые фильмы: старые ключи названия заменяются новыми."""
+        if self.loaded_at is None:
+            return
+        changed_keys: List[str] = []
+        for movie in movies:
+            old_title = self._titles.get(movie.id)
+            folded, words = _keys(movie.title)
+            if old_title != movie.title:
+                if old_title is not None:
+                    old_folded, old_words = _keys(old_title)
+                    self._by_title.remove(old_folded, movie.id)
+                    for key in old_words:
+                        self._by_word.remove(key, movie.id)
+                    changed_keys.extend([old_folded, *old_words])
+                self._by_title.add(folded, movie.id)
+                for key in words:
+                    self._by_word.add(key, movie.id)
+                self._titles[movie.id] = movie.title
+            # Ранг мог измениться и без смены названия
+            self._rank[movie.id] = (movie.review_count or 0, movie.rating or 0.0)
+            changed_keys.extend([folded, *words])
+        # Запомненные результаты сбрасываются только для префиксов изменённых ключей
+        for memo_key in [k for k in self._memo if any(key.startswith(k[0]) for key in changed_keys)]:
+            del self._memo[memo_key]
+        self.stats["deltas"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        loaded = self.loaded_at is not None
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "titles": len(self._titles) if loaded else 0,
+            "word_keys": len(self._by_word.keys) if loaded else 0,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if loaded else None,
+        }
+
+
+suggest_index = SuggestIndex()
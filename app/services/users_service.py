@@ -1,15 +1,31 @@
 # File: app/services/users_service.py
 import logging
+from datetime import datetime, timezone
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.dao.users_dao import UserDAO
-from app.schemas.users import UserCreate, UserUpdate
+from app.schemas.users import UserCreate, UserRead, UserUpdate, UserWithSubscription
+from app.schemas.subscriptions import SubscriptionRead
 from app.models.users import User, UserRole
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async, invalidate_principal
 from app.exceptions.custom_exceptions import UserAlreadyExistsException, UserNotFoundException
+from app.utils.cache import TieredCache
 
 logger = logging.getLogger(__name__)
 
+# Снимки профиля по id пользователя (UserWithSubscription в JSON). Сбрасываются при
+# изменении пользователя и его подписок, живут не дольше окончания подписки
+profile_cache = TieredCache(
+    "profiles",
+    maxsize=settings.PROFILE_CACHE_SIZE,
+    ttl=settings.PROFILE_CACHE_TTL,
+    local_ttl=settings.PROFILE_CACHE_LOCAL_TTL,
+)
+
+async def invalidate_profile(user_id: int) -> None:
+    await profile_cache.delete(int(user_id))
+
 class UserService:
     def __init__(self, user_dao: Optional[UserDAO] = None):
         self.user_dao = user_dao or UserDAO()
@@ -21,7 +37,7 @@ class UserService:
                 logger.error(f"Регистрация: пользователь с email {user_in.email} уже существует")
                 raise UserAlreadyExistsException()
             user_data = user_in.dict()
-            user_data["hashed_password"] = get_password_hash(user_data["password"])
+            user_data["hashed_password"] = await get_password_hash_async(user_data["password"])
             user_data.pop("password")
             # Для удобства тестирования устанавливаем роль "ADMIN" для всех новых пользователей.
             # Если нужно, измените на "USER".
@@ -41,9 +57,11 @@ class UserService:
                 raise UserNotFoundException()
             user_data = user_in.dict(exclude_unset=True)
             if "password" in user_data and user_data["password"]:
-                user_data["hashed_password"] = get_password_hash(user_data["password"])
+                user_data["hashed_password"] = await get_password_hash_async(user_data["password"])
                 del user_data["password"]
             user = await self.user_dao.update(db, user, user_data)
+            await invalidate_principal(user.id)
+            await invalidate_profile(user.id)
             logger.info(f"Обновлены данные пользователя с id {user.id}")
             return user
         except Exception as e:
@@ -61,6 +79,33 @@ class UserService:
             logger.exception(f"Ошибка при получении пользователя с id {user_id}: {e}")
             raise e
 
+    async def get_profile_snapshot(self, db: AsyncSession, user_id: int) -> UserWithSubscription:
+        """
+        Профиль для /users/me и страницы профиля: пользователь, активная подписка
+        и оставшиеся дни — один запрос к базе при промахе кэша.
+        db должна быть сессией основной базы: кэш сбрасывается сразу после коммита изменений
+        подписки, и промах, прочитанный с отстающей реплики, закэшировал бы старый профиль.
+        """
+        cached = await profile_cache.get(user_id)
+        if cached is not None:
+            return UserWithSubscription.model_validate(cached)
+        row = await self.user_dao.get_profile(db, user_id)
+        if row is None:
+            logger.warning(f"Пользователь с id {user_id} не найден")
+            raise UserNotFoundException()
+        user, subscription, remaining_days = row
+        snapshot = UserWithSubscription(
+            user=UserRead.model_validate(user),
+            subscription=SubscriptionRead.model_validate(subscription) if subscription else None,
+            remaining_days=remaining_days or 0,
+            message="Подписка активна" if subscription else "Подписка отсутствует",
+        )
+        ttl = None
+        if subscription is not None and subscription.end_date is not None:
+            ttl = (subscription.end_date - datetime.now(timezone.utc)).total_seconds()
+        await profile_cache.set(user_id, snapshot.model_dump(mode="json"), ttl)
+        return snapshot
+
     async def get_user_by_email(self, db: AsyncSession, email: str) -> User:
         try:
             user = await self.user_dao.get_by_email(db, email)
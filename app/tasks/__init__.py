@@ -0,0 +1,8 @@
+# File: app/tasks/__init__.py
+# Задачи запускаются отдельно от приложения (python -m app.tasks.<задача>), поэтому
+# все модели импортируются здесь: строковые ссылки в relationship() должны разрешиться
+from app.models.users import User  # noqa: F401
+from app.models.movies import Movie  # noqa: F401
+from app.models.reviews import Review  # noqa: F401
+from app.models.subscriptions import Subscription  # noqa: F401
+from app.models.payments import Payment  # noqa: F401
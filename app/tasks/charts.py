@@ -0,0 +1,144 @@
+# File: app/tasks/charts.py
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Float, cast, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.charts import MovieChart, TRENDING_CHART
+from app.models.genres import Genre, movie_genres
+from app.models.movies import Movie
+from app.models.reviews import Review
+from app.tasks.periodic import JobMetrics, run_once, start_periodic
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки: пересборку одновременно выполняет только один воркер
+CHARTS_LOCK_KEY = 0x6368617274
+
+CHART_COLUMNS = ["chart", "rank", "movie_id", "score", "refreshed_at"]
+
+_metrics = JobMetrics(runs_key="refreshes", finished_at_key="last_refreshed_at", rows=0)
+
+
+def _trending_select():
+    """
+    Популярность за последние CHARTS_TRENDING_WINDOW_DAYS дней: сумма оценок, каждая
+    с весом 0.5 ** (возраст / период полураспада), так что свежие отзывы весят больше.
+    """
+    half_life = settings.CHARTS_TRENDING_HALF_LIFE_HOURS * 3600
+    weight = func.power(0.5, func.extract("epoch", func.now() - Review.created_at) / half_life)
+    scores = (
+        select(Review.movie_id, func.sum(Review.rating * weight).label("score"))
+        .where(
+            Review.is_deleted.is_not(True),
+            Review.created_at >= func.now() - timedelta(days=settings.CHARTS_TRENDING_WINDOW_DAYS),
+        )
+        .group_by(Review.movie_id)
+        .subquery()
+    )
+    ranked = select(
+        scores.c.movie_id,
+        scores.c.score,
+        func.row_number().over(order_by=(scores.c.score.desc(), scores.c.movie_id)).label("rank"),
+    ).subquery()
+    return (
+        select(literal(TRENDING_CHART), ranked.c.rank, ranked.c.movie_id, ranked.c.score, func.now())
+        .where(ranked.c.rank <= settings.CHARTS_SIZE)
+    )
+
+
+def _top_rated_select(prior: float):
+    """
+    Лучшие фильмы каждого жанра по оценкам зрителей. Средняя оценка сглаживается к средней
+    по каталогу prior (байесовское среднее с весом CHARTS_MIN_REVIEWS), чтобы фильм с парой
+    десяток не обгонял фильм с сотней девяток.
+    """
+    prior_weight = settings.CHARTS_MIN_REVIEWS
+    score = (
+        (cast(Movie.rating_sum, Float) + prior_weight * prior)
+        / cast(Movie.review_count + prior_weight, Float)
+    )
+    ranked = (
+        select(
+            func.concat("genre:", Genre.slug).label("chart"),
+            Movie.id.label("movie_id"),
+            score.label("score"),
+            func.row_number().over(partition_by=Genre.id, order_by=(score.desc(), Movie.id)).label("rank"),
+        )
+        .select_from(movie_genres)
+        .join(Movie, Movie.id == movie_genres.c.movie_id)
+        .join(Genre, Genre.id == movie_genres.c.genre_id)
+        .where(Movie.review_count >= prior_weight)
+        .subquery()
+    )
+    return (
+        select(ranked.c.chart, ranked.c.rank, ranked.c.movie_id, ranked.c.score, func.now())
+        .where(ranked.c.rank <= settings.CHARTS_SIZE)
+    )
+
+
+async def refresh_charts(db: AsyncSession, fresh_for: Optional[float] = None) -> Optional[int]:
+    """
+    Пересобирает все подборки одной транзакцией (DELETE + INSERT ... SELECT).
+    Читатели до коммита видят прежние подборки и не блокируются.
+    С fresh_for (секунды) пересборка пропускается, если подборки собраны позже, чем fresh_for
+    секунд назад: задача запущена в каждом воркере, но за интервал пересобирает одна.
+    Возвращает число записанных строк или None, если пересборку уже выполняет другой воркер
+    или подборки ещё свежие.
+    """
+    started = time.perf_counter()
+    try:
+        locked = await db.scalar(select(func.pg_try_advisory_xact_lock(CHARTS_LOCK_KEY)))
+        if locked and fresh_for is not None:
+            # Проверяем под блокировкой, чтобы увидеть результат только что закончившего воркера
+            fresh = await db.scalar(select(
+                func.max(MovieChart.refreshed_at) > func.now() - timedelta(seconds=fresh_for)
+            ))
+            locked = not fresh
+        if not locked:
+            await db.rollback()
+            _metrics.skipped()
+            return None
+        prior = await db.scalar(select(
+            cast(func.sum(Movie.rating_sum), Float) / func.nullif(func.sum(Movie.review_count), 0)
+        ))
+        await db.execute(delete(MovieChart))
+        rows = 0
+        for source in (_trending_select(), _top_rated_select(prior or 0.0)):
+            result = await db.execute(insert(MovieChart).from_select(CHART_COLUMNS, source))
+            rows += result.rowcount
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        _metrics.failed()
+        raise
+    duration_ms = _metrics.finished(started, rows=rows)
+    logger.info(f"Подборки пересобраны за {duration_ms:.0f} мс, строк: {rows}")
+    return rows
+
+
+def chart_refresh_stats() -> Dict[str, Any]:
+    """Метрики пересборки подборок: число запусков, пропусков, ошибок и длительность."""
+    return _metrics.snapshot()
+
+
+def start_chart_refresher() -> Optional[asyncio.Task]:
+    """
+    Запускает периодическую пересборку подборок в фоне процесса приложения.
+    В режиме TEST и при CHARTS_REFRESH_INTERVAL = 0 ничего не запускает.
+    """
+    interval = settings.CHARTS_REFRESH_INTERVAL
+
+    async def refresh_if_stale(db: AsyncSession) -> Optional[int]:
+        return await refresh_charts(db, fresh_for=interval / 2)
+
+    return start_periodic(refresh_if_stale, interval, "пересборка подборок")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_once(refresh_charts))
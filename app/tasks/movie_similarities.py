@@ -0,0 +1,167 @@
+# File: app/tasks/movie_similarities.py
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, func, insert, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.dao.base import _chunks
+from app.database.base import async_session_maker
+from app.models.reviews import Review
+from app.models.similarities import MovieSimilarity
+
+logger = logging.getLogger(__name__)
+
+
+class ItemSimilarity:
+    """
+    Косинусная близость фильмов по разреженной матрице оценок пользователь × фильм.
+    Столбцы матрицы нормируются один раз, после чего близость блока фильмов ко всем
+    остальным — одно разреженное произведение; в памяти держится только плотный блок
+    block × число фильмов.
+    """
+
+    def __init__(self, user_ids: np.ndarray, movie_ids: np.ndarray, ratings: np.ndarray):
+        self.movie_ids, movie_index = np.unique(movie_ids, return_inverse=True)
+        _, user_index = np.unique(user_ids, return_inverse=True)
+        matrix = sparse.csc_matrix(
+            (ratings.astype(np.float32), (user_index, movie_index)),
+            shape=(int(user_index.max()) + 1 if len(user_index) else 0, len(self.movie_ids)),
+        )
+        # Повторные оценки одного пользователя складываются — на косинус это почти не влияет
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        self._columns = (matrix @ sparse.diags(1.0 / norms).astype(np.float32)).tocsc()
+        self._rows = self._columns.T.tocsr()
+
+    def positions(self, movie_ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Позиции фильмов в матрице; None — все фильмы. Фильмы без оценок пропускаются."""
+        if movie_ids is None:
+            return np.arange(len(self.movie_ids))
+        return np.flatnonzero(np.isin(self.movie_ids, np.asarray(movie_ids)))
+
+    def top_k(self, positions: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Для фильмов в positions возвращает массивы (movie_id, similar_movie_id, score):
+        до k соседей на фильм с положительной близостью, по убыванию близости.
+        """
+        k = min(k, len(self.movie_ids) - 1)
+        if k <= 0 or len(positions) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float32)
+        scores = (self._rows[positions] @ self._columns).toarray()
+        scores[np.arange(len(positions)), positions] = 0.0
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        keep = top_scores > 0
+        sources = np.repeat(self.movie_ids[positions], k).reshape(-1, k)
+        return sources[keep], self.movie_ids[top[keep]], top_scores[keep]
+
+
+async def load_ratings(db: AsyncSession, batch_size: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Читает неудалённые отзывы потоком (серверный курсор), пачками складывая их в массивы numpy,
+    чтобы не держать в памяти миллионы ORM-строк.
+    """
+    stmt = (
+        select(Review.user_id, Review.movie_id, Review.rating)
+        .where(Review.is_deleted.is_not(True))
+        .execution_options(yield_per=batch_size or settings.SIMILAR_MOVIES_STREAM_BATCH)
+    )
+    parts: List[np.ndarray] = []
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        parts.append(np.array(partition, dtype=np.int64).reshape(-1, 3))
+    data = np.concatenate(parts) if parts else np.empty((0, 3), dtype=np.int64)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+async def _changed_movie_ids(db: AsyncSession, since: datetime) -> List[int]:
+    """
+    Фильмы, чьи списки похожих могли измениться из-за отзывов после since:
+    - фильмы с изменёнными отзывами;
+    - фильмы, у которых они сейчас в соседях;
+    - фильмы, оценённые авторами изменённых отзывов: у них появилась (или пропала) общая
+      оценка с изменённым фильмом, и он может впервые попасть в их соседи.
+    Приближение: изменение нормы столбца фильма слегка сдвигает его близость и к фильмам,
+    у которых нет общих оценок с авторами изменений. Такие сдвиги добирает полный пересчёт
+    (запуск без --incremental), его стоит выполнять периодически, например раз в сутки.
+    """
+    changed = select(Review.movie_id).where(Review.updated_at > since).distinct()
+    authors = select(Review.user_id).where(Review.updated_at > since).distinct()
+    co_rated = select(Review.movie_id).where(Review.user_id.in_(authors), Review.is_deleted.is_not(True))
+    neighbours = select(MovieSimilarity.movie_id).where(MovieSimilarity.similar_movie_id.in_(changed))
+    result = await db.execute(union(changed, co_rated, neighbours))
+    return [row[0] for row in result.all()]
+
+
+async def rebuild_movie_similarities(
+    db: AsyncSession,
+    incremental: bool = False,
+    top_k: Optional[int] = None,
+    block_size: Optional[int] = None
+) -> int:
+    """
+    Пересчитывает movie_similarities. При incremental пересчитываются только фильмы,
+    затронутые отзывами после прошлого расчёта (матрица при этом строится целиком,
+    но дорогая часть — произведение блоков — считается только для них).
+    Каждый блок фильмов заменяется отдельной транзакцией. Возвращает число записанных строк.
+    """
+    top_k = top_k or settings.SIMILAR_MOVIES_TOP_K
+    block_size = block_size or settings.SIMILAR_MOVIES_BLOCK_SIZE
+    started_at = datetime.now(timezone.utc)
+    targets: Optional[List[int]] = None
+    if incremental:
+        since = await db.scalar(select(func.max(MovieSimilarity.computed_at)))
+        if since is not None:
+            targets = await _changed_movie_ids(db, since)
+            if not targets:
+                logger.info("Похожие фильмы: изменений нет")
+                return 0
+
+    user_ids, movie_ids, ratings = await load_ratings(db)
+    await db.commit()  # не держим транзакцию открытой на время расчёта
+    similarity = await asyncio.to_thread(ItemSimilarity, user_ids, movie_ids, ratings)
+    positions = similarity.positions(targets)
+
+    written = 0
+    for start in range(0, len(positions), block_size):
+        block = positions[start:start + block_size]
+        sources, neighbours, scores = await asyncio.to_thread(similarity.top_k, block, top_k)
+        rows = [
+            {"movie_id": source, "similar_movie_id": neighbour, "score": score, "computed_at": started_at}
+            for source, neighbour, score in zip(sources.tolist(), neighbours.tolist(), scores.tolist())
+        ]
+        await db.execute(delete(MovieSimilarity).where(MovieSimilarity.movie_id.in_(similarity.movie_ids[block].tolist())))
+        for chunk in _chunks(rows, settings.DB_BULK_BATCH_SIZE):
+            await db.execute(insert(MovieSimilarity), chunk)
+        await db.commit()
+        written += len(rows)
+    # Строки, не перезаписанные этим расчётом, принадлежат фильмам, у которых не осталось оценок
+    stale = delete(MovieSimilarity).where(MovieSimilarity.computed_at < started_at)
+    if targets is not None:
+        stale = stale.where(MovieSimilarity.movie_id.in_(targets))
+    await db.execute(stale)
+    await db.commit()
+    logger.info(f"Похожие фильмы пересчитаны: фильмов {len(positions)}, записей {written}")
+    return written
+
+
+async def main(incremental: bool = False) -> None:
+    async with async_session_maker() as db:
+        await rebuild_movie_similarities(db, incremental=incremental)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчёт похожих фильмов по оценкам пользователей")
+    parser.add_argument("--incremental", action="store_true", help="пересчитать только затронутые фильмы")
+    asyncio.run(main(parser.parse_args().incremental))
@@ -0,0 +1,88 @@
+# File: app/tasks/periodic.py
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.database.base import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class JobMetrics:
+    """
+    Метрики фоновой задачи: число запусков, пропусков (задачу выполняет другой воркер),
+    ошибок и длительность. counters — дополнительные счётчики задачи с начальными значениями.
+    runs_key и finished_at_key позволяют сохранить привычные имена полей в /internal.
+    """
+
+    def __init__(self, runs_key: str = "runs", finished_at_key: str = "last_run_at", **counters: Any):
+        self.runs_key = runs_key
+        self.finished_at_key = finished_at_key
+        self.values: Dict[str, Any] = {
+            runs_key: 0,
+            "skipped": 0,
+            "errors": 0,
+            **counters,
+            "last_duration_ms": None,
+            "max_duration_ms": 0.0,
+            "total_duration_ms": 0.0,
+            finished_at_key: None,
+        }
+
+    def skipped(self) -> None:
+        self.values["skipped"] += 1
+
+    def failed(self) -> None:
+        self.values["errors"] += 1
+
+    def add(self, **deltas: int) -> None:
+        for key, delta in deltas.items():
+            self.values[key] += delta
+
+    def finished(self, started: float, **values: Any) -> float:
+        """Учитывает успешный запуск, начатый в started (time.perf_counter()); возвращает длительность в мс."""
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.values.update(values)
+        self.values[self.runs_key] += 1
+        self.values["last_duration_ms"] = round(duration_ms, 1)
+        self.values["max_duration_ms"] = round(max(self.values["max_duration_ms"], duration_ms), 1)
+        self.values["total_duration_ms"] = round(self.values["total_duration_ms"] + duration_ms, 1)
+        self.values[self.finished_at_key] = datetime.now(timezone.utc).isoformat()
+        return duration_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.values)
+
+
+async def run_once(job: Job) -> None:
+    async with async_session_maker() as db:
+        await job(db)
+
+
+async def run_periodically(job: Job, interval: float, title: str) -> None:
+    """Выполняет job в новой сессии каждые interval секунд; ошибки запуска логируются и не прерывают цикл."""
+    while True:
+        try:
+            await run_once(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка фоновой задачи «{title}»: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_periodic(job: Job, interval: float, title: str) -> Optional[asyncio.Task]:
+    """
+    Запускает run_periodically в фоне процесса приложения.
+    В режиме TEST и при interval <= 0 ничего не запускает.
+    """
+    if settings.MODE == "TEST" or interval <= 0:
+        return None
+    return asyncio.create_task(run_periodically(job, interval, title))
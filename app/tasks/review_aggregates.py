@@ -0,0 +1,101 @@
+# File: app/tasks/review_aggregates.py
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import Integer, cast, func, select, update, or_
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.database.base import async_session_maker
+from app.models.movies import Movie
+from app.models.reviews import Review, REVIEW_RATING_MIN, REVIEW_RATING_MAX
+from app.services.catalog_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _aggregates_statement(id_from: int, id_to: int):
+    """
+    UPDATE агрегатов отзывов для фильмов с id в [id_from, id_to).
+    Строки, где сохранённые значения уже совпадают с пересчитанными, не перезаписываются.
+    """
+    totals = (
+        select(
+            Review.movie_id,
+            # count и sum возвращают bigint; приводим к типам колонок movies, чтобы сравнение массивов работало
+            cast(func.count(), Integer).label("review_count"),
+            cast(func.sum(Review.rating), Integer).label("rating_sum"),
+            cast(array([
+                func.count().filter(Review.rating == rating)
+                for rating in range(REVIEW_RATING_MIN, REVIEW_RATING_MAX + 1)
+            ]), ARRAY(Integer)).label("rating_histogram"),
+        )
+        .where(Review.is_deleted.is_not(True), Review.movie_id >= id_from, Review.movie_id < id_to)
+        .group_by(Review.movie_id)
+        .subquery()
+    )
+    movie = aliased(Movie)
+    empty_histogram = cast(array([0] * (REVIEW_RATING_MAX - REVIEW_RATING_MIN + 1)), ARRAY(Integer))
+    source = (
+        select(
+            movie.id.label("movie_id"),
+            func.coalesce(totals.c.review_count, 0).label("review_count"),
+            func.coalesce(totals.c.rating_sum, 0).label("rating_sum"),
+            func.coalesce(totals.c.rating_histogram, empty_histogram).label("rating_histogram"),
+        )
+        .outerjoin(totals, totals.c.movie_id == movie.id)
+        .where(movie.id >= id_from, movie.id < id_to)
+        .subquery()
+    )
+    return (
+        update(Movie)
+        .where(Movie.id == source.c.movie_id)
+        .where(or_(
+            Movie.review_count.is_distinct_from(source.c.review_count),
+            Movie.rating_sum.is_distinct_from(source.c.rating_sum),
+            Movie.rating_histogram.is_distinct_from(source.c.rating_histogram),
+        ))
+        .values(
+            # Пересчёт агрегатов не считается изменением самого фильма
+            updated_at=Movie.updated_at,
+            review_count=source.c.review_count,
+            rating_sum=source.c.rating_sum,
+            rating_histogram=source.c.rating_histogram,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rebuild_review_aggregates(db: AsyncSession, batch_size: Optional[int] = None) -> int:
+    """
+    Пересчитывает review_count, rating_sum и rating_histogram всех фильмов по таблице reviews.
+    Фильмы обрабатываются диапазонами id, каждый диапазон — отдельной транзакцией,
+    чтобы не держать блокировки на всю таблицу. Возвращает число исправленных фильмов.
+    Если что-то исправлено, в конце один раз сбрасывается кэш каталога; индексы подсказок
+    и каталога в памяти воркеров подхватят значения при ближайшем перечитывании (по ttl).
+    """
+    batch_size = batch_size or settings.DB_BULK_BATCH_SIZE
+    max_id = await db.scalar(select(func.max(Movie.id)))
+    if max_id is None:
+        return 0
+    fixed = 0
+    for id_from in range(0, max_id + 1, batch_size):
+        result = await db.execute(_aggregates_statement(id_from, id_from + batch_size))
+        await db.commit()
+        fixed += result.rowcount
+    if fixed:
+        await catalog_cache.bump_version()
+    logger.info(f"Агрегаты отзывов пересчитаны, исправлено фильмов: {fixed}")
+    return fixed
+
+
+async def main() -> None:
+    async with async_session_maker() as db:
+        await rebuild_review_aggregates(db)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+# File: app/tasks/subscription_expiry.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.subscriptions import Subscription, SubscriptionStatus
+from app.services.subscriptions_service import invalidate_subscription_caches
+from app.tasks.periodic import JobMetrics, run_once, start_periodic
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки: истёкшие подписки одновременно обрабатывает только один воркер
+EXPIRY_LOCK_KEY = 0x6578706972
+
+_metrics = JobMetrics(expired=0, total_expired=0, batches=0)
+
+
+def _expire_batch_stmt(batch_size: int):
+    """
+    UPDATE ... RETURNING для очередной пачки: до batch_size активных подписок с прошедшим
+    end_date (по частичному индексу ix_subscriptions_active_end_date). Строки, заблокированные
+    другими транзакциями (например, продлением подписки), пропускаются до следующего запуска.
+    """
+    expired_ids = (
+        select(Subscription.id)
+        .where(Subscription.status == SubscriptionStatus.ACTIVE, Subscription.end_date < func.now())
+        .order_by(Subscription.end_date)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    return (
+        update(Subscription)
+        .where(Subscription.id.in_(expired_ids))
+        .values(status=SubscriptionStatus.EXPIRED, updated_at=func.now())
+        .returning(Subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def expire_subscriptions(db: AsyncSession, batch_size: Optional[int] = None) -> Optional[int]:
+    """
+    Переводит активные подписки с прошедшим end_date в EXPIRED пачками по batch_size,
+    каждая пачка — одним UPDATE ... RETURNING в отдельной транзакции, чтобы не держать
+    блокировки на всё время обработки. Каждая транзакция берёт advisory-блокировку:
+    если её держит другой воркер, запуск завершается. После каждой пачки сбрасываются
+    закэшированные права и профили пользователей.
+    Возвращает число истёкших подписок или None, если обработку выполняет другой воркер.
+    """
+    batch_size = batch_size or settings.SUBSCRIPTION_EXPIRY_BATCH_SIZE
+    started = time.perf_counter()
+    expired = 0
+    batches = 0
+    try:
+        while True:
+            locked = await db.scalar(select(func.pg_try_advisory_xact_lock(EXPIRY_LOCK_KEY)))
+            if not locked:
+                await db.rollback()
+                if batches == 0:
+                    _metrics.skipped()
+                    return None
+                break
+            result = await db.execute(_expire_batch_stmt(batch_size))
+            user_ids = result.scalars().all()
+            await db.commit()
+            batches += 1
+            expired += len(user_ids)
+            for user_id in set(user_ids):
+                await invalidate_subscription_caches(user_id)
+            if len(user_ids) < batch_size:
+                break
+    except Exception:
+        await db.rollback()
+        _metrics.failed()
+        raise
+    _metrics.add(batches=batches, total_expired=expired)
+    duration_ms = _metrics.finished(started, expired=expired)
+    logger.info(f"Истёкшие подписки обработаны за {duration_ms:.0f} мс: {expired} подписок, пачек {batches}")
+    return expired
+
+
+def subscription_expiry_stats() -> Dict[str, Any]:
+    """Метрики обработки истёкших подписок: число запусков, пропусков, ошибок, подписок и длительность."""
+    return _metrics.snapshot()
+
+
+def start_subscription_expirer() -> Optional[asyncio.Task]:
+    """
+    Запускает периодическую обработку истёкших подписок в фоне процесса приложения.
+    В режиме TEST и при SUBSCRIPTION_EXPIRY_INTERVAL = 0 ничего не запускает.
+    """
+    return start_periodic(expire_subscriptions, settings.SUBSCRIPTION_EXPIRY_INTERVAL, "обработка истёкших подписок")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_once(expire_subscriptions))
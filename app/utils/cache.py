@@ -0,0 +1,175 @@
+# File: app/utils/cache.py
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # Redis — необязательная зависимость, без неё работает только L1
+    aioredis = None
+    RedisError = Exception
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+_redis_disabled_until = 0.0
+
+# Все именованные кэши приложения (объекты с методом snapshot()), для отдачи статистики
+caches: Dict[str, Any] = {}
+
+
+def get_redis():
+    """
+    Возвращает общий асинхронный клиент Redis или None, если Redis отключён,
+    не установлен или недавно был недоступен.
+    """
+    global _redis_client
+    if time.monotonic() < _redis_disabled_until:
+        return None
+    if _redis_client is None and settings.REDIS_CACHE_ENABLED and aioredis is not None:
+        _redis_client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            decode_responses=True,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _redis_client
+
+
+def set_redis(client) -> None:
+    """Подменяет клиент Redis (например, на fakeredis в тестах)."""
+    global _redis_client, _redis_disabled_until
+    _redis_client = client
+    _redis_disabled_until = 0.0
+
+
+def mark_redis_failed(error: Exception) -> None:
+    """Временно отключает обращения к Redis после ошибки соединения."""
+    global _redis_disabled_until
+    _redis_disabled_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
+    logger.warning(f"Redis недоступен, кэш L2 отключён на {settings.REDIS_RETRY_INTERVAL} с: {error}")
+
+
+class TTLCache:
+    """
+    Внутрипроцессный LRU-кэш с ограничением по размеру и временем жизни записей.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TieredCache:
+    """
+    Двухуровневый кэш: L1 — TTLCache в памяти процесса, L2 — Redis (если включён).
+    Значения в L2 хранятся в JSON, поэтому должны быть сериализуемы.
+    L1 живёт не дольше local_ttl, чтобы инвалидация из другого воркера
+    доходила до этого процесса за ограниченное время.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, local_ttl: Optional[float] = None):
+        self.name = name
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, local_ttl if local_ttl is not None else ttl)
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "sets": 0, "invalidations": 0, "l2_errors": 0}
+        caches[name] = self
+
+    def _redis_key(self, key: Hashable) -> str:
+        return f"cache:{self.name}:{key}"
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(self._redis_key(key))
+            except RedisError as e:
+                self.stats["l2_errors"] += 1
+                mark_redis_failed(e)
+                raw = None
+            if raw is not None:
+                entry = json.loads(raw)
+                self.local.set(key, entry["v"], entry["e"] - time.time())
+                self.stats["l2_hits"] += 1
+                return entry["v"]
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self.stats["sets"] += 1
+        self.local.set(key, value, ttl)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                payload = json.dumps({"v": value, "e": time.time() + ttl}, default=str)
+                await redis.set(self._redis_key(key), payload, px=int(ttl * 1000))
+            except RedisError as e:
+                self.stats["l2_errors"] += 1
+                mark_redis_failed(e)
+
+    async def delete(self, key: Hashable) -> None:
+        self.stats["invalidations"] += 1
+        self.local.delete(key)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.delete(self._redis_key(key))
+            except RedisError as e:
+                self.stats["l2_errors"] += 1
+                mark_redis_failed(e)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["l1_hits"] + self.stats["l2_hits"] + self.stats["misses"]
+        hits = self.stats["l1_hits"] + self.stats["l2_hits"]
+        return {
+            **self.stats,
+            "l1_size": len(self.local),
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.snapshot() for name, cache in caches.items()}
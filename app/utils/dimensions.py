@@ -0,0 +1,36 @@
+# File: app/utils/dimensions.py
+from typing import Iterable, List, Optional, Union
+
+
+def dimension_slug(name: str) -> str:
+    """
+    Ключ значения справочника (жанра, страны): без лишних пробелов и регистра.
+    Миграция заполнения справочников считает его так же: lower(btrim(regexp_replace(x, '\\s+', ' ', 'g'))).
+    """
+    return " ".join(name.split()).lower()
+
+
+def split_dimension_values(value: Optional[str]) -> List[str]:
+    """
+    Разбирает строку вида "Comedy, Drama" на отдельные значения без пустых и повторов.
+    """
+    if not value:
+        return []
+    names, seen = [], set()
+    for part in value.split(","):
+        name = " ".join(part.split())
+        slug = name.lower()
+        if name and slug not in seen:
+            seen.add(slug)
+            names.append(name)
+    return names
+
+
+def dimension_filter(value: Union[str, Iterable[str], None]) -> List[str]:
+    """
+    Приводит фильтр (строку через запятую или список строк) к отсортированному списку ключей.
+    """
+    if not value:
+        return []
+    values = [value] if isinstance(value, str) else value
+    return sorted({dimension_slug(name) for item in values for name in split_dimension_values(item)})
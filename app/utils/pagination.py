@@ -0,0 +1,74 @@
+# File: app/utils/pagination.py
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.sql import ColumnElement
+
+from app.exceptions.custom_exceptions import InvalidInputException
+
+
+def encode_cursor(sort_by: str, order: str, value: Any, last_id: int) -> str:
+    """
+    Кодирует позицию последней записи страницы в непрозрачный курсор.
+    """
+    payload: Dict[str, Any] = {"s": sort_by, "o": order, "id": last_id, "v": value}
+    if isinstance(value, datetime):
+        payload["v"] = value.isoformat()
+        payload["t"] = "dt"
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> Dict[str, Any]:
+    """
+    Разбирает курсор и проверяет, что он выдан для той же сортировки.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload.get("t") == "dt" and payload["v"] is not None:
+            payload["v"] = datetime.fromisoformat(payload["v"])
+        last_id = int(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidInputException("Некорректный курсор пагинации")
+    if payload.get("s") != sort_by or payload.get("o") != order:
+        raise InvalidInputException("Курсор выдан для другой сортировки")
+    return {"value": payload.get("v"), "id": last_id}
+
+
+def keyset_order_by(column, id_column, descending: bool) -> list:
+    """
+    Порядок, совместимый с keyset_condition. NULL-значения идут в конце при
+    возрастании и в начале при убывании — как по умолчанию в Postgres, поэтому
+    обычный индекс (column, id) обслуживает обе сортировки.
+    """
+    if descending:
+        return [column.desc().nulls_first(), id_column.desc()]
+    return [column.asc().nulls_last(), id_column.asc()]
+
+
+def keyset_condition(column, id_column, last_value: Any, last_id: int, descending: bool) -> ColumnElement:
+    """
+    Условие «строки после (last_value, last_id)» для сортировки keyset_order_by.
+    """
+    if descending:
+        if last_value is None:
+            return or_(and_(column.is_(None), id_column < last_id), column.is_not(None))
+        return tuple_(column, id_column) < tuple_(last_value, last_id)
+    if last_value is None:
+        return and_(column.is_(None), id_column > last_id)
+    return or_(tuple_(column, id_column) > tuple_(last_value, last_id), column.is_(None))
+
+
+def next_cursor_for(items: list, limit: int, sort_by: str, order: str, value_of) -> Optional[str]:
+    """
+    Возвращает курсор следующей страницы или None, если страница неполная.
+    """
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(sort_by, order, value_of(last), last.id)
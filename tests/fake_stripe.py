@@ -0,0 +1,58 @@
+# tests/fake_stripe.py
+
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class FakeStripe:
+    """
+    Stripe API в памяти процесса для тестов без сети: POST /v1/checkout/sessions с задержкой
+    latency, ответами-ошибками из failures (по одному на запрос, пока список не кончится)
+    и идемпотентностью по заголовку Idempotency-Key. Подключается к клиенту через transport().
+    """
+
+    def __init__(self, latency: float = 0.0, failures: Sequence[int] = ()):
+        self.latency = latency
+        self.failures: List[int] = list(failures)
+        self.requests: List[Dict[str, Any]] = []
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.app = FastAPI()
+        self.app.post("/v1/checkout/sessions")(self._create_checkout_session)
+
+    def transport(self) -> httpx.ASGITransport:
+        return httpx.ASGITransport(app=self.app)
+
+    async def _create_checkout_session(self, request: Request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            form = dict(await request.form())
+            key: Optional[str] = request.headers.get("Idempotency-Key")
+            self.requests.append({"form": form, "idempotency_key": key})
+            if not request.headers.get("Authorization", "").startswith("Bearer "):
+                return JSONResponse({"error": {"message": "No API key provided"}}, status_code=401)
+            if self.failures:
+                status_code = self.failures.pop(0)
+                return JSONResponse({"error": {"message": f"Fake failure {status_code}"}}, status_code=status_code)
+            if key in self.sessions:
+                return self.sessions[key]
+            session_id = f"cs_test_{len(self.sessions) + 1}"
+            session = {
+                "id": session_id,
+                "object": "checkout.session",
+                "url": f"https://checkout.stripe.test/pay/{session_id}",
+                "metadata": {
+                    name[len("metadata["):-1]: value for name, value in form.items() if name.startswith("metadata[")
+                },
+            }
+            self.sessions[key or session_id] = session
+            return session
+        finally:
+            self.in_flight -= 1
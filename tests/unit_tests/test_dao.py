@@ -67,3 +67,23 @@ async def test_payment_dao_create_get(db_session: AsyncSession):
     assert payment.id is not None
     fetched = await pay_dao.get_by_id(db_session, payment.id)
     assert fetched.amount == 49.99
+
+@pytest.mark.asyncio
+async def test_movie_dao_bulk_create_update_upsert(db_session: AsyncSession):
+    movie_dao = MovieDAO()
+    rows = [{"title": f"Bulk Movie {i}", "duration": 90 + i, "rating": 5.0} for i in range(25)]
+    movies = await movie_dao.bulk_create(db_session, rows, batch_size=10)
+    assert len(movies) == 25
+    assert all(movie.id is not None for movie in movies)
+
+    await movie_dao.bulk_update(db_session, [{"id": movie.id, "rating": 9.0} for movie in movies[:5]])
+    fetched = await movie_dao.get_by_id(db_session, movies[0].id)
+    assert fetched.rating == 9.0
+
+    upserted = await movie_dao.upsert(
+        db_session,
+        [{"id": movies[1].id, "title": "Bulk Movie Renamed"}],
+        index_elements=["id"]
+    )
+    assert upserted[0].id == movies[1].id
+    assert upserted[0].title == "Bulk Movie Renamed"
@@ -1,23 +1,28 @@
 # tests/test_services.py
 
 import pytest
+from sqlalchemy import event, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.users_service import UserService
 from app.services.movies_service import MovieService
 from app.services.subscriptions_service import SubscriptionService
 from app.services.payments_dao import PaymentService
+from app.services.reviews_service import ReviewService
 
 from app.schemas.users import UserCreate, UserUpdate
 from app.schemas.movies import MovieCreate, MovieUpdate
 from app.schemas.subscriptions import SubscriptionCreate, SubscriptionUpdate
 from app.schemas.payments import PaymentCreate, PaymentUpdate
+from app.schemas.reviews import ReviewCreate, ReviewUpdate
+from app.models.subscriptions import SubscriptionStatus as SubStatus
 
 from app.exceptions.custom_exceptions import (
     UserAlreadyExistsException,
     UserNotFoundException,
     MovieNotFoundException,
     SubscriptionNotFoundException,
+    SubscriptionConflictException,
     PaymentNotFoundException,
 )
 
@@ -69,6 +74,351 @@ async def test_movie_service_create_update_get(db_session: AsyncSession):
     assert fetched.id == movie.id
 
 
+@pytest.mark.asyncio
+async def test_movie_service_cursor_pagination_matches_offset(db_session: AsyncSession):
+    movie_service = MovieService()
+    for i in range(7):
+        await movie_service.create_movie(
+            db_session, MovieCreate(title=f"Cursor Movie {i}", duration=90, rating=float(i % 3), genre="CursorGenre")
+        )
+    expected = await movie_service.list_movies(db_session, genre="CursorGenre", sort_by="rating", order="desc", limit=100)
+    collected, cursor = [], None
+    while True:
+        page, cursor = await movie_service.list_movies_page(
+            db_session, genre="CursorGenre", sort_by="rating", order="desc", limit=3, cursor=cursor
+        )
+        collected.extend(page)
+        if not cursor:
+            break
+    assert [m.id for m in collected] == [m.id for m in expected]
+
+
+@pytest.mark.asyncio
+async def test_movie_service_filters_by_several_genres_and_countries(db_session: AsyncSession):
+    movie_service = MovieService()
+    both = await movie_service.create_movie(
+        db_session, MovieCreate(title="Dim Both", duration=90, genres=["DimSciFi", "DimDrama"], country="DimLand")
+    )
+    drama = await movie_service.create_movie(
+        db_session, MovieCreate(title="Dim Drama", duration=90, genre="DimDrama", country="Other DimLand")
+    )
+    assert both.genre == "DimSciFi, DimDrama"
+    found = await movie_service.list_movies(db_session, genre=["dimscifi", "DimDrama"], sort_by="title", order="asc")
+    assert [m.id for m in found] == [both.id, drama.id]
+    # Страна сравнивается точно, а не подстрокой
+    found = await movie_service.list_movies(db_session, genre="DimDrama", country="dimland")
+    assert [m.id for m in found] == [both.id]
+    await movie_service.update_movie(db_session, drama.id, MovieUpdate(genres=["DimSciFi"]))
+    found = await movie_service.list_movies(db_session, genre="DimDrama")
+    assert [m.id for m in found] == [both.id]
+
+
+@pytest.mark.asyncio
+async def test_movie_service_facet_counts_match_filters(db_session: AsyncSession):
+    from datetime import datetime, timezone
+    movie_service = MovieService()
+    for title, genres, rating, year in [
+        ("Facet A", ["FacetNoir", "FacetDrama"], 7.5, 1994),
+        ("Facet B", ["FacetNoir"], 7.1, 1998),
+        ("Facet C", ["FacetDrama"], 4.0, 2003),
+    ]:
+        await movie_service.create_movie(db_session, MovieCreate(
+            title=title, duration=90, genres=genres, rating=rating, country="FacetLand", type="movie",
+            release_date=datetime(year, 5, 1, tzinfo=timezone.utc)
+        ))
+    facets = await movie_service.facet_counts(db_session, genre=["facetnoir", "facetdrama"])
+    assert facets["total"] == 3
+    assert facets["genre"] == [
+        {"value": "facetdrama", "label": "FacetDrama", "count": 2},
+        {"value": "facetnoir", "label": "FacetNoir", "count": 2},
+    ]
+    # Фильм с двумя жанрами в остальных фасетах считается один раз
+    assert facets["country"] == [{"value": "facetland", "label": "FacetLand", "count": 3}]
+    assert facets["decade"] == [
+        {"value": 1990, "label": "1990", "count": 2},
+        {"value": 2000, "label": "2000", "count": 1},
+    ]
+    assert [(b["value"], b["count"]) for b in facets["rating"]] == [(4, 1), (7, 2)]
+    listed = await movie_service.list_movies(db_session, genre="facetnoir", rating_min=7.2)
+    facets = await movie_service.facet_counts(db_session, genre="facetnoir", rating_min=7.2)
+    assert facets["total"] == len(listed) == 1
+
+
+@pytest.mark.asyncio
+async def test_movie_service_catalog_index_matches_sql(db_session: AsyncSession, monkeypatch):
+    pytest.importorskip("numpy")
+    from app.core.config import settings
+    from app.services.catalog_index import catalog_index
+    movie_service = MovieService()
+    for i in range(6):
+        await movie_service.create_movie(
+            db_session, MovieCreate(title=f"Index Movie {5 - i}", duration=90, rating=float(i % 3), genre="IndexGenre")
+        )
+    queries = [
+        dict(genre="indexgenre", sort_by="rating", order="desc"),
+        dict(genre="IndexGenre", sort_by="title", order="asc", skip=2, limit=3),
+        dict(genre="IndexGenre", rating_min=1.0),
+    ]
+    expected = [await movie_service.list_movies(db_session, **q) for q in queries]
+    monkeypatch.setattr(settings, "CATALOG_INDEX_ENABLED", True)
+    catalog_index.loaded_at = None
+    for q, sql_movies in zip(queries, expected):
+        indexed = await movie_service.list_movies(db_session, **q)
+        assert [m.id for m in indexed] == [m.id for m in sql_movies]
+    assert catalog_index.snapshot()["queries"] >= len(queries)
+
+
+@pytest.mark.asyncio
+async def test_movie_service_full_text_search_ranks_title_matches(db_session: AsyncSession):
+    movie_service = MovieService()
+    in_title = await movie_service.create_movie(
+        db_session, MovieCreate(title="Nebula Drift", description="Space opera", duration=100, genre="FtsGenre")
+    )
+    in_description = await movie_service.create_movie(
+        db_session, MovieCreate(title="Quiet Harbor", description="A nebula over the sea", duration=100, genre="FtsGenre")
+    )
+    await movie_service.create_movie(
+        db_session, MovieCreate(title="Unrelated", description="Nothing here", duration=100, genre="FtsGenre")
+    )
+    found = await movie_service.list_movies(db_session, genre="FtsGenre", search="nebula")
+    # Совпадение в названии весит больше, чем в описании
+    assert [m.id for m in found] == [in_title.id, in_description.id]
+
+
+@pytest.mark.asyncio
+async def test_movie_service_relevance_search_pages_by_cursor(db_session: AsyncSession):
+    movie_service = MovieService()
+    for i in range(5):
+        await movie_service.create_movie(
+            db_session,
+            MovieCreate(title=f"Quasar {i}", description="quasar " * i, duration=100, genre="CursorFtsGenre"),
+        )
+    expected, _ = await movie_service.list_movies_page(db_session, genre="CursorFtsGenre", search="quasar", limit=10)
+    paged, cursor = [], None
+    while True:
+        movies, cursor = await movie_service.list_movies_page(
+            db_session, genre="CursorFtsGenre", search="quasar", limit=2, cursor=cursor
+        )
+        paged += movies
+        if cursor is None:
+            break
+    assert [m.id for m in paged] == [m.id for m in expected]
+    assert len(paged) == 5
+
+
+@pytest.mark.asyncio
+async def test_catalog_cache_coalesces_misses_and_invalidates_by_version():
+    import asyncio
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.utils.cache import set_redis
+    from app.services.catalog_cache import CatalogCache
+
+    set_redis(fakeredis.FakeAsyncRedis(decode_responses=True))
+    try:
+        cache = CatalogCache("test_catalog")
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"body": f"[{calls}]"}
+
+        params = {"genre": "Drama", "limit": 10}
+        results = await asyncio.gather(*(cache.get_or_compute("list", params, compute) for _ in range(20)))
+        # Двадцать одновременных промахов — одно обращение к базе
+        assert calls == 1
+        assert all(r["body"] == "[1]" for r in results)
+        # Порядок и регистр параметров не влияют на ключ
+        assert (await cache.get_or_compute("list", {"limit": 10, "genre": "drama "}, compute))["body"] == "[1]"
+
+        await cache.bump_version()
+        assert (await cache.get_or_compute("list", params, compute))["body"] == "[2]"
+    finally:
+        set_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_movie_similarities_job_feeds_similar_movies(db_session: AsyncSession):
+    pytest.importorskip("scipy")
+    from app.tasks.movie_similarities import rebuild_movie_similarities
+    movie_service = MovieService()
+    review_service = ReviewService()
+    movies = [
+        await movie_service.create_movie(db_session, MovieCreate(title=f"Similar {i}", duration=100))
+        for i in range(3)
+    ]
+    users = []
+    for i in range(2):
+        user = await UserService().register_user(
+            db_session, UserCreate(email=f"similar{i}@example.com", username=f"similar{i}", password="secret123")
+        )
+        users.append(user)
+        # Оба пользователя оценили первые два фильма, третий — только второй пользователь
+        for movie in movies[:2] + movies[2:] * i:
+            await review_service.create_review(db_session, ReviewCreate(movie_id=movie.id, user_id=user.id, rating=8))
+    assert await rebuild_movie_similarities(db_session) > 0
+    similar = await movie_service.get_similar_movies(db_session, movies[0].id)
+    assert [m.id for m in similar][:2] == [movies[1].id, movies[2].id]
+    # Без новых отзывов инкрементальный пересчёт ничего не делает
+    assert await rebuild_movie_similarities(db_session, incremental=True) == 0
+    # Новый фильм, оценённый первым пользователем, впервые попадает в соседи его фильмов
+    fresh = await movie_service.create_movie(db_session, MovieCreate(title="Similar Fresh", duration=100))
+    await review_service.create_review(db_session, ReviewCreate(movie_id=fresh.id, user_id=users[0].id, rating=8))
+    assert await rebuild_movie_similarities(db_session, incremental=True) > 0
+    similar = await movie_service.get_similar_movies(db_session, movies[0].id)
+    assert fresh.id in [m.id for m in similar]
+
+
+@pytest.mark.asyncio
+async def test_refresh_charts_materializes_trending_and_genre_top(db_session: AsyncSession, monkeypatch):
+    from app.core.config import settings
+    from app.tasks.charts import chart_refresh_stats, refresh_charts
+    monkeypatch.setattr(settings, "CHARTS_MIN_REVIEWS", 1)
+    movie_service = MovieService()
+    user = await UserService().register_user(
+        db_session, UserCreate(email="charts_reviewer@example.com", username="chartsReviewer", password="secret123")
+    )
+    hit = await movie_service.create_movie(db_session, MovieCreate(title="Chart Hit", duration=100, genres=["Chartcore"]))
+    flop = await movie_service.create_movie(db_session, MovieCreate(title="Chart Flop", duration=100, genres=["Chartcore"]))
+    await ReviewService().create_review(db_session, ReviewCreate(movie_id=hit.id, user_id=user.id, rating=10))
+    await ReviewService().create_review(db_session, ReviewCreate(movie_id=flop.id, user_id=user.id, rating=2))
+
+    refreshes = chart_refresh_stats()["refreshes"]
+    assert await refresh_charts(db_session) > 0
+    assert chart_refresh_stats()["refreshes"] == refreshes + 1
+    charts = await movie_service.get_charts(db_session, ["Chartcore", "No Such Genre"])
+    assert [m.id for m in charts["Chartcore"]] == [hit.id, flop.id]
+    assert charts["No Such Genre"] == []
+    trending_ids = [m.id for m in charts["trending"]]
+    assert trending_ids.index(hit.id) < trending_ids.index(flop.id)
+    # Свежие подборки другой воркер не пересобирает
+    skipped = chart_refresh_stats()["skipped"]
+    assert await refresh_charts(db_session, fresh_for=300) is None
+    assert chart_refresh_stats()["skipped"] == skipped + 1
+
+
+@pytest.mark.asyncio
+async def test_movie_suggest_falls_back_to_case_insensitive_prefix(db_session: AsyncSession, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "SUGGEST_INDEX_ENABLED", False)
+    movie_service = MovieService()
+    prefixed = await movie_service.create_movie(db_session, MovieCreate(title="Zephyr_Fallback Run", duration=90))
+    await movie_service.create_movie(db_session, MovieCreate(title="ZephyrXFallback", duration=90))
+    suggestions = await movie_service.suggest_titles(db_session, "zephyr_fall")
+    # "_" экранирован и совпадает только сам с собой
+    assert suggestions == [(prefixed.id, "Zephyr_Fallback Run")]
+
+
+@pytest.mark.asyncio
+async def test_movie_fields_limit_selected_columns(db_session: AsyncSession):
+    from sqlalchemy import inspect
+    movie_service = MovieService()
+    created = await movie_service.create_movie(
+        db_session, MovieCreate(title="Sparse Movie", description="Long text " * 100, duration=100)
+    )
+    db_session.expunge_all()
+    movies, _ = await movie_service.list_movies_page(
+        db_session, search="Sparse Movie", sort_by="rating", fields=["title"]
+    )
+    assert [m.id for m in movies] == [created.id]
+    unloaded = inspect(movies[0]).unloaded
+    assert "description" in unloaded and "title" not in unloaded and "rating" not in unloaded
+    db_session.expunge_all()
+    movie = await movie_service.get_movie(db_session, created.id, ["id", "duration_formatted"])
+    assert "duration" not in inspect(movie).unloaded and "description" in inspect(movie).unloaded
+
+
+# Тесты для ReviewService
+
+@pytest.mark.asyncio
+async def test_review_service_maintains_movie_aggregates(db_session: AsyncSession):
+    from app.models.movies import Movie
+    from app.tasks.review_aggregates import rebuild_review_aggregates
+    user = await UserService().register_user(
+        db_session, UserCreate(email="reviewer@example.com", username="reviewer", password="secret123")
+    )
+    movie = await MovieService().create_movie(db_session, MovieCreate(title="Reviewed Movie", duration=100))
+    from app.services.catalog_cache import catalog_cache
+    review_service = ReviewService()
+    bumps = catalog_cache.stats["version_bumps"]
+    first = await review_service.create_review(db_session, ReviewCreate(movie_id=movie.id, user_id=user.id, rating=8))
+    second = await review_service.create_review(db_session, ReviewCreate(movie_id=movie.id, user_id=user.id, rating=4))
+    await review_service.update_review(db_session, second.id, ReviewUpdate(rating=6))
+    await review_service.delete_review(db_session, first.id)
+    await review_service.delete_review(db_session, first.id)  # повторное удаление ничего не меняет
+    # Отзывы не сбрасывают кэш каталога целиком: агрегаты в ответах устаревают не дольше CATALOG_CACHE_TTL
+    assert catalog_cache.stats["version_bumps"] == bumps
+
+    async def aggregates():
+        row = (await db_session.execute(
+            select(Movie.review_count, Movie.rating_sum, Movie.rating_histogram, Movie.audience_score)
+            .where(Movie.id == movie.id)
+        )).one()
+        return tuple(row)
+
+    histogram = [0] * 10
+    histogram[5] = 1
+    assert await aggregates() == (1, 6, histogram, 6.0)
+
+    # Ремонтная задача восстанавливает испорченные агрегаты
+    await db_session.execute(update(Movie).where(Movie.id == movie.id).values(review_count=5, rating_sum=0))
+    await db_session.commit()
+    assert await rebuild_review_aggregates(db_session, batch_size=2) >= 1
+    assert await aggregates() == (1, 6, histogram, 6.0)
+    # ...и один раз сбрасывает кэш каталога; повторный запуск без исправлений его не трогает
+    assert catalog_cache.stats["version_bumps"] == bumps + 1
+    assert await rebuild_review_aggregates(db_session, batch_size=2) == 0
+    assert catalog_cache.stats["version_bumps"] == bumps + 1
+
+
+@pytest.mark.asyncio
+async def test_review_service_pages_newest_first(db_session: AsyncSession, monkeypatch):
+    from app.core.config import settings
+    user = await UserService().register_user(
+        db_session, UserCreate(email="feed_reviewer@example.com", username="feedReviewer", password="secret123")
+    )
+    movie = await MovieService().create_movie(db_session, MovieCreate(title="Feed Movie", duration=100))
+    review_service = ReviewService()
+    created = [
+        await review_service.create_review(db_session, ReviewCreate(movie_id=movie.id, user_id=user.id, rating=5))
+        for _ in range(5)
+    ]
+    await review_service.delete_review(db_session, created[2].id)
+    collected, cursor = [], None
+    while True:
+        page, cursor = await review_service.list_reviews_page(db_session, movie.id, limit=2, cursor=cursor)
+        assert len(page) <= 2
+        collected.extend(page)
+        if not cursor:
+            break
+    assert [r.id for r in collected] == [r.id for r in reversed(created) if r.id != created[2].id]
+    # Размер страницы ограничен сверху
+    monkeypatch.setattr(settings, "REVIEWS_MAX_PAGE_SIZE", 3)
+    page, _ = await review_service.list_reviews_page(db_session, movie.id, limit=1000)
+    assert len(page) == 3
+
+
+@pytest.mark.asyncio
+async def test_review_page_loads_authors_in_one_query(db_session: AsyncSession):
+    from sqlalchemy.exc import InvalidRequestError
+    user = await UserService().register_user(
+        db_session, UserCreate(email="author_reviewer@example.com", username="authorReviewer", password="secret123")
+    )
+    movie = await MovieService().create_movie(db_session, MovieCreate(title="Authored Movie", duration=100))
+    review_service = ReviewService()
+    await review_service.create_review(db_session, ReviewCreate(movie_id=movie.id, user_id=user.id, rating=7))
+    db_session.expunge_all()
+    page, _ = await review_service.list_reviews_page(db_session, movie.id, with_movie=True)
+    assert [(r.author_username, r.movie_title) for r in page] == [("authorReviewer", "Authored Movie")]
+    # Без явной загрузки связи не подгружаются лениво
+    db_session.expunge_all()
+    review = await review_service.get_review(db_session, page[0].id)
+    assert review.author_username is None
+    with pytest.raises(InvalidRequestError):
+        review.user
+
+
 # Тесты для SubscriptionService
 
 @pytest.mark.asyncio
@@ -89,6 +439,173 @@ async def test_subscription_service_create_update_get(db_session: AsyncSession):
     assert fetched.id == subscription.id
 
 
+@pytest.mark.asyncio
+async def test_subscription_service_update_rejects_second_open_subscription(db_session: AsyncSession):
+    user = await UserService().register_user(
+        db_session, UserCreate(email="sub_reopen@example.com", username="subReopen", password="secret123")
+    )
+    sub_service = SubscriptionService()
+    first = await sub_service.create_subscription(db_session, SubscriptionCreate(user_id=user.id, plan="Basic"))
+    await sub_service.update_subscription(db_session, first.id, {"status": SubStatus.CANCELLED})
+    second = await sub_service.create_subscription(db_session, SubscriptionCreate(user_id=user.id, plan="Premium"))
+    with pytest.raises(SubscriptionConflictException):
+        await sub_service.update_subscription(db_session, first.id, {"status": SubStatus.ACTIVE})
+    # Сессия после отката пригодна для работы, вторая подписка не тронута
+    assert (await sub_service.get_open_subscription(db_session, user.id)).id == second.id
+
+
+@pytest.mark.asyncio
+async def test_subscription_service_active_lookup_beyond_first_page(db_session: AsyncSession):
+    # Активная подписка должна находиться даже если в таблице больше 100 чужих подписок
+    user_service = UserService()
+    other = await user_service.register_user(
+        db_session, UserCreate(email="sub_other@example.com", username="subOther", password="secret123")
+    )
+    user = await user_service.register_user(
+        db_session, UserCreate(email="sub_active@example.com", username="subActive", password="secret123")
+    )
+    sub_service = SubscriptionService()
+    for _ in range(120):
+        await sub_service.create_subscription(db_session, {"user_id": other.id, "plan": "Basic", "status": SubStatus.EXPIRED})
+    await sub_service.create_subscription(db_session, {"user_id": user.id, "plan": "Premium", "status": SubStatus.ACTIVE})
+
+    active = await sub_service.get_active_subscription(db_session, user.id)
+    assert active is not None
+    assert active.user_id == user.id
+    assert active.plan == "Premium"
+    by_plan = await sub_service.get_subscription_by_plan(db_session, user.id, "premium")
+    assert by_plan.id == active.id
+    assert await sub_service.get_active_subscription(db_session, other.id) is None
+
+
+@pytest.mark.asyncio
+async def test_expire_subscriptions_in_batches(db_session: AsyncSession):
+    from datetime import datetime, timedelta, timezone
+    from app.tasks.subscription_expiry import expire_subscriptions, subscription_expiry_stats
+
+    # У пользователя может быть только одна открытая подписка, поэтому у каждой — свой пользователь
+    users = [
+        await UserService().register_user(
+            db_session, UserCreate(email=f"expiry_user{i}@example.com", username=f"expiryUser{i}", password="secret123")
+        )
+        for i in range(5)
+    ]
+    sub_service = SubscriptionService()
+    now = datetime.now(timezone.utc)
+    past = [
+        await sub_service.create_subscription(
+            db_session, {"user_id": users[i].id, "plan": "Basic", "status": SubStatus.ACTIVE, "end_date": now - timedelta(days=i + 1)}
+        )
+        for i in range(3)
+    ]
+    current = await sub_service.create_subscription(
+        db_session, {"user_id": users[3].id, "plan": "Premium", "status": SubStatus.ACTIVE, "end_date": now + timedelta(days=1)}
+    )
+    pending = await sub_service.create_subscription(
+        db_session, {"user_id": users[4].id, "plan": "Basic", "status": SubStatus.PENDING, "end_date": now - timedelta(days=1)}
+    )
+
+    batches = subscription_expiry_stats()["batches"]
+    assert await expire_subscriptions(db_session, batch_size=2) == 3
+    assert subscription_expiry_stats()["batches"] == batches + 2
+    db_session.expire_all()  # UPDATE задачи не синхронизирует объекты сессии
+    for sub in past:
+        assert (await sub_service.get_subscription(db_session, sub.id)).status == SubStatus.EXPIRED
+    assert (await sub_service.get_subscription(db_session, current.id)).status == SubStatus.ACTIVE
+    assert (await sub_service.get_subscription(db_session, pending.id)).status == SubStatus.PENDING
+    assert await expire_subscriptions(db_session) == 0
+
+
+@pytest.mark.asyncio
+async def test_entitlements_follow_plan_hierarchy_and_invalidation(db_session: AsyncSession):
+    from app.services.entitlements_service import EntitlementService
+
+    user = await UserService().register_user(
+        db_session, UserCreate(email="entitled@example.com", username="entitledUser", password="secret123")
+    )
+    movie = await MovieService().create_movie(
+        db_session, MovieCreate(title="Standard Movie", duration=90, rating=7.0, required_subscription="Standard")
+    )
+    sub_service = SubscriptionService()
+    entitlements = EntitlementService()
+    assert not await entitlements.can_watch(db_session, user.id, movie.id)
+
+    subscription = await sub_service.create_subscription(
+        db_session, {"user_id": user.id, "plan": "Basic", "status": SubStatus.ACTIVE}
+    )
+    assert not await entitlements.can_watch(db_session, user.id, movie.id)
+    # Смена тарифа сбрасывает закэшированное решение, Premium включает Standard
+    await sub_service.update_subscription(db_session, subscription.id, {"plan": "Premium"})
+    assert await entitlements.can_watch(db_session, user.id, movie.id)
+    await MovieService().update_movie(db_session, movie.id, MovieUpdate(required_subscription="Exclusive"))
+    assert not await entitlements.can_watch(db_session, user.id, movie.id)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_purchases_create_one_subscription(db_session: AsyncSession):
+    import asyncio
+    import time
+    from sqlalchemy import func
+    from app.database.base import async_session_maker
+    from app.models.subscriptions import Subscription
+
+    user = await UserService().register_user(
+        db_session, UserCreate(email="race_buyer@example.com", username="raceBuyer", password="secret123")
+    )
+    sub_service = SubscriptionService()
+    # Сотни покупок одного пользователя, не больше 50 соединений одновременно
+    connections = asyncio.Semaphore(50)
+    latencies = []
+
+    async def purchase(plan: str):
+        async with connections, async_session_maker() as session:
+            started = time.perf_counter()
+            try:
+                return await sub_service.purchase_subscription(
+                    session, {"user_id": user.id, "plan": plan, "status": SubStatus.PENDING}
+                )
+            except SubscriptionConflictException:
+                return None
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    results = await asyncio.gather(*(purchase("Premium" if i % 2 else "Basic") for i in range(300)))
+    assert len([sub for sub in results if sub is not None]) == 1
+    count = await db_session.scalar(select(func.count()).select_from(Subscription).where(Subscription.user_id == user.id))
+    assert count == 1
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    assert p99 < 2.0, f"p50={latencies[len(latencies) // 2]:.4f}s p99={p99:.4f}s"
+
+
+@pytest.mark.asyncio
+async def test_repeated_purchases_on_one_connection(db_session: AsyncSession):
+    # После пяти выполнений на одном соединении asyncpg-выражение может перейти на generic-план;
+    # ON CONFLICT должен по-прежнему находить частичный индекс
+    from app.database.base import engine
+
+    users = [
+        await UserService().register_user(
+            db_session, UserCreate(email=f"repeat_buyer{i}@example.com", username=f"repeatBuyer{i}", password="secret123")
+        )
+        for i in range(4)
+    ]
+    sub_service = SubscriptionService()
+    async with engine.connect() as connection:
+        session = AsyncSession(bind=connection, expire_on_commit=False)
+        created, conflicts = 0, 0
+        for attempt in range(12):
+            try:
+                await sub_service.purchase_subscription(
+                    session, {"user_id": users[attempt % 4].id, "plan": "Basic", "status": SubStatus.PENDING}
+                )
+                created += 1
+            except SubscriptionConflictException:
+                conflicts += 1
+        await session.close()
+    assert (created, conflicts) == (4, 8)
+
+
 # Тесты для PaymentService
 
 @pytest.mark.asyncio
@@ -107,3 +624,109 @@ async def test_payment_service_create_update_get(db_session: AsyncSession):
     assert updated.transaction_id == "tx456"
     fetched = await pay_service.get_payment(db_session, payment.id)
     assert fetched.id == payment.id
+
+
+@pytest.mark.asyncio
+async def test_payment_service_initiates_checkout_through_gateway(db_session: AsyncSession):
+    from app.services.payment_gateway import StripeGateway
+    from tests.fake_stripe import FakeStripe
+
+    user = await UserService().register_user(
+        db_session, UserCreate(email="checkout_user@example.com", username="checkoutUser", password="secret123")
+    )
+    fake = FakeStripe()
+    gateway = StripeGateway(api_key="sk_test", base_url="http://stripe.test", transport=fake.transport())
+    result = await PaymentService(gateway=gateway).initiate_payment(
+        db_session, PaymentCreate(user_id=user.id, amount=9.99, payment_method="card")
+    )
+    await gateway.aclose()
+    assert result["checkout_url"].startswith("https://checkout.stripe.test/")
+    request = fake.requests[0]
+    assert request["idempotency_key"] == f"checkout-{result['payment_id']}"
+    assert request["form"]["line_items[0][price_data][unit_amount]"] == "999"
+    assert request["form"]["metadata[order_id]"] == str(result["payment_id"])
+
+# Единица работы: количество SQL-выражений на типовых путях
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement.split()[0].upper())
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+@pytest.mark.asyncio
+async def test_webhook_updates_run_in_one_unit_of_work(db_session: AsyncSession):
+    from app.database.base import engine
+    from app.database.unit_of_work import unit_of_work
+    from app.models.payments import PaymentStatus as ModelPaymentStatus
+    from app.schemas.subscriptions import SubscriptionStatus
+
+    user = await UserService().register_user(
+        db_session, UserCreate(email="uow_user@example.com", username="uowUser", password="secret123")
+    )
+    sub_service = SubscriptionService()
+    pay_service = PaymentService()
+    subscription = await sub_service.create_subscription(db_session, {"user_id": user.id, "plan": "Premium"})
+    payment = await pay_service.create_payment(
+        db_session, PaymentCreate(user_id=user.id, subscription_id=subscription.id, amount=10.0)
+    )
+
+    with StatementCounter(engine) as counter:
+        async with unit_of_work(db_session):
+            await pay_service.update_payment(db_session, payment.id, {"status": ModelPaymentStatus.COMPLETED})
+            updated = await sub_service.update_subscription(
+                db_session, subscription.id, {"status": SubscriptionStatus.active}
+            )
+    assert counter.statements == ["UPDATE", "UPDATE"]
+    assert updated.status.value == "active"
+
+
+@pytest.mark.asyncio
+async def test_user_registration_statement_count(db_session: AsyncSession):
+    from app.database.base import engine
+
+    with StatementCounter(engine) as counter:
+        await UserService().register_user(
+            db_session, UserCreate(email="count_user@example.com", username="countUser", password="secret123")
+        )
+    # Проверка email и INSERT ... RETURNING, без SELECT для refresh
+    assert counter.statements == ["SELECT", "INSERT"]
+
+
+@pytest.mark.asyncio
+async def test_profile_snapshot_is_one_query_and_invalidated_by_subscriptions(db_session: AsyncSession):
+    from datetime import datetime, timedelta, timezone
+    from app.database.base import engine
+
+    user_service = UserService()
+    user = await user_service.register_user(
+        db_session, UserCreate(email="profile_user@example.com", username="profileUser", password="secret123")
+    )
+    with StatementCounter(engine) as counter:
+        snapshot = await user_service.get_profile_snapshot(db_session, user.id)
+        assert await user_service.get_profile_snapshot(db_session, user.id) == snapshot
+    assert counter.statements == ["SELECT"]
+    assert snapshot.subscription is None
+    assert snapshot.remaining_days == 0
+
+    await SubscriptionService().create_subscription(db_session, {
+        "user_id": user.id,
+        "plan": "Premium",
+        "status": SubStatus.ACTIVE,
+        "end_date": datetime.now(timezone.utc) + timedelta(days=10, hours=1),
+    })
+    snapshot = await user_service.get_profile_snapshot(db_session, user.id)
+    assert snapshot.user.id == user.id
+    assert snapshot.subscription.plan == "Premium"
+    assert snapshot.remaining_days == 10
+    assert snapshot.message == "Подписка активна"
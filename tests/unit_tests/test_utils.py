@@ -0,0 +1,440 @@
+# tests/unit_tests/test_utils.py
+
+import pytest
+
+from app.utils.cache import TTLCache, TieredCache, set_redis
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" становится самым свежим
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_respects_zero_ttl():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_counts_hits_and_misses():
+    set_redis(None)
+    cache = TieredCache("test_principals", maxsize=10, ttl=60)
+    assert await cache.get(1) is None
+    await cache.set(1, {"id": 1, "username": "john"})
+    assert await cache.get(1) == {"id": 1, "username": "john"}
+    await cache.delete(1)
+    assert await cache.get(1) is None
+    stats = cache.snapshot()
+    assert stats["l1_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_reads_through_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    set_redis(fakeredis.FakeAsyncRedis(decode_responses=True))
+    try:
+        cache = TieredCache("test_principals_l2", maxsize=10, ttl=60)
+        await cache.set(7, {"id": 7})
+        cache.local.clear()  # имитируем другой воркер с пустым L1
+        assert await cache.get(7) == {"id": 7}
+        assert cache.snapshot()["l2_hits"] == 1
+    finally:
+        set_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_runs_off_event_loop():
+    import asyncio
+    from app.core.security import get_password_hash_async, verify_password_async, password_hash_metrics
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    task = asyncio.create_task(ticker())
+    hashed = await get_password_hash_async("secret123")
+    assert await verify_password_async("secret123", hashed)
+    assert not await verify_password_async("wrong-password", hashed)
+    task.cancel()
+    # Пока bcrypt считается в пуле потоков, event loop продолжает работать
+    assert ticks > 5
+    assert password_hash_metrics()["calls"] >= 3
+
+
+@pytest.mark.asyncio
+async def test_replica_router_stickiness_and_lag_fallback():
+    import time
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from app.database.routing import ReplicaRouter
+
+    primary_engine = create_async_engine("sqlite+aiosqlite://")
+    replica_engine = create_async_engine("sqlite+aiosqlite://")
+    primary = async_sessionmaker(primary_engine)
+    replica = async_sessionmaker(replica_engine)
+    try:
+        router = ReplicaRouter(primary, [(replica_engine, replica)], max_lag=0, check_interval=60)
+        assert await router.session_maker_for() is replica
+        # Клиент только что писал — читает из основной базы
+        assert await router.session_maker_for(time.time() + 10) is primary
+        assert await router.session_maker_for(time.time() - 10) is replica
+
+        # SQLite не отвечает на запрос об отставании: реплика считается недоступной
+        lagging = ReplicaRouter(primary, [(replica_engine, replica)], max_lag=5, check_interval=60)
+        assert await lagging.session_maker_for() is primary
+        assert lagging.snapshot()["lag_fallbacks"] == 1
+
+        assert await ReplicaRouter(primary, [], max_lag=5, check_interval=60).session_maker_for() is primary
+    finally:
+        await primary_engine.dispose()
+        await replica_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_records_checkout_waits():
+    import asyncio
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy import text
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.database.pool_metrics import InstrumentedAsyncPool, instrument_engine, pool_stats
+
+    engine = instrument_engine(
+        create_async_engine(
+            "sqlite+aiosqlite://",
+            poolclass=InstrumentedAsyncPool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.2,
+        ),
+        "test-pool",
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            stats = pool_stats()["test-pool"]
+            assert stats["checked_out"] == 1
+            assert stats["connection_age_seconds"]["count"] == 1
+            # Единственное соединение занято: второй запрос ждёт и получает таймаут
+            with pytest.raises(PoolTimeoutError):
+                async with engine.connect():
+                    pass
+
+        stats = pool_stats()["test-pool"]
+        assert stats["checked_out"] == 0
+        assert stats["timeouts"] == 1
+        assert stats["wait_count"] == 2
+        assert stats["wait_max_ms"] >= 200
+        assert stats["wait_histogram"]["+Inf"] == 2
+    finally:
+        await engine.dispose()
+
+
+def test_catalog_index_matches_sql_ordering_semantics():
+    import random
+    from datetime import datetime, timezone
+    from types import SimpleNamespace
+    pytest.importorskip("numpy")
+    from app.services.catalog_index import CatalogIndex
+
+    rnd = random.Random(7)
+    rows, genres = [], {}
+    for movie_id in range(1, 301):
+        rows.append((
+            movie_id,
+            rnd.choice([None, 1.0, 5.5, 7.0, 9.5]),
+            rnd.choice([None, datetime(rnd.randint(1990, 2020), 6, 1, tzinfo=timezone.utc)]),
+            rnd.choice([None, "usa", "france"]),
+            rnd.choice(["movie", "series"]),
+            movie_id,  # позиция по названию
+        ))
+        genres[movie_id] = rnd.sample(["comedy", "drama", "horror"], rnd.randint(0, 2))
+    index = CatalogIndex(name="test_catalog_index", ttl=60)
+    index.load_rows(rows, [(movie_id, slug) for movie_id, slugs in genres.items() for slug in slugs])
+
+    def expected(genre=(), country=(), year_from=None, rating_min=None, sort_by="rating", order="desc", skip=0, limit=20):
+        column = {"rating": 1, "release_date": 2, "title": 5}[sort_by]
+        matched = [
+            r for r in rows
+            if (not genre or set(genre) & set(genres[r[0]]))
+            and (not country or r[3] in country)
+            and (not year_from or (r[2] and r[2] >= datetime(year_from, 1, 1, tzinfo=timezone.utc)))
+            and (rating_min is None or (r[1] is not None and r[1] >= rating_min))
+        ]
+        # NULL в конце при возрастании, id — второй ключ
+        ordered = sorted(matched, key=lambda r: (r[column] is None, r[column] or 0, r[0]))
+        if order == "desc":
+            ordered.reverse()
+        return [r[0] for r in ordered[skip:skip + limit]]
+
+    for sort_by in ("rating", "release_date", "title"):
+        for order in ("asc", "desc"):
+            assert index.search(sort_by=sort_by, order=order, skip=5, limit=20) == \
+                expected(sort_by=sort_by, order=order, skip=5)
+    assert index.search(genres=["comedy", "horror"], rating_min=5.5, sort_by="rating", order="asc", limit=300) == \
+        expected(genre=["comedy", "horror"], rating_min=5.5, sort_by="rating", order="asc", limit=300)
+    assert index.search(countries=["usa"], release_year_from=2005, sort_by="release_date", limit=300) == \
+        expected(country=["usa"], year_from=2005, sort_by="release_date", limit=300)
+    assert index.search(genres=["western"]) == []
+    # Шаблонные символы ilike обрабатывает база
+    assert index.search(type_="mov%") is None
+
+    # Изменения применяются сразу; новое название отправляет сортировку по title в базу
+    index.apply([SimpleNamespace(
+        id=1, rating=10.0, release_date=None, genre="Noir", country="USA", type="movie"
+    )], ["rating", "genre"])
+    assert index.search(rating_min=10.0, sort_by="rating") == [1]
+    assert index.search(genres=["noir"]) == [1]
+    index.apply([SimpleNamespace(id=1000, rating=None, release_date=None, genre="Noir, Drama", country=" Chile ", type="movie")])
+    assert index.search(genres=["noir"], sort_by="rating", order="asc") == [1, 1000]
+    assert index.search(countries=["chile"]) == [1000]
+    assert index.search(sort_by="title") is None
+
+
+def test_item_similarity_matches_dense_cosine():
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("scipy")
+    from app.tasks.movie_similarities import ItemSimilarity
+
+    rng = np.random.default_rng(7)
+    dense = rng.integers(1, 11, size=(40, 12)) * (rng.random((40, 12)) < 0.4)
+    dense[:, 11] = 0  # фильм без оценок в матрицу не попадает
+    users, movies = np.nonzero(dense)
+    similarity = ItemSimilarity(users + 100, movies + 1, dense[users, movies])
+    assert similarity.movie_ids.tolist() == list(range(1, 12))
+
+    sources, neighbours, scores = similarity.top_k(similarity.positions(), k=3)
+    columns = dense[:, :11] / np.linalg.norm(dense[:, :11], axis=0)
+    expected = columns.T @ columns
+    np.fill_diagonal(expected, 0)
+    for movie in range(11):
+        mine = sources == movie + 1
+        assert neighbours[mine].tolist() == (np.argsort(-expected[movie], kind="stable")[:3] + 1).tolist()
+        assert np.allclose(scores[mine], np.sort(expected[movie])[::-1][:3], atol=1e-5)
+    # Частичный пересчёт: только запрошенные фильмы, отсутствующие пропускаются
+    sources, _, _ = similarity.top_k(similarity.positions([2, 12]), k=3)
+    assert set(sources.tolist()) == {2}
+
+
+def test_suggest_index_folds_ranks_and_applies_changes():
+    from types import SimpleNamespace
+    from app.services.suggest_index import SuggestIndex, fold_title
+
+    assert fold_title("  Ёлки: Новогодний  Éclair!") == "елки новогоднии eclair"
+    index = SuggestIndex("test_suggest")
+    index.load_rows([
+        (1, "Ёлки", 10, 6.0),
+        (2, "Ёлки 2", 50, 5.0),
+        (3, "Новые ёлки", 99, 7.0),
+        (4, "Star Wars: A New Hope", 5, 8.6),
+        (5, "Stardust", 5, 7.6),
+    ])
+    # Совпадения с начала названия раньше совпадений по слову, внутри — по популярности
+    assert [id for id, _ in index.search("ЕЛК")] == [2, 1, 3]
+    assert [id for id, _ in index.search("star")] == [4, 5]
+    assert [id for id, _ in index.search("wars a n")] == [4]
+    assert index.search("  ") == []
+    assert index.search("stars", limit=1) == []
+
+    index.apply([SimpleNamespace(id=5, title="Елки-палки", review_count=5, rating=7.6)])
+    assert [id for id, _ in index.search("палк")] == [5]
+    assert [id for id, _ in index.search("star")] == [4]
+    assert [id for id, _ in index.search("елки", limit=2)] == [2, 1]
+
+
+def test_movie_fields_are_validated_and_serialized_sparsely():
+    from datetime import datetime, timezone
+    from types import SimpleNamespace
+    from app.schemas.movies import movie_read_json, parse_movie_fields
+
+    assert parse_movie_fields(None) is None
+    assert parse_movie_fields(" id,title , id,rating") == ["id", "title", "rating"]
+    for bad in ("id,poster", ",", ""):
+        with pytest.raises(ValueError):
+            parse_movie_fields(bad)
+    # Незапрошенные атрибуты не читаются: у объекта их просто нет
+    movie = SimpleNamespace(id=7, title="Sparse", release_date=datetime(2020, 5, 1, tzinfo=timezone.utc))
+    assert movie_read_json(movie, ["id", "title", "release_date"]) == \
+        '{"id":7,"title":"Sparse","release_date":"2020-05-01T00:00:00Z"}'
+    assert movie_read_json(movie, ["duration_formatted"], duration_formatted="2 hr") == '{"duration_formatted":"2 hr"}'
+
+
+def test_entitlements_cover_lower_plans():
+    from app.services.entitlements_service import EntitlementService, covered_plans
+
+    assert covered_plans("Premium") == ["basic", "standard", "premium"]
+    assert covered_plans("basic") == ["basic"]
+    assert covered_plans("Family") == ["family"]
+    premium = {"plan": "Premium", "plans": covered_plans("Premium")}
+    assert EntitlementService.allows(premium, "Standard")
+    assert EntitlementService.allows(premium, None)
+    assert not EntitlementService.allows({"plan": "Basic", "plans": covered_plans("Basic")}, "standard")
+    assert not EntitlementService.allows({"plan": None, "plans": []}, "basic")
+
+
+def test_stripe_form_params_flatten_nested_values():
+    from app.services.payment_gateway import form_params
+
+    assert form_params({
+        "mode": "payment",
+        "line_items": [{"price_data": {"unit_amount": 1000}, "quantity": 1}],
+        "metadata": {"order_id": "7", "coupon": None},
+        "allow_promotion_codes": False,
+    }) == [
+        ("mode", "payment"),
+        ("line_items[0][price_data][unit_amount]", "1000"),
+        ("line_items[0][quantity]", "1"),
+        ("metadata[order_id]", "7"),
+        ("allow_promotion_codes", "false"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stripe_gateway_retries_transient_errors_only(monkeypatch):
+    from app.core.config import settings
+    from app.exceptions.custom_exceptions import ExternalAPIErrorException, ExternalServiceUnavailableException
+    from app.services.payment_gateway import StripeGateway
+    from tests.fake_stripe import FakeStripe
+
+    monkeypatch.setattr(settings, "STRIPE_RETRY_BACKOFF", 0.001)
+    fake = FakeStripe(failures=[503, 429])
+    gateway = StripeGateway(api_key="sk_test", base_url="http://stripe.test", max_retries=2, transport=fake.transport())
+    session = await gateway.create_checkout_session(idempotency_key="checkout-1", mode="payment", metadata={"order_id": "1"})
+    assert session["metadata"] == {"order_id": "1"}
+    assert gateway.stats["retries"] == 2
+    # Повтор с тем же ключом возвращает ту же сессию
+    assert (await gateway.create_checkout_session(idempotency_key="checkout-1", mode="payment"))["id"] == session["id"]
+    assert {request["idempotency_key"] for request in fake.requests} == {"checkout-1"}
+
+    fake.failures = [400]
+    with pytest.raises(ExternalAPIErrorException):
+        await gateway.create_checkout_session(idempotency_key="checkout-2", mode="payment")
+    fake.failures = [500, 500, 500]
+    with pytest.raises(ExternalServiceUnavailableException):
+        await gateway.create_checkout_session(idempotency_key="checkout-3", mode="payment")
+    assert len(fake.requests) == 3 + 1 + 1 + 3
+    await gateway.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stripe_gateway_limits_in_flight_calls_without_blocking_loop():
+    import asyncio
+    import time
+    from app.services.payment_gateway import StripeGateway
+    from tests.fake_stripe import FakeStripe
+
+    fake = FakeStripe(latency=0.02)
+    gateway = StripeGateway(api_key="sk_test", base_url="http://stripe.test", max_in_flight=10, transport=fake.transport())
+    lags = []
+
+    async def ticker():
+        # Задержка пробуждения показывает, насколько event loop был занят
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - started - 0.005)
+
+    probe = asyncio.create_task(ticker())
+    sessions = await asyncio.gather(*(
+        gateway.create_checkout_session(idempotency_key=f"checkout-{i}", mode="payment") for i in range(100)
+    ))
+    probe.cancel()
+    await gateway.aclose()
+    assert len({session["id"] for session in sessions}) == 100
+    assert fake.max_in_flight <= 10
+    assert gateway.stats["max_in_flight"] == 10
+    # 100 вызовов по 20 мс при 10 одновременных — около 0.2 с, event loop при этом свободен
+    assert max(lags) < 0.1
+
+
+def test_review_fragment_route_is_not_shadowed_by_api():
+    import app.api.main  # noqa: F401 — порядок импорта схем как в приложении
+    from app.api.v1 import internal, movies, payments, reviews, subscriptions, users
+    from app.routes.html_routes import movie_reviews, router as html_router
+
+    path = "/movies/1/reviews"
+    # JSON-роутеры подключены раньше HTML-роутера и не должны перехватывать путь фрагмента
+    for api_router in (users.router, movies.router, subscriptions.router, payments.router, reviews.router, internal.router):
+        assert not [route.path for route in api_router.routes if "GET" in route.methods and route.path_regex.match(path)]
+    html_route = next(route for route in html_router.routes if route.path_regex.match(path))
+    assert html_route.endpoint is movie_reviews
+
+
+def test_movie_schema_rejects_genres_longer_than_the_column():
+    from pydantic import ValidationError
+    import app.api.main  # noqa: F401 — порядок импорта схем как в приложении
+    from app.models.genres import GENRE_MAX_LENGTH
+    from app.schemas.movies import MovieCreate, MovieUpdate
+    assert MovieCreate(title="Long Genre", genre="x" * GENRE_MAX_LENGTH).genre == "x" * GENRE_MAX_LENGTH
+    with pytest.raises(ValidationError):
+        MovieCreate(title="Long Genre", genre="x" * (GENRE_MAX_LENGTH + 1))
+    with pytest.raises(ValidationError):
+        MovieUpdate(genres=["x" * 200, "y" * 200])
+    with pytest.raises(ValidationError):
+        MovieCreate(title="Long Country", country="x" * 51)
+
+
+def test_catalog_cache_key_keeps_case_of_cursor_and_text():
+    from app.services.catalog_cache import CatalogCache
+    make_key = CatalogCache.make_key
+    assert make_key("list", {"genre": "Drama", "order": "DESC", "title": None}) == make_key("list", {"genre": "drama", "order": "desc"})
+    # Курсор — base64, регистр в нём значим; поисковый текст тоже не меняется
+    assert make_key("list", {"cursor": "eyJzIjoi"}) != make_key("list", {"cursor": "EYJZIJOI"})
+    assert make_key("list", {"title": "Alien"}) != make_key("list", {"title": "alien"})
+
+
+def test_job_metrics_track_runs_and_custom_counters():
+    import time
+    from app.tasks.periodic import JobMetrics
+    metrics = JobMetrics(runs_key="refreshes", finished_at_key="last_refreshed_at", rows=0, total=0)
+    metrics.skipped()
+    metrics.failed()
+    metrics.add(total=3)
+    metrics.finished(time.perf_counter(), rows=7)
+    snapshot = metrics.snapshot()
+    assert (snapshot["refreshes"], snapshot["skipped"], snapshot["errors"]) == (1, 1, 1)
+    assert (snapshot["rows"], snapshot["total"]) == (7, 3)
+    assert snapshot["last_refreshed_at"] is not None and snapshot["last_duration_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_catalog_cache_releases_lock_when_compute_fails():
+    import asyncio
+    import time
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.services.catalog_cache import CatalogCache
+
+    set_redis(fakeredis.FakeAsyncRedis(decode_responses=True))
+    try:
+        cache = CatalogCache("test_failing_catalog")
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise LookupError("not found")
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(cache.get_or_compute("detail", {"id": 404}, compute) for _ in range(5)), return_exceptions=True
+        )
+        # Каждый запрос быстро получает ошибку, а не ждёт срока блокировки (2 с)
+        assert all(isinstance(r, LookupError) for r in results)
+        assert calls == 5
+        assert time.perf_counter() - started < 1.0
+    finally:
+        set_redis(None)